@@ -0,0 +1,272 @@
+-- Array versions of the Donation and Transfusion procedures: each takes one collection per parameter
+-- and applies the whole batch with FORALL, so many rows cost one call. Rows that fail are saved and
+-- handed back as (row offset, message) in p_Error_Rows and p_Error_Messages; the rows that succeed
+-- stay in the caller's transaction, for it to commit or roll back. The update and delete procedures
+-- also hand back the rows whose key matched no row, with the message 'ORA-01403: no data found'.
+-- check_donation_rules checks a whole Donation statement at once and fails all of it for one donor,
+-- so when it refuses a batch, InsertDonations and UpdateDonations apply the rows one at a time instead.
+-- Needs IdList from Triggers.sql and NameList, NumberList and DateList from RegisterDonation.sql.
+
+CREATE OR REPLACE TYPE MessageList AS TABLE OF VARCHAR2(512);
+/
+
+--Donation Table Procedures
+CREATE OR REPLACE PROCEDURE InsertDonations (
+    p_Donation_IDs IdList,
+    p_Donor_IDs IdList,
+    p_Donated_BloodTypes NameList,
+    p_Donated_Quantities NumberList,
+    p_Donation_Dates DateList,
+    p_Recipient_IDs IdList,
+    p_Inventory_IDs IdList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+    too_soon EXCEPTION;
+    PRAGMA EXCEPTION_INIT(too_soon, -20001);
+    not_eligible EXCEPTION;
+    PRAGMA EXCEPTION_INIT(not_eligible, -20002);
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    SAVEPOINT insert_donations;
+    FORALL i IN 1 .. p_Donation_IDs.COUNT SAVE EXCEPTIONS
+        INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, Donation_Date, Recipient_ID, Inventory_ID)
+        VALUES (p_Donation_IDs(i), p_Donor_IDs(i), p_Donated_BloodTypes(i), p_Donated_Quantities(i), p_Donation_Dates(i),
+                p_Recipient_IDs(i), p_Inventory_IDs(i));
+EXCEPTION
+    WHEN bulk_errors THEN
+        -- Offsets count from 0 like cx_Oracle batch errors. SQLERRM of a saved error has the code
+        -- but not the text a trigger raised with it
+        FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+            p_Error_Rows.EXTEND;
+            p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+            p_Error_Messages.EXTEND;
+            p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+        END LOOP;
+    WHEN too_soon OR not_eligible THEN
+        -- check_donation_rules refused the whole batch for some donor; find the rows at fault one by one
+        ROLLBACK TO insert_donations;
+        FOR i IN 1 .. p_Donation_IDs.COUNT LOOP
+            BEGIN
+                INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, Donation_Date, Recipient_ID, Inventory_ID)
+                VALUES (p_Donation_IDs(i), p_Donor_IDs(i), p_Donated_BloodTypes(i), p_Donated_Quantities(i), p_Donation_Dates(i),
+                        p_Recipient_IDs(i), p_Inventory_IDs(i));
+            EXCEPTION
+                WHEN OTHERS THEN
+                    p_Error_Rows.EXTEND;
+                    p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+                    p_Error_Messages.EXTEND;
+                    p_Error_Messages(p_Error_Messages.LAST) := SQLERRM;
+            END;
+        END LOOP;
+END;
+/
+CREATE OR REPLACE PROCEDURE DeleteDonations (
+    p_Donation_IDs IdList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    BEGIN
+        FORALL i IN 1 .. p_Donation_IDs.COUNT SAVE EXCEPTIONS
+            DELETE FROM Donation
+            WHERE Donation_ID = p_Donation_IDs(i);
+    EXCEPTION
+        WHEN bulk_errors THEN
+            FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+                p_Error_Rows.EXTEND;
+                p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+                p_Error_Messages.EXTEND;
+                p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+            END LOOP;
+    END;
+    -- Keys that matched no row; the rows that failed changed nothing either and are reported already
+    FOR i IN 1 .. p_Donation_IDs.COUNT LOOP
+        IF SQL%BULK_ROWCOUNT(i) = 0 AND (i - 1) NOT MEMBER OF p_Error_Rows THEN
+            p_Error_Rows.EXTEND;
+            p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+            p_Error_Messages.EXTEND;
+            p_Error_Messages(p_Error_Messages.LAST) := 'ORA-01403: no data found';
+        END IF;
+    END LOOP;
+END;
+/
+CREATE OR REPLACE PROCEDURE UpdateDonations (
+    p_Donation_IDs IdList,
+    p_Donated_Quantities NumberList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+    too_soon EXCEPTION;
+    PRAGMA EXCEPTION_INIT(too_soon, -20001);
+    not_eligible EXCEPTION;
+    PRAGMA EXCEPTION_INIT(not_eligible, -20002);
+    v_Row_By_Row BOOLEAN := FALSE;
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    SAVEPOINT update_donations;
+    BEGIN
+        FORALL i IN 1 .. p_Donation_IDs.COUNT SAVE EXCEPTIONS
+            UPDATE Donation
+            SET Donated_Quantity = p_Donated_Quantities(i)
+            WHERE Donation_ID = p_Donation_IDs(i);
+    EXCEPTION
+        WHEN bulk_errors THEN
+            FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+                p_Error_Rows.EXTEND;
+                p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+                p_Error_Messages.EXTEND;
+                p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+            END LOOP;
+        WHEN too_soon OR not_eligible THEN
+            ROLLBACK TO update_donations;
+            FOR i IN 1 .. p_Donation_IDs.COUNT LOOP
+                BEGIN
+                    UPDATE Donation
+                    SET Donated_Quantity = p_Donated_Quantities(i)
+                    WHERE Donation_ID = p_Donation_IDs(i);
+                    IF SQL%ROWCOUNT = 0 THEN
+                        p_Error_Rows.EXTEND;
+                        p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+                        p_Error_Messages.EXTEND;
+                        p_Error_Messages(p_Error_Messages.LAST) := 'ORA-01403: no data found';
+                    END IF;
+                EXCEPTION
+                    WHEN OTHERS THEN
+                        p_Error_Rows.EXTEND;
+                        p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+                        p_Error_Messages.EXTEND;
+                        p_Error_Messages(p_Error_Messages.LAST) := SQLERRM;
+                END;
+            END LOOP;
+            v_Row_By_Row := TRUE;
+    END;
+    IF NOT v_Row_By_Row THEN
+        -- Keys that matched no row; the rows that failed changed nothing either and are reported already
+        FOR i IN 1 .. p_Donation_IDs.COUNT LOOP
+            IF SQL%BULK_ROWCOUNT(i) = 0 AND (i - 1) NOT MEMBER OF p_Error_Rows THEN
+                p_Error_Rows.EXTEND;
+                p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+                p_Error_Messages.EXTEND;
+                p_Error_Messages(p_Error_Messages.LAST) := 'ORA-01403: no data found';
+            END IF;
+        END LOOP;
+    END IF;
+END;
+/
+
+--Transfusion Table Procedures
+CREATE OR REPLACE PROCEDURE InsertTransfusions (
+    p_Transfusion_IDs IdList,
+    p_Recipient_IDs IdList,
+    p_Requested_BloodTypes NameList,
+    p_Requested_Components NameList,
+    p_Requested_Quantities NumberList,
+    p_Request_Dates DateList,
+    p_Exchange_Types NameList,
+    p_Exchange_Donor_IDs IdList,
+    p_Donation_IDs IdList,
+    p_Inventory_IDs IdList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    FORALL i IN 1 .. p_Transfusion_IDs.COUNT SAVE EXCEPTIONS
+        INSERT INTO Transfusion (Transfusion_ID, Recipient_ID, Requested_BloodType, Requested_Component, Requested_Quantity, Request_Date, Exchange_Type, Exchange_Donor_ID, Donation_ID, Inventory_ID)
+        VALUES (p_Transfusion_IDs(i), p_Recipient_IDs(i), p_Requested_BloodTypes(i), p_Requested_Components(i),
+                p_Requested_Quantities(i), p_Request_Dates(i), p_Exchange_Types(i), p_Exchange_Donor_IDs(i),
+                p_Donation_IDs(i), p_Inventory_IDs(i));
+EXCEPTION
+    WHEN bulk_errors THEN
+        FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+            p_Error_Rows.EXTEND;
+            p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+            p_Error_Messages.EXTEND;
+            p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+        END LOOP;
+END;
+/
+CREATE OR REPLACE PROCEDURE DeleteTransfusions (
+    p_Transfusion_IDs IdList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    BEGIN
+        FORALL i IN 1 .. p_Transfusion_IDs.COUNT SAVE EXCEPTIONS
+            DELETE FROM Transfusion
+            WHERE Transfusion_ID = p_Transfusion_IDs(i);
+    EXCEPTION
+        WHEN bulk_errors THEN
+            FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+                p_Error_Rows.EXTEND;
+                p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+                p_Error_Messages.EXTEND;
+                p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+            END LOOP;
+    END;
+    -- Keys that matched no row; the rows that failed changed nothing either and are reported already
+    FOR i IN 1 .. p_Transfusion_IDs.COUNT LOOP
+        IF SQL%BULK_ROWCOUNT(i) = 0 AND (i - 1) NOT MEMBER OF p_Error_Rows THEN
+            p_Error_Rows.EXTEND;
+            p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+            p_Error_Messages.EXTEND;
+            p_Error_Messages(p_Error_Messages.LAST) := 'ORA-01403: no data found';
+        END IF;
+    END LOOP;
+END;
+/
+CREATE OR REPLACE PROCEDURE UpdateTransfusions (
+    p_Transfusion_IDs IdList,
+    p_Requested_Quantities NumberList,
+    p_Error_Rows OUT IdList,
+    p_Error_Messages OUT MessageList
+) AS
+    bulk_errors EXCEPTION;
+    PRAGMA EXCEPTION_INIT(bulk_errors, -24381);
+BEGIN
+    p_Error_Rows := IdList();
+    p_Error_Messages := MessageList();
+    BEGIN
+        FORALL i IN 1 .. p_Transfusion_IDs.COUNT SAVE EXCEPTIONS
+            UPDATE Transfusion
+            SET Requested_Quantity = p_Requested_Quantities(i)
+            WHERE Transfusion_ID = p_Transfusion_IDs(i);
+    EXCEPTION
+        WHEN bulk_errors THEN
+            FOR j IN 1 .. SQL%BULK_EXCEPTIONS.COUNT LOOP
+                p_Error_Rows.EXTEND;
+                p_Error_Rows(j) := SQL%BULK_EXCEPTIONS(j).ERROR_INDEX - 1;
+                p_Error_Messages.EXTEND;
+                p_Error_Messages(j) := SQLERRM(-SQL%BULK_EXCEPTIONS(j).ERROR_CODE);
+            END LOOP;
+    END;
+    -- Keys that matched no row; the rows that failed changed nothing either and are reported already
+    FOR i IN 1 .. p_Transfusion_IDs.COUNT LOOP
+        IF SQL%BULK_ROWCOUNT(i) = 0 AND (i - 1) NOT MEMBER OF p_Error_Rows THEN
+            p_Error_Rows.EXTEND;
+            p_Error_Rows(p_Error_Rows.LAST) := i - 1;
+            p_Error_Messages.EXTEND;
+            p_Error_Messages(p_Error_Messages.LAST) := 'ORA-01403: no data found';
+        END IF;
+    END LOOP;
+END;
+/
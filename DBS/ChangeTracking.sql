@@ -0,0 +1,159 @@
+-- Change log read by the table views to refresh only the rows that changed.
+-- Every insert, update and delete on the application tables records the row's key here.
+
+CREATE SEQUENCE ChangeLog_Seq;
+
+CREATE TABLE ChangeLog (
+    Change_ID NUMBER PRIMARY KEY,
+    Table_Name VARCHAR2(30) NOT NULL,
+    Row_Key NUMBER,
+    Operation CHAR(1) NOT NULL,
+    Changed_At DATE DEFAULT SYSDATE NOT NULL
+);
+
+CREATE INDEX ChangeLog_Table_IX ON ChangeLog (Table_Name, Change_ID);
+
+CREATE OR REPLACE TRIGGER Donor_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON Donor
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Donor_ID != :NEW.Donor_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONOR', :OLD.Donor_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONOR', :NEW.Donor_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONOR', :NEW.Donor_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER Recipient_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON Recipient
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Recipient_ID != :NEW.Recipient_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'RECIPIENT', :OLD.Recipient_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'RECIPIENT', :NEW.Recipient_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'RECIPIENT', :NEW.Recipient_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER Staff_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON Staff
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Staff_ID != :NEW.Staff_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'STAFF', :OLD.Staff_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'STAFF', :NEW.Staff_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'STAFF', :NEW.Staff_ID, 'U');
+    END IF;
+END;
+/
+
+--DonorScreening has no primary key, so its changes are logged by Donor_ID
+CREATE OR REPLACE TRIGGER DonorScreening_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON DonorScreening
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Donor_ID != :NEW.Donor_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONORSCREENING', :OLD.Donor_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONORSCREENING', :NEW.Donor_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONORSCREENING', :NEW.Donor_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER Donation_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON Donation
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Donation_ID != :NEW.Donation_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONATION', :OLD.Donation_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONATION', :NEW.Donation_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'DONATION', :NEW.Donation_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER BloodInventory_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Inventory_ID != :NEW.Inventory_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'BLOODINVENTORY', :OLD.Inventory_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'BLOODINVENTORY', :NEW.Inventory_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'BLOODINVENTORY', :NEW.Inventory_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER ExpiredBlood_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Expired_Log_ID != :NEW.Expired_Log_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'EXPIREDBLOOD', :OLD.Expired_Log_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'EXPIREDBLOOD', :NEW.Expired_Log_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'EXPIREDBLOOD', :NEW.Expired_Log_ID, 'U');
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER Transfusion_ChangeLog
+AFTER INSERT OR UPDATE OR DELETE ON Transfusion
+FOR EACH ROW
+BEGIN
+    IF DELETING OR (UPDATING AND :OLD.Transfusion_ID != :NEW.Transfusion_ID) THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'TRANSFUSION', :OLD.Transfusion_ID, 'D');
+    END IF;
+    IF INSERTING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'TRANSFUSION', :NEW.Transfusion_ID, 'I');
+    ELSIF UPDATING THEN
+        INSERT INTO ChangeLog (Change_ID, Table_Name, Row_Key, Operation)
+        VALUES (ChangeLog_Seq.NEXTVAL, 'TRANSFUSION', :NEW.Transfusion_ID, 'U');
+    END IF;
+END;
+/
@@ -0,0 +1,75 @@
+-- Blood type compatibility shared by the transfusion trigger and the application.
+-- Each blood type has one bit; a row's Donor_Mask has the bits of every donor type that can
+-- serve the recipient type with that component. Components without rows need an exact type match.
+
+CREATE TABLE BloodTypes (
+    Blood_Type VARCHAR(3) PRIMARY KEY,
+    Type_Bit INT NOT NULL
+);
+
+CREATE TABLE BloodCompatibility (
+    Component VARCHAR(50) NOT NULL,
+    Recipient_Type VARCHAR(3) NOT NULL,
+    Donor_Mask INT NOT NULL,
+    PRIMARY KEY (Component, Recipient_Type)
+);
+
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('O-', 1);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('O+', 2);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('A-', 4);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('A+', 8);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('B-', 16);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('B+', 32);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('AB-', 64);
+INSERT INTO BloodTypes (Blood_Type, Type_Bit) VALUES ('AB+', 128);
+
+-- Red cells: the donor may not carry an A, B or D antigen the recipient lacks
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'O-', 1);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'O+', 3);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'A-', 5);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'A+', 15);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'B-', 17);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'B+', 51);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'AB-', 85);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Red Blood Cells', 'AB+', 255);
+
+-- Whole blood: ABO identical, Rh negative may go to Rh positive
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'O-', 1);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'O+', 3);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'A-', 4);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'A+', 12);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'B-', 16);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'B+', 48);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'AB-', 64);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Whole Blood', 'AB+', 192);
+
+-- Platelets: same rule as red cells
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'O-', 1);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'O+', 3);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'A-', 5);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'A+', 15);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'B-', 17);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'B+', 51);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'AB-', 85);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Platelets', 'AB+', 255);
+
+-- Plasma and cryoprecipitate: the donor's plasma may not hold antibodies against the recipient's A or B antigens
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'O-', 255);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'O+', 255);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'A-', 204);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'A+', 204);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'B-', 240);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'B+', 240);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'AB-', 192);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Plasma', 'AB+', 192);
+
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'O-', 255);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'O+', 255);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'A-', 204);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'A+', 204);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'B-', 240);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'B+', 240);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'AB-', 192);
+INSERT INTO BloodCompatibility (Component, Recipient_Type, Donor_Mask) VALUES ('Cryoprecipitate', 'AB+', 192);
+
+COMMIT;
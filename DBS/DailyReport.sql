@@ -0,0 +1,149 @@
+-- Daily report: totals per day, blood type and component, kept current by triggers as rows change,
+-- so a report over any date range reads one row per day and group instead of the transactional tables.
+-- Donations count as Whole Blood; units are stocked on the date of the donation they came from.
+-- Fill it for the existing rows with: python report.py --rebuild
+
+CREATE TABLE DailyReport (
+    Report_Date DATE NOT NULL,
+    Blood_Type VARCHAR(3) NOT NULL,
+    Blood_Component VARCHAR(50) NOT NULL,
+    Donations INT DEFAULT 0 NOT NULL,
+    Donated_Quantity INT DEFAULT 0 NOT NULL,
+    Transfusions INT DEFAULT 0 NOT NULL,
+    Transfused_Quantity INT DEFAULT 0 NOT NULL,
+    Units_Stocked INT DEFAULT 0 NOT NULL,
+    Stocked_Quantity INT DEFAULT 0 NOT NULL,
+    Units_Expired INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (Report_Date, Blood_Type, Blood_Component)
+);
+
+--Adds the changes of one row to its day's totals. Two sessions adding the first row of a day and group
+--at once can both take the insert branch of the MERGE; the one that loses adds to the other's row instead
+CREATE OR REPLACE PROCEDURE AddToDailyReport (
+    p_Date DATE,
+    p_Blood_Type VARCHAR,
+    p_Component VARCHAR,
+    p_Donations INT,
+    p_Donated_Quantity INT,
+    p_Transfusions INT,
+    p_Transfused_Quantity INT,
+    p_Units_Stocked INT,
+    p_Stocked_Quantity INT,
+    p_Units_Expired INT
+) AS
+BEGIN
+    MERGE INTO DailyReport r
+    USING (SELECT TRUNC(p_Date) AS Report_Date FROM dual) d
+    ON (r.Report_Date = d.Report_Date AND r.Blood_Type = p_Blood_Type AND r.Blood_Component = p_Component)
+    WHEN MATCHED THEN UPDATE SET
+        Donations = Donations + p_Donations,
+        Donated_Quantity = Donated_Quantity + p_Donated_Quantity,
+        Transfusions = Transfusions + p_Transfusions,
+        Transfused_Quantity = Transfused_Quantity + p_Transfused_Quantity,
+        Units_Stocked = Units_Stocked + p_Units_Stocked,
+        Stocked_Quantity = Stocked_Quantity + p_Stocked_Quantity,
+        Units_Expired = Units_Expired + p_Units_Expired
+    WHEN NOT MATCHED THEN INSERT (Report_Date, Blood_Type, Blood_Component, Donations, Donated_Quantity,
+                                  Transfusions, Transfused_Quantity, Units_Stocked, Stocked_Quantity, Units_Expired)
+    VALUES (d.Report_Date, p_Blood_Type, p_Component, p_Donations, p_Donated_Quantity, p_Transfusions,
+            p_Transfused_Quantity, p_Units_Stocked, p_Stocked_Quantity, p_Units_Expired);
+EXCEPTION
+    WHEN DUP_VAL_ON_INDEX THEN
+        UPDATE DailyReport SET
+            Donations = Donations + p_Donations,
+            Donated_Quantity = Donated_Quantity + p_Donated_Quantity,
+            Transfusions = Transfusions + p_Transfusions,
+            Transfused_Quantity = Transfused_Quantity + p_Transfused_Quantity,
+            Units_Stocked = Units_Stocked + p_Units_Stocked,
+            Stocked_Quantity = Stocked_Quantity + p_Stocked_Quantity,
+            Units_Expired = Units_Expired + p_Units_Expired
+        WHERE Report_Date = TRUNC(p_Date) AND Blood_Type = p_Blood_Type AND Blood_Component = p_Component;
+END;
+/
+
+--Donations, and the units of a donation when it is added, removed or moved to another date.
+--RegisterDonation inserts the units before their donation, so they are counted here
+CREATE OR REPLACE TRIGGER Donation_DailyReport
+AFTER INSERT OR UPDATE OR DELETE ON Donation
+FOR EACH ROW
+DECLARE
+    v_Units_Moved BOOLEAN := INSERTING OR DELETING OR :OLD.Donation_ID != :NEW.Donation_ID
+                             OR :OLD.Donation_Date != :NEW.Donation_Date;
+BEGIN
+    IF UPDATING OR DELETING THEN
+        AddToDailyReport(:OLD.Donation_Date, :OLD.Donated_BloodType, 'Whole Blood', -1,
+                         -NVL(:OLD.Donated_Quantity, 0), 0, 0, 0, 0, 0);
+        IF v_Units_Moved THEN
+            FOR unit IN (SELECT Blood_Type, Blood_Component, COUNT(*) AS Units, SUM(Quantity) AS Quantity
+                         FROM BloodInventory WHERE Donation_ID = :OLD.Donation_ID
+                         GROUP BY Blood_Type, Blood_Component) LOOP
+                AddToDailyReport(:OLD.Donation_Date, unit.Blood_Type, unit.Blood_Component, 0, 0, 0, 0,
+                                 -unit.Units, -unit.Quantity, 0);
+            END LOOP;
+        END IF;
+    END IF;
+    IF INSERTING OR UPDATING THEN
+        AddToDailyReport(:NEW.Donation_Date, :NEW.Donated_BloodType, 'Whole Blood', 1,
+                         NVL(:NEW.Donated_Quantity, 0), 0, 0, 0, 0, 0);
+        IF v_Units_Moved THEN
+            FOR unit IN (SELECT Blood_Type, Blood_Component, COUNT(*) AS Units, SUM(Quantity) AS Quantity
+                         FROM BloodInventory WHERE Donation_ID = :NEW.Donation_ID
+                         GROUP BY Blood_Type, Blood_Component) LOOP
+                AddToDailyReport(:NEW.Donation_Date, unit.Blood_Type, unit.Blood_Component, 0, 0, 0, 0,
+                                 unit.Units, unit.Quantity, 0);
+            END LOOP;
+        END IF;
+    END IF;
+END;
+/
+
+--Units stocked, on the date of their donation; a unit whose donation is not there yet is
+--counted by Donation_DailyReport when the donation is inserted
+CREATE OR REPLACE TRIGGER BloodInventory_DailyReport
+AFTER INSERT OR UPDATE OR DELETE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    IF UPDATING OR DELETING THEN
+        FOR donation IN (SELECT Donation_Date FROM Donation WHERE Donation_ID = :OLD.Donation_ID) LOOP
+            AddToDailyReport(donation.Donation_Date, :OLD.Blood_Type, :OLD.Blood_Component, 0, 0, 0, 0,
+                             -1, -:OLD.Quantity, 0);
+        END LOOP;
+    END IF;
+    IF INSERTING OR UPDATING THEN
+        FOR donation IN (SELECT Donation_Date FROM Donation WHERE Donation_ID = :NEW.Donation_ID) LOOP
+            AddToDailyReport(donation.Donation_Date, :NEW.Blood_Type, :NEW.Blood_Component, 0, 0, 0, 0,
+                             1, :NEW.Quantity, 0);
+        END LOOP;
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER Transfusion_DailyReport
+AFTER INSERT OR UPDATE OR DELETE ON Transfusion
+FOR EACH ROW
+BEGIN
+    IF UPDATING OR DELETING THEN
+        AddToDailyReport(:OLD.Request_Date, :OLD.Requested_BloodType, :OLD.Requested_Component, 0, 0,
+                         -1, -:OLD.Requested_Quantity, 0, 0, 0);
+    END IF;
+    IF INSERTING OR UPDATING THEN
+        AddToDailyReport(:NEW.Request_Date, :NEW.Requested_BloodType, :NEW.Requested_Component, 0, 0,
+                         1, :NEW.Requested_Quantity, 0, 0, 0);
+    END IF;
+END;
+/
+
+CREATE OR REPLACE TRIGGER ExpiredBlood_DailyReport
+AFTER INSERT OR UPDATE OR DELETE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    IF UPDATING OR DELETING THEN
+        AddToDailyReport(:OLD.Disposal_Date, :OLD.Expired_BloodType, :OLD.Expired_BloodComponent,
+                         0, 0, 0, 0, 0, 0, -1);
+    END IF;
+    IF INSERTING OR UPDATING THEN
+        AddToDailyReport(:NEW.Disposal_Date, :NEW.Expired_BloodType, :NEW.Expired_BloodComponent,
+                         0, 0, 0, 0, 0, 0, 1);
+    END IF;
+END;
+/
@@ -0,0 +1,83 @@
+-- Expiry sweep: logs blood units that expired while in storage into ExpiredBlood.
+-- Run by expiry.py on a schedule; each batch is committed on its own so the sweep never holds locks for long.
+
+-- Log ids continue after the highest one in ExpiredBlood, whichever path wrote it, as on the other
+-- write paths; replaces the ExpiredBlood_Seq of earlier versions, which fell behind explicit ids
+BEGIN
+    FOR old_sequence IN (SELECT sequence_name FROM user_sequences WHERE sequence_name = 'EXPIREDBLOOD_SEQ') LOOP
+        EXECUTE IMMEDIATE 'DROP SEQUENCE ' || old_sequence.sequence_name;
+    END LOOP;
+END;
+/
+
+-- Units cannot be stocked or changed once expired (CheckBloodExpiry), so every unit that expires
+-- later than a finished sweep started is stocked after it. Each run scans from where the last one
+-- got to, kept in the ExpirySweep table of migration 6, less a day for transactions still open.
+CREATE OR REPLACE PROCEDURE SweepExpiredBlood (
+    p_Staff_ID INT,
+    p_Batch_Size INT,
+    p_Max_Batches INT,
+    p_Swept OUT INT
+) AS
+    TYPE InventoryIdList IS TABLE OF BloodInventory.Inventory_ID%TYPE;
+    TYPE BloodTypeList IS TABLE OF BloodInventory.Blood_Type%TYPE;
+    TYPE ComponentList IS TABLE OF BloodInventory.Blood_Component%TYPE;
+    TYPE ExpiryDateList IS TABLE OF BloodInventory.Expiry_Date%TYPE;
+    v_Inventory_IDs InventoryIdList;
+    v_Blood_Types BloodTypeList;
+    v_Components ComponentList;
+    v_Expiry_Dates ExpiryDateList;
+    v_Batches INT := 0;
+    v_Now DATE := SYSDATE;
+    v_From DATE;
+    v_Swept_Until DATE;
+    v_Last_ID ExpiredBlood.Expired_Log_ID%TYPE;
+BEGIN
+    p_Swept := 0;
+    SELECT NVL(MAX(Swept_Until) - 1, DATE '0001-01-01') INTO v_From FROM ExpirySweep;
+    LOOP
+        SAVEPOINT sweep_batch;
+        BEGIN
+            -- Range scan on BloodInventory_Expiry_Idx from where the sweep got to, oldest units first;
+            -- units already logged are skipped
+            SELECT b.Inventory_ID, b.Blood_Type, b.Blood_Component, b.Expiry_Date
+            BULK COLLECT INTO v_Inventory_IDs, v_Blood_Types, v_Components, v_Expiry_Dates
+            FROM BloodInventory b
+            WHERE b.Expiry_Date >= v_From AND b.Expiry_Date < v_Now
+              AND NOT EXISTS (SELECT 1 FROM ExpiredBlood e WHERE e.Inventory_ID = b.Inventory_ID)
+            ORDER BY b.Expiry_Date
+            FETCH FIRST p_Batch_Size ROWS ONLY;
+
+            SELECT NVL(MAX(Expired_Log_ID), 0) INTO v_Last_ID FROM ExpiredBlood;
+            FORALL i IN 1 .. v_Inventory_IDs.COUNT
+                INSERT INTO ExpiredBlood (Expired_Log_ID, Inventory_ID, Expired_BloodType, Expired_BloodComponent,
+                                          Disposal_Date, Staff_ID, Remarks)
+                VALUES (v_Last_ID + i, v_Inventory_IDs(i), v_Blood_Types(i), v_Components(i),
+                        SYSDATE, p_Staff_ID, 'Expired in storage');
+        EXCEPTION
+            WHEN DUP_VAL_ON_INDEX THEN
+                -- Another session logged rows with the same ids first; take the batch again
+                ROLLBACK TO sweep_batch;
+                CONTINUE;
+        END;
+
+        IF v_Inventory_IDs.COUNT < p_Batch_Size THEN
+            v_Swept_Until := v_Now;
+        ELSE
+            v_Swept_Until := v_Expiry_Dates(v_Expiry_Dates.LAST);
+        END IF;
+        v_From := v_Swept_Until;
+        UPDATE ExpirySweep SET Swept_Until = GREATEST(Swept_Until, v_Swept_Until);
+        IF SQL%ROWCOUNT = 0 THEN
+            INSERT INTO ExpirySweep (Swept_Until) VALUES (v_Swept_Until);
+        END IF;
+
+        p_Swept := p_Swept + v_Inventory_IDs.COUNT;
+        v_Batches := v_Batches + 1;
+        COMMIT;
+
+        EXIT WHEN v_Inventory_IDs.COUNT < p_Batch_Size;
+        EXIT WHEN p_Max_Batches IS NOT NULL AND v_Batches >= p_Max_Batches;
+    END LOOP;
+END;
+/
@@ -0,0 +1,98 @@
+-- Donation intake: a donation and the blood units separated from it, created together in one call.
+-- Donation.Inventory_ID and BloodInventory.Donation_ID reference each other, so both keys of the
+-- cycle are made deferrable; RegisterDonation defers them while it inserts both sides.
+
+-- Recreate the two keys as DEFERRABLE INITIALLY IMMEDIATE; Oracle cannot alter an existing key to deferrable
+BEGIN
+    FOR fk IN (SELECT c.Table_Name, c.Constraint_Name, cc.Column_Name,
+                      r.Table_Name AS Ref_Table, rc.Column_Name AS Ref_Column
+               FROM user_constraints c
+               JOIN user_cons_columns cc ON cc.Constraint_Name = c.Constraint_Name
+               JOIN user_constraints r ON r.Constraint_Name = c.R_Constraint_Name
+               JOIN user_cons_columns rc ON rc.Constraint_Name = r.Constraint_Name
+               WHERE c.Constraint_Name IN ('FK_DONATION_INVENTORY', 'FK_BLOODINVENTORY_DONATION')
+                 AND c.Deferrable = 'NOT DEFERRABLE') LOOP
+        EXECUTE IMMEDIATE 'ALTER TABLE ' || fk.Table_Name || ' DROP CONSTRAINT ' || fk.Constraint_Name;
+        EXECUTE IMMEDIATE 'ALTER TABLE ' || fk.Table_Name || ' ADD CONSTRAINT ' || fk.Constraint_Name
+                          || ' FOREIGN KEY (' || fk.Column_Name || ') REFERENCES ' || fk.Ref_Table
+                          || '(' || fk.Ref_Column || ') DEFERRABLE INITIALLY IMMEDIATE';
+    END LOOP;
+END;
+/
+
+-- New donations and units are numbered after the highest ids in the tables when they are inserted,
+-- as on every other write path, which all insert explicit ids; replaces the Donation_Seq and
+-- BloodInventory_Seq of earlier versions, which fell behind those ids
+BEGIN
+    FOR old_sequence IN (SELECT sequence_name FROM user_sequences
+                         WHERE sequence_name IN ('DONATION_SEQ', 'BLOODINVENTORY_SEQ')) LOOP
+        EXECUTE IMMEDIATE 'DROP SEQUENCE ' || old_sequence.sequence_name;
+    END LOOP;
+END;
+/
+
+-- Collections the units are passed in, one element per unit (IdList comes from Triggers.sql)
+CREATE OR REPLACE TYPE NameList AS TABLE OF VARCHAR2(50);
+/
+CREATE OR REPLACE TYPE NumberList AS TABLE OF NUMBER;
+/
+CREATE OR REPLACE TYPE DateList AS TABLE OF DATE;
+/
+
+CREATE OR REPLACE PROCEDURE RegisterDonation (
+    p_Donor_ID INT,
+    p_Donated_BloodType VARCHAR,
+    p_Donated_Quantity INT,
+    p_Donation_Date DATE,
+    p_Recipient_ID INT,
+    p_Components NameList,
+    p_Quantities NumberList,
+    p_Temperatures NumberList,
+    p_Expiry_Dates DateList,
+    p_Donation_ID OUT INT,
+    p_Inventory_IDs OUT IdList
+) AS
+    v_Donation_ID Donation.Donation_ID%TYPE;
+    v_First_Unit BloodInventory.Inventory_ID%TYPE;
+BEGIN
+    -- Each side of the cycle is inserted already pointing at the other; the keys are checked below
+    EXECUTE IMMEDIATE 'SET CONSTRAINTS FK_Donation_Inventory, FK_BloodInventory_Donation DEFERRED';
+
+    LOOP
+        SAVEPOINT register_donation;
+        BEGIN
+            SELECT NVL(MAX(Donation_ID), 0) + 1 INTO v_Donation_ID FROM Donation;
+            SELECT NVL(MAX(Inventory_ID), 0) + 1 INTO v_First_Unit FROM BloodInventory;
+
+            -- All units in one bulk insert, numbered from v_First_Unit
+            p_Inventory_IDs := IdList();
+            FORALL i IN 1 .. p_Components.COUNT
+                INSERT INTO BloodInventory (Inventory_ID, Blood_Type, Blood_Component, Quantity, Temperature,
+                                            Expiry_Date, Donation_ID)
+                VALUES (v_First_Unit + i - 1, p_Donated_BloodType, p_Components(i), p_Quantities(i),
+                        p_Temperatures(i), p_Expiry_Dates(i), v_Donation_ID)
+                RETURNING Inventory_ID BULK COLLECT INTO p_Inventory_IDs;
+
+            IF p_Inventory_IDs.COUNT = 0 THEN
+                v_First_Unit := NULL;
+            END IF;
+
+            -- The donation records its first unit; the donation trigger rules run on this insert
+            INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, Donation_Date,
+                                  Recipient_ID, Inventory_ID)
+            VALUES (v_Donation_ID, p_Donor_ID, p_Donated_BloodType, p_Donated_Quantity, p_Donation_Date,
+                    p_Recipient_ID, v_First_Unit)
+            RETURNING Donation_ID INTO p_Donation_ID;
+            EXIT;
+        EXCEPTION
+            WHEN DUP_VAL_ON_INDEX THEN
+                -- Another session inserted rows with these ids first; number them again
+                ROLLBACK TO register_donation;
+        END;
+    END LOOP;
+
+    -- Check the keys now, so a broken link fails this call and not the caller's commit. Any error
+    -- undoes everything the call inserted, so intake never leaves half-linked rows behind
+    EXECUTE IMMEDIATE 'SET CONSTRAINTS FK_Donation_Inventory, FK_BloodInventory_Donation IMMEDIATE';
+END;
+/
@@ -0,0 +1,196 @@
+-- SQLite version of ChangeTracking.sql for the embedded engine.
+
+CREATE TABLE ChangeLog (
+    Change_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Table_Name VARCHAR(30) NOT NULL,
+    Row_Key INT,
+    Operation CHAR(1) NOT NULL,
+    Changed_At DATE DEFAULT (datetime('now', 'localtime')) NOT NULL
+);
+
+CREATE INDEX ChangeLog_Table_IX ON ChangeLog (Table_Name, Change_ID);
+
+CREATE TRIGGER Donor_ChangeLog_Insert
+AFTER INSERT ON Donor
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONOR', NEW.Donor_ID, 'I');
+END;
+
+CREATE TRIGGER Donor_ChangeLog_Update
+AFTER UPDATE ON Donor
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'DONOR', OLD.Donor_ID, 'D' WHERE OLD.Donor_ID != NEW.Donor_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONOR', NEW.Donor_ID, 'U');
+END;
+
+CREATE TRIGGER Donor_ChangeLog_Delete
+AFTER DELETE ON Donor
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONOR', OLD.Donor_ID, 'D');
+END;
+
+CREATE TRIGGER Recipient_ChangeLog_Insert
+AFTER INSERT ON Recipient
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('RECIPIENT', NEW.Recipient_ID, 'I');
+END;
+
+CREATE TRIGGER Recipient_ChangeLog_Update
+AFTER UPDATE ON Recipient
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'RECIPIENT', OLD.Recipient_ID, 'D' WHERE OLD.Recipient_ID != NEW.Recipient_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('RECIPIENT', NEW.Recipient_ID, 'U');
+END;
+
+CREATE TRIGGER Recipient_ChangeLog_Delete
+AFTER DELETE ON Recipient
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('RECIPIENT', OLD.Recipient_ID, 'D');
+END;
+
+CREATE TRIGGER Staff_ChangeLog_Insert
+AFTER INSERT ON Staff
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('STAFF', NEW.Staff_ID, 'I');
+END;
+
+CREATE TRIGGER Staff_ChangeLog_Update
+AFTER UPDATE ON Staff
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'STAFF', OLD.Staff_ID, 'D' WHERE OLD.Staff_ID != NEW.Staff_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('STAFF', NEW.Staff_ID, 'U');
+END;
+
+CREATE TRIGGER Staff_ChangeLog_Delete
+AFTER DELETE ON Staff
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('STAFF', OLD.Staff_ID, 'D');
+END;
+
+--DonorScreening has no primary key, so its changes are logged by Donor_ID
+CREATE TRIGGER DonorScreening_ChangeLog_Insert
+AFTER INSERT ON DonorScreening
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONORSCREENING', NEW.Donor_ID, 'I');
+END;
+
+CREATE TRIGGER DonorScreening_ChangeLog_Update
+AFTER UPDATE ON DonorScreening
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'DONORSCREENING', OLD.Donor_ID, 'D' WHERE OLD.Donor_ID != NEW.Donor_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONORSCREENING', NEW.Donor_ID, 'U');
+END;
+
+CREATE TRIGGER DonorScreening_ChangeLog_Delete
+AFTER DELETE ON DonorScreening
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONORSCREENING', OLD.Donor_ID, 'D');
+END;
+
+CREATE TRIGGER Donation_ChangeLog_Insert
+AFTER INSERT ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONATION', NEW.Donation_ID, 'I');
+END;
+
+CREATE TRIGGER Donation_ChangeLog_Update
+AFTER UPDATE ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'DONATION', OLD.Donation_ID, 'D' WHERE OLD.Donation_ID != NEW.Donation_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONATION', NEW.Donation_ID, 'U');
+END;
+
+CREATE TRIGGER Donation_ChangeLog_Delete
+AFTER DELETE ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('DONATION', OLD.Donation_ID, 'D');
+END;
+
+CREATE TRIGGER BloodInventory_ChangeLog_Insert
+AFTER INSERT ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('BLOODINVENTORY', NEW.Inventory_ID, 'I');
+END;
+
+CREATE TRIGGER BloodInventory_ChangeLog_Update
+AFTER UPDATE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'BLOODINVENTORY', OLD.Inventory_ID, 'D' WHERE OLD.Inventory_ID != NEW.Inventory_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('BLOODINVENTORY', NEW.Inventory_ID, 'U');
+END;
+
+CREATE TRIGGER BloodInventory_ChangeLog_Delete
+AFTER DELETE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('BLOODINVENTORY', OLD.Inventory_ID, 'D');
+END;
+
+CREATE TRIGGER ExpiredBlood_ChangeLog_Insert
+AFTER INSERT ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('EXPIREDBLOOD', NEW.Expired_Log_ID, 'I');
+END;
+
+CREATE TRIGGER ExpiredBlood_ChangeLog_Update
+AFTER UPDATE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'EXPIREDBLOOD', OLD.Expired_Log_ID, 'D' WHERE OLD.Expired_Log_ID != NEW.Expired_Log_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('EXPIREDBLOOD', NEW.Expired_Log_ID, 'U');
+END;
+
+CREATE TRIGGER ExpiredBlood_ChangeLog_Delete
+AFTER DELETE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('EXPIREDBLOOD', OLD.Expired_Log_ID, 'D');
+END;
+
+CREATE TRIGGER Transfusion_ChangeLog_Insert
+AFTER INSERT ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('TRANSFUSION', NEW.Transfusion_ID, 'I');
+END;
+
+CREATE TRIGGER Transfusion_ChangeLog_Update
+AFTER UPDATE ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation)
+    SELECT 'TRANSFUSION', OLD.Transfusion_ID, 'D' WHERE OLD.Transfusion_ID != NEW.Transfusion_ID;
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('TRANSFUSION', NEW.Transfusion_ID, 'U');
+END;
+
+CREATE TRIGGER Transfusion_ChangeLog_Delete
+AFTER DELETE ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO ChangeLog (Table_Name, Row_Key, Operation) VALUES ('TRANSFUSION', OLD.Transfusion_ID, 'D');
+END;
@@ -0,0 +1,181 @@
+-- SQLite version of DailyReport.sql for the embedded engine.
+-- MERGE is an INSERT ... ON CONFLICT upsert; the SELECT form needs a WHERE clause to parse.
+
+CREATE TABLE DailyReport (
+    Report_Date DATE NOT NULL,
+    Blood_Type VARCHAR(3) NOT NULL,
+    Blood_Component VARCHAR(50) NOT NULL,
+    Donations INT DEFAULT 0 NOT NULL,
+    Donated_Quantity INT DEFAULT 0 NOT NULL,
+    Transfusions INT DEFAULT 0 NOT NULL,
+    Transfused_Quantity INT DEFAULT 0 NOT NULL,
+    Units_Stocked INT DEFAULT 0 NOT NULL,
+    Stocked_Quantity INT DEFAULT 0 NOT NULL,
+    Units_Expired INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (Report_Date, Blood_Type, Blood_Component)
+);
+
+--Donations, and the units of a donation when it is added, removed or moved to another date
+CREATE TRIGGER Donation_DailyReport_Insert
+AFTER INSERT ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Donations, Donated_Quantity)
+    VALUES (date(NEW.Donation_Date), NEW.Donated_BloodType, 'Whole Blood', 1, COALESCE(NEW.Donated_Quantity, 0))
+    ON CONFLICT DO UPDATE SET Donations = Donations + excluded.Donations,
+                              Donated_Quantity = Donated_Quantity + excluded.Donated_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(NEW.Donation_Date), Blood_Type, Blood_Component, COUNT(*), SUM(Quantity)
+    FROM BloodInventory WHERE Donation_ID = NEW.Donation_ID GROUP BY Blood_Type, Blood_Component
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+CREATE TRIGGER Donation_DailyReport_Update
+AFTER UPDATE ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Donations, Donated_Quantity)
+    VALUES (date(OLD.Donation_Date), OLD.Donated_BloodType, 'Whole Blood', -1, -COALESCE(OLD.Donated_Quantity, 0))
+    ON CONFLICT DO UPDATE SET Donations = Donations + excluded.Donations,
+                              Donated_Quantity = Donated_Quantity + excluded.Donated_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Donations, Donated_Quantity)
+    VALUES (date(NEW.Donation_Date), NEW.Donated_BloodType, 'Whole Blood', 1, COALESCE(NEW.Donated_Quantity, 0))
+    ON CONFLICT DO UPDATE SET Donations = Donations + excluded.Donations,
+                              Donated_Quantity = Donated_Quantity + excluded.Donated_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(OLD.Donation_Date), Blood_Type, Blood_Component, -COUNT(*), -SUM(Quantity)
+    FROM BloodInventory
+    WHERE Donation_ID = OLD.Donation_ID
+      AND (OLD.Donation_ID != NEW.Donation_ID OR date(OLD.Donation_Date) != date(NEW.Donation_Date))
+    GROUP BY Blood_Type, Blood_Component
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(NEW.Donation_Date), Blood_Type, Blood_Component, COUNT(*), SUM(Quantity)
+    FROM BloodInventory
+    WHERE Donation_ID = NEW.Donation_ID
+      AND (OLD.Donation_ID != NEW.Donation_ID OR date(OLD.Donation_Date) != date(NEW.Donation_Date))
+    GROUP BY Blood_Type, Blood_Component
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+CREATE TRIGGER Donation_DailyReport_Delete
+AFTER DELETE ON Donation
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Donations, Donated_Quantity)
+    VALUES (date(OLD.Donation_Date), OLD.Donated_BloodType, 'Whole Blood', -1, -COALESCE(OLD.Donated_Quantity, 0))
+    ON CONFLICT DO UPDATE SET Donations = Donations + excluded.Donations,
+                              Donated_Quantity = Donated_Quantity + excluded.Donated_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(OLD.Donation_Date), Blood_Type, Blood_Component, -COUNT(*), -SUM(Quantity)
+    FROM BloodInventory WHERE Donation_ID = OLD.Donation_ID GROUP BY Blood_Type, Blood_Component
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+--Units stocked, on the date of their donation; a unit whose donation is not there yet is
+--counted by Donation_DailyReport_Insert
+CREATE TRIGGER BloodInventory_DailyReport_Insert
+AFTER INSERT ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(Donation_Date), NEW.Blood_Type, NEW.Blood_Component, 1, NEW.Quantity
+    FROM Donation WHERE Donation_ID = NEW.Donation_ID
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+CREATE TRIGGER BloodInventory_DailyReport_Update
+AFTER UPDATE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(Donation_Date), OLD.Blood_Type, OLD.Blood_Component, -1, -OLD.Quantity
+    FROM Donation WHERE Donation_ID = OLD.Donation_ID
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(Donation_Date), NEW.Blood_Type, NEW.Blood_Component, 1, NEW.Quantity
+    FROM Donation WHERE Donation_ID = NEW.Donation_ID
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+CREATE TRIGGER BloodInventory_DailyReport_Delete
+AFTER DELETE ON BloodInventory
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Stocked, Stocked_Quantity)
+    SELECT date(Donation_Date), OLD.Blood_Type, OLD.Blood_Component, -1, -OLD.Quantity
+    FROM Donation WHERE Donation_ID = OLD.Donation_ID
+    ON CONFLICT DO UPDATE SET Units_Stocked = Units_Stocked + excluded.Units_Stocked,
+                              Stocked_Quantity = Stocked_Quantity + excluded.Stocked_Quantity;
+END;
+
+CREATE TRIGGER Transfusion_DailyReport_Insert
+AFTER INSERT ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Transfusions, Transfused_Quantity)
+    VALUES (date(NEW.Request_Date), NEW.Requested_BloodType, NEW.Requested_Component, 1, NEW.Requested_Quantity)
+    ON CONFLICT DO UPDATE SET Transfusions = Transfusions + excluded.Transfusions,
+                              Transfused_Quantity = Transfused_Quantity + excluded.Transfused_Quantity;
+END;
+
+CREATE TRIGGER Transfusion_DailyReport_Update
+AFTER UPDATE ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Transfusions, Transfused_Quantity)
+    VALUES (date(OLD.Request_Date), OLD.Requested_BloodType, OLD.Requested_Component, -1, -OLD.Requested_Quantity)
+    ON CONFLICT DO UPDATE SET Transfusions = Transfusions + excluded.Transfusions,
+                              Transfused_Quantity = Transfused_Quantity + excluded.Transfused_Quantity;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Transfusions, Transfused_Quantity)
+    VALUES (date(NEW.Request_Date), NEW.Requested_BloodType, NEW.Requested_Component, 1, NEW.Requested_Quantity)
+    ON CONFLICT DO UPDATE SET Transfusions = Transfusions + excluded.Transfusions,
+                              Transfused_Quantity = Transfused_Quantity + excluded.Transfused_Quantity;
+END;
+
+CREATE TRIGGER Transfusion_DailyReport_Delete
+AFTER DELETE ON Transfusion
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Transfusions, Transfused_Quantity)
+    VALUES (date(OLD.Request_Date), OLD.Requested_BloodType, OLD.Requested_Component, -1, -OLD.Requested_Quantity)
+    ON CONFLICT DO UPDATE SET Transfusions = Transfusions + excluded.Transfusions,
+                              Transfused_Quantity = Transfused_Quantity + excluded.Transfused_Quantity;
+END;
+
+CREATE TRIGGER ExpiredBlood_DailyReport_Insert
+AFTER INSERT ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Expired)
+    VALUES (date(NEW.Disposal_Date), NEW.Expired_BloodType, NEW.Expired_BloodComponent, 1)
+    ON CONFLICT DO UPDATE SET Units_Expired = Units_Expired + excluded.Units_Expired;
+END;
+
+CREATE TRIGGER ExpiredBlood_DailyReport_Update
+AFTER UPDATE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Expired)
+    VALUES (date(OLD.Disposal_Date), OLD.Expired_BloodType, OLD.Expired_BloodComponent, -1)
+    ON CONFLICT DO UPDATE SET Units_Expired = Units_Expired + excluded.Units_Expired;
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Expired)
+    VALUES (date(NEW.Disposal_Date), NEW.Expired_BloodType, NEW.Expired_BloodComponent, 1)
+    ON CONFLICT DO UPDATE SET Units_Expired = Units_Expired + excluded.Units_Expired;
+END;
+
+CREATE TRIGGER ExpiredBlood_DailyReport_Delete
+AFTER DELETE ON ExpiredBlood
+FOR EACH ROW
+BEGIN
+    INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, Units_Expired)
+    VALUES (date(OLD.Disposal_Date), OLD.Expired_BloodType, OLD.Expired_BloodComponent, -1)
+    ON CONFLICT DO UPDATE SET Units_Expired = Units_Expired + excluded.Units_Expired;
+END;
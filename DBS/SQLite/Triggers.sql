@@ -0,0 +1,149 @@
+-- SQLite version of Triggers.sql for the embedded engine.
+-- SQLite triggers fire on a single event, so each INSERT OR UPDATE trigger is split in two.
+-- SYSDATE is datetime('now', 'localtime') and errors keep their ORA- codes.
+
+--Expiry Date Trigger
+CREATE TRIGGER CheckBloodExpiry_Insert
+BEFORE INSERT ON BloodInventory
+FOR EACH ROW
+WHEN NEW.Expiry_Date < datetime('now', 'localtime')
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20001: Cannot insert or update. Blood is expired.');
+END;
+
+CREATE TRIGGER CheckBloodExpiry_Update
+BEFORE UPDATE ON BloodInventory
+FOR EACH ROW
+WHEN NEW.Expiry_Date < datetime('now', 'localtime')
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20001: Cannot insert or update. Blood is expired.');
+END;
+
+--Blood Quantity Trigger: MonitorBloodQuantity only writes to DBMS_OUTPUT, which SQLite does not have
+
+--Check Last Donation Date should be more than 3 months, not counting the row being updated.
+--SQLite lets row triggers read the table they fire on, so these stay per row; Oracle uses
+--the compound trigger check_donation_rules.
+CREATE TRIGGER check_donation_interval_Insert
+BEFORE INSERT ON Donation
+FOR EACH ROW
+WHEN (SELECT MAX(Donation_Date) FROM Donation WHERE Donor_ID = NEW.Donor_ID)
+     > datetime('now', 'localtime', '-3 months')
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20001: Donor is not eligible to donate again within 3 months.');
+END;
+
+CREATE TRIGGER check_donation_interval_Update
+BEFORE UPDATE ON Donation
+FOR EACH ROW
+WHEN (SELECT MAX(Donation_Date) FROM Donation WHERE Donor_ID = NEW.Donor_ID AND Donation_ID != OLD.Donation_ID)
+     > datetime('now', 'localtime', '-3 months')
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20001: Donor is not eligible to donate again within 3 months.');
+END;
+
+--Donor Medical Eligibility Trigger
+CREATE TRIGGER check_donor_eligibility_Insert
+BEFORE INSERT ON Donation
+FOR EACH ROW
+WHEN (SELECT Eligibility_Status FROM Donor WHERE Donor_ID = NEW.Donor_ID) != 'Eligible'
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20002: The donor is not eligible for donation.');
+END;
+
+CREATE TRIGGER check_donor_eligibility_Update
+BEFORE UPDATE ON Donation
+FOR EACH ROW
+WHEN (SELECT Eligibility_Status FROM Donor WHERE Donor_ID = NEW.Donor_ID) != 'Eligible'
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20002: The donor is not eligible for donation.');
+END;
+
+--Check Blood Types are compatible, using BloodCompatibility from Compatibility.sql
+CREATE TRIGGER check_transfusion_blood_type_Insert
+BEFORE INSERT ON Transfusion
+FOR EACH ROW
+WHEN (SELECT Donated_BloodType FROM Donation WHERE Donation_ID = NEW.Donation_ID)
+     != (SELECT Recipient_BloodType FROM Recipient WHERE Recipient_ID = NEW.Recipient_ID)
+     AND NOT EXISTS (SELECT 1 FROM BloodCompatibility c
+                     JOIN BloodTypes d
+                       ON d.Blood_Type = (SELECT Donated_BloodType FROM Donation WHERE Donation_ID = NEW.Donation_ID)
+                     WHERE UPPER(c.Component) = UPPER(NEW.Requested_Component)
+                       AND c.Recipient_Type = (SELECT Recipient_BloodType FROM Recipient
+                                               WHERE Recipient_ID = NEW.Recipient_ID)
+                       AND (c.Donor_Mask & d.Type_Bit) != 0)
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20004: The blood type of the donation is not compatible with the recipient.');
+END;
+
+CREATE TRIGGER check_transfusion_blood_type_Update
+BEFORE UPDATE ON Transfusion
+FOR EACH ROW
+WHEN (SELECT Donated_BloodType FROM Donation WHERE Donation_ID = NEW.Donation_ID)
+     != (SELECT Recipient_BloodType FROM Recipient WHERE Recipient_ID = NEW.Recipient_ID)
+     AND NOT EXISTS (SELECT 1 FROM BloodCompatibility c
+                     JOIN BloodTypes d
+                       ON d.Blood_Type = (SELECT Donated_BloodType FROM Donation WHERE Donation_ID = NEW.Donation_ID)
+                     WHERE UPPER(c.Component) = UPPER(NEW.Requested_Component)
+                       AND c.Recipient_Type = (SELECT Recipient_BloodType FROM Recipient
+                                               WHERE Recipient_ID = NEW.Recipient_ID)
+                       AND (c.Donor_Mask & d.Type_Bit) != 0)
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20004: The blood type of the donation is not compatible with the recipient.');
+END;
+
+--Validation of Medical Requirements of Donor
+CREATE TRIGGER validate_donor_eligibility_Insert
+BEFORE INSERT ON Donor
+FOR EACH ROW
+WHEN UPPER(NEW.Eligibility_Status) = 'ELIGIBLE'
+     AND EXISTS (SELECT 1 FROM DonorScreening
+                 WHERE Donor_ID = NEW.Donor_ID
+                   AND (UPPER(HIV_Test) = 'P' OR
+                        UPPER(Hepatitis_Test) = 'P' OR
+                        UPPER(Syphilis_Test) = 'P' OR
+                        UPPER(Malaria_Test) = 'P'))
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20005: Eligibility cannot be set to "Eligible" because one or more tests are positive in Donor Screening.');
+END;
+
+CREATE TRIGGER validate_donor_eligibility_Update
+BEFORE UPDATE ON Donor
+FOR EACH ROW
+WHEN UPPER(NEW.Eligibility_Status) = 'ELIGIBLE'
+     AND EXISTS (SELECT 1 FROM DonorScreening
+                 WHERE Donor_ID = NEW.Donor_ID
+                   AND (UPPER(HIV_Test) = 'P' OR
+                        UPPER(Hepatitis_Test) = 'P' OR
+                        UPPER(Syphilis_Test) = 'P' OR
+                        UPPER(Malaria_Test) = 'P'))
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20005: Eligibility cannot be set to "Eligible" because one or more tests are positive in Donor Screening.');
+END;
+
+--Check the HB levels Weight and Age of Donor
+CREATE TRIGGER validate_donor_screening_Insert
+AFTER INSERT ON DonorScreening
+FOR EACH ROW
+WHEN NEW.HB_Level < 13 OR NEW.Weight < 50
+     OR (SELECT Donor_Age FROM Donor WHERE Donor_ID = NEW.Donor_ID) > 50
+BEGIN
+    UPDATE Donor
+    SET Eligibility_Status = 'Not Eligible'
+    WHERE Donor_ID = NEW.Donor_ID;
+
+    SELECT RAISE(ABORT, 'ORA-20006: Donor cannot be marked as Eligible due to failing screening conditions.');
+END;
+
+CREATE TRIGGER validate_donor_screening_Update
+AFTER UPDATE ON DonorScreening
+FOR EACH ROW
+WHEN NEW.HB_Level < 13 OR NEW.Weight < 50
+     OR (SELECT Donor_Age FROM Donor WHERE Donor_ID = NEW.Donor_ID) > 50
+BEGIN
+    UPDATE Donor
+    SET Eligibility_Status = 'Not Eligible'
+    WHERE Donor_ID = NEW.Donor_ID;
+
+    SELECT RAISE(ABORT, 'ORA-20006: Donor cannot be marked as Eligible due to failing screening conditions.');
+END;
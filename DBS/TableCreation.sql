@@ -103,11 +103,13 @@ FOREIGN KEY (Recipient_ID) REFERENCES Recipient(Recipient_ID)
 ALTER TABLE Donation
 ADD CONSTRAINT FK_Donation_Inventory
 FOREIGN KEY (Inventory_ID) REFERENCES BloodInventory(Inventory_ID)
+DEFERRABLE INITIALLY IMMEDIATE
 
 -- BLOODINVENTORY FOREIGN KEY
 ALTER TABLE BloodInventory 
 ADD CONSTRAINT FK_BloodInventory_Donation
 FOREIGN KEY (Donation_ID) REFERENCES Donation(Donation_ID)
+DEFERRABLE INITIALLY IMMEDIATE
 
 -- EXPIREDBLOOD FOREIGN KEYS
 ALTER TABLE ExpiredBlood 
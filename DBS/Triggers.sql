@@ -20,40 +20,66 @@ BEGIN
 END;
 /
 
---Check Last Donation Date should be more than 3 months
-CREATE OR REPLACE TRIGGER check_donation_interval
-BEFORE INSERT OR UPDATE ON Donation
-FOR EACH ROW
-DECLARE
-    last_donation_date DATE;
-BEGIN
-    SELECT MAX(donation_date)
-    INTO last_donation_date
-    FROM Donation
-    WHERE donor_id = :NEW.donor_id;
+--Donation rules: one compound trigger collects the rows a statement touches and checks
+--them with one query per rule once the statement is done. Row triggers that query
+--Donation while it is being changed fail with ORA-04091 on multi-row inserts.
 
-    IF last_donation_date IS NOT NULL AND last_donation_date > ADD_MONTHS(SYSDATE, -3) THEN
-        RAISE_APPLICATION_ERROR(-20001, 'Donor is not eligible to donate again within 3 months.');
-    END IF;
+--Replaces the row triggers check_donation_interval and check_donor_eligibility
+BEGIN
+    FOR old_trigger IN (SELECT trigger_name FROM user_triggers
+                        WHERE trigger_name IN ('CHECK_DONATION_INTERVAL', 'CHECK_DONOR_ELIGIBILITY')) LOOP
+        EXECUTE IMMEDIATE 'DROP TRIGGER ' || old_trigger.trigger_name;
+    END LOOP;
 END;
 /
 
---Donor Medical Eligibility Trigger
-CREATE OR REPLACE TRIGGER check_donor_eligibility
-BEFORE INSERT OR UPDATE ON Donation
-FOR EACH ROW
-DECLARE
-    eligibility_status VARCHAR2(20);
-BEGIN
-    SELECT eligibility_status
-    INTO eligibility_status
-    FROM Donor
-    WHERE donor_id = :NEW.donor_id;
+--Id collection that can be queried with TABLE()
+CREATE OR REPLACE TYPE IdList AS TABLE OF NUMBER;
+/
 
-    IF eligibility_status != 'Eligible' THEN
-        RAISE_APPLICATION_ERROR(-20002, 'The donor is not eligible for donation.');
-    END IF;
-END;
+CREATE OR REPLACE TRIGGER check_donation_rules
+FOR INSERT OR UPDATE ON Donation
+COMPOUND TRIGGER
+    donation_ids IdList := IdList();
+    donor_ids IdList := IdList();
+
+    --Only rows that were written: under FORALL ... SAVE EXCEPTIONS a row refused by a constraint
+    --does not reach AFTER EACH ROW, so its donor is not checked
+    AFTER EACH ROW IS
+    BEGIN
+        donation_ids.EXTEND;
+        donation_ids(donation_ids.LAST) := :NEW.Donation_ID;
+        donor_ids.EXTEND;
+        donor_ids(donor_ids.LAST) := :NEW.Donor_ID;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+        failed_donor NUMBER;
+    BEGIN
+        --Donor Medical Eligibility
+        SELECT MIN(d.Donor_ID)
+        INTO failed_donor
+        FROM Donor d
+        WHERE d.Donor_ID IN (SELECT COLUMN_VALUE FROM TABLE(donor_ids))
+          AND d.Eligibility_Status != 'Eligible';
+
+        IF failed_donor IS NOT NULL THEN
+            RAISE_APPLICATION_ERROR(-20002, 'The donor is not eligible for donation. (Donor ID ' || failed_donor || ')');
+        END IF;
+
+        --Last Donation Date should be more than 3 months, not counting the row itself
+        SELECT MIN(n.Donor_ID)
+        INTO failed_donor
+        FROM Donation n
+        JOIN Donation p ON p.Donor_ID = n.Donor_ID AND p.Donation_ID != n.Donation_ID
+        WHERE n.Donation_ID IN (SELECT COLUMN_VALUE FROM TABLE(donation_ids))
+          AND p.Donation_Date > ADD_MONTHS(SYSDATE, -3);
+
+        IF failed_donor IS NOT NULL THEN
+            RAISE_APPLICATION_ERROR(-20001, 'Donor is not eligible to donate again within 3 months. (Donor ID ' || failed_donor || ')');
+        END IF;
+    END AFTER STATEMENT;
+END check_donation_rules;
 /
 
 --Check Blood Types are compatible
@@ -63,6 +89,7 @@ FOR EACH ROW
 DECLARE
     donation_blood_type VARCHAR2(5);
     recipient_blood_type VARCHAR2(5);
+    compatible NUMBER;
 BEGIN
     SELECT donated_bloodtype
     INTO donation_blood_type
@@ -74,8 +101,18 @@ BEGIN
     FROM Recipient
     WHERE recipient_id = :NEW.recipient_id;
 
-    IF donation_blood_type != recipient_blood_type THEN
-        RAISE_APPLICATION_ERROR(-20004, 'The blood type of the donation and recipient must be the same.');
+    -- Compatible donor types come from BloodCompatibility (Compatibility.sql)
+    SELECT COUNT(*)
+    INTO compatible
+    FROM BloodCompatibility c
+    JOIN BloodTypes d ON d.Blood_Type = donation_blood_type
+    WHERE UPPER(c.Component) = UPPER(:NEW.Requested_Component)
+      AND c.Recipient_Type = recipient_blood_type
+      AND BITAND(c.Donor_Mask, d.Type_Bit) != 0;
+
+    -- Components without compatibility rows still need the same blood type
+    IF compatible = 0 AND donation_blood_type != recipient_blood_type THEN
+        RAISE_APPLICATION_ERROR(-20004, 'The blood type of the donation is not compatible with the recipient.');
     END IF;
 END;
 /
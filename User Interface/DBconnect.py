@@ -1,19 +1,440 @@
-import cx_Oracle
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
 
-def get_connection():
+import sqlite_procedures
+
+try:
+    import cx_Oracle
+except ImportError:
+    # Only needed by the Oracle engine; the embedded SQLite engine runs without it
+    cx_Oracle = None
+
+# Backend selection: "oracle" (default) or "sqlite"
+BACKEND = os.environ.get("BLOODBANK_BACKEND", "oracle")
+
+# Oracle connection settings
+ORACLE_HOST = "localhost"    # database host
+ORACLE_PORT = 1521           # port
+ORACLE_SERVICE = " "         # enter database service name
+ORACLE_USER = "system"       # database username
+ORACLE_PASSWORD = "*******"  # (edit) database password
+
+# Seconds a pooled session may sit idle before it is pinged on checkout
+PING_INTERVAL = 60
+
+# SQLite database file, ":memory:" keeps the whole database in process
+SQLITE_PATH = os.environ.get("BLOODBANK_SQLITE_PATH", ":memory:")
+
+# Folder holding the SQL scripts (TableCreation.sql, Triggers.sql, ...)
+DBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "DBS")
+
+# Scripts rewritten in SQLite dialect (DBS/SQLite), loaded in this order
+SQLITE_SCRIPTS = ["Triggers.sql", "ChangeTracking.sql", "DailyReport.sql"]
+
+# Exceptions raised by any of the engines, for use in except clauses
+DatabaseError = tuple(cls for cls in (getattr(cx_Oracle, "DatabaseError", None), sqlite3.Error) if cls)
+
+
+class OracleEngine:
+    """Oracle database engine"""
+    name = "oracle"
+    dual = " FROM dual"     # table a SELECT of plain expressions reads from
+    day = "TRUNC({})"       # the date part of a date expression
+    seconds_ago = "SYSDATE - {} / 86400"    # the database time a number of seconds ago
+
+    def dsn(self):
+        """Build the data source name from the connection settings"""
+        return cx_Oracle.makedsn(ORACLE_HOST, ORACLE_PORT, service_name=ORACLE_SERVICE)
+
+    def connect(self):
+        """Open a new connection to the Oracle server"""
+        if cx_Oracle is None:
+            raise RuntimeError("cx_Oracle is not installed")
+        return cx_Oracle.connect(user=ORACLE_USER, password=ORACLE_PASSWORD, dsn=self.dsn())
+
+    def create_pool(self, min, max, increment, stmtcachesize, ping_interval):
+        """Create a cx_Oracle session pool"""
+        if cx_Oracle is None:
+            raise RuntimeError("cx_Oracle is not installed")
+        pool = cx_Oracle.SessionPool(user=ORACLE_USER, password=ORACLE_PASSWORD, dsn=self.dsn(),
+                                     min=min, max=max, increment=increment, threaded=True,
+                                     getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT)
+        pool.stmtcachesize = stmtcachesize
+        pool.ping_interval = ping_interval
+        return pool
+
+    def paginate(self, sql, offset=False):
+        """Limit a query to :page_size rows, skipping :page_offset rows when offset is True"""
+        if offset:
+            return f"{sql} OFFSET :page_offset ROWS FETCH NEXT :page_size ROWS ONLY"
+        return f"{sql} FETCH FIRST :page_size ROWS ONLY"
+
+    def collection(self, cursor, type_name, values=None):
+        """Bind value for a PL/SQL collection type: filled with values, or an OUT variable when values is None"""
+        object_type = cursor.connection.gettype(type_name.upper())
+        if values is None:
+            return cursor.var(object_type)
+        return object_type.newobject(list(values))
+
+    def lock_rows(self, cursor, sql, params=None):
+        """Run a query and keep the rows it returns from changing until the transaction ends"""
+        cursor.execute(sql + " FOR UPDATE", params or {})
+        return cursor.fetchall()
+
+
+class SQLiteEngine:
+    """Embedded SQLite engine running the schema and rules from the DBS folder"""
+    name = "sqlite"
+    dual = ""
+    day = "date({})"
+    seconds_ago = "datetime('now', 'localtime', '-' || {} || ' seconds')"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.procedures = {}
+        self._keepalive = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open a new connection, creating the schema on first use"""
+        if self.path == ":memory:":
+            # Named shared-cache database so every connection sees the same data
+            raw = sqlite3.connect("file:bloodbank?mode=memory&cache=shared", uri=True,
+                                  check_same_thread=False, timeout=10)
+        else:
+            raw = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute("PRAGMA foreign_keys = ON")
+        conn = SQLiteConnection(raw, self)
+
+        with self._lock:
+            if not self.procedures:
+                self.procedures = load_procedures(read_script("ProcedureCreation.sql"))
+            if not raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Donor'").fetchone():
+                self.create_schema(raw)
+            if self.path == ":memory:" and self._keepalive is None:
+                # The in-memory database lives only as long as one connection stays open
+                self._keepalive = raw
+        return conn
+
+    def create_pool(self, min, max, increment, stmtcachesize, ping_interval):
+        """Create a pool of SQLite connections"""
+        return SQLitePool(self, min, max, increment, ping_interval)
+
+    def paginate(self, sql, offset=False):
+        """Limit a query to :page_size rows, skipping :page_offset rows when offset is True"""
+        if offset:
+            return f"{sql} LIMIT :page_size OFFSET :page_offset"
+        return f"{sql} LIMIT :page_size"
+
+    def collection(self, cursor, type_name, values=None):
+        """Collections reach the Python procedures as plain lists; OUT ones come back in callproc's result"""
+        return None if values is None else list(values)
+
+    def lock_rows(self, cursor, sql, params=None):
+        """SQLite locks the whole database rather than rows: take the write lock, then run the query"""
+        if not cursor.connection.raw.in_transaction:
+            cursor.raw.execute("BEGIN IMMEDIATE")
+        cursor.execute(sql, params or {})
+        return cursor.fetchall()
+
+    def create_schema(self, raw):
+        """Create tables, views and triggers from the DBS scripts"""
+        statements = translate_tables(read_script("TableCreation.sql"))
+        statements += split_statements(read_script("ViewsCreation.sql"))
+        statements += split_statements(read_script("Compatibility.sql"))
+        for script in SQLITE_SCRIPTS:
+            statements += split_sqlite_script(read_script(os.path.join("SQLite", script)))
+        for sql in statements:
+            raw.execute(sql)
+        raw.commit()
+
+        # Bring a new database straight to the latest schema version
+        import migrations
+        migrations.migrate(SQLiteConnection(raw, self))
+
+
+class SQLiteConnection:
+    """Connection wrapper giving sqlite3 the parts of the cx_Oracle API the app uses"""
+
+    def __init__(self, raw, engine):
+        self.raw = raw
+        self.engine = engine
+
+    def cursor(self):
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self):
+        self.raw.execute("SELECT 1").fetchone()
+
+    def cancel(self):
+        """Interrupt the statement running on this connection"""
+        self.raw.interrupt()
+
+    def close(self):
+        if self.raw is not self.engine._keepalive:
+            self.raw.close()
+
+
+class SQLitePool:
+    """Session pool for the SQLite engine with the cx_Oracle.SessionPool interface"""
+
+    def __init__(self, engine, min, max, increment, ping_interval):
+        self.engine = engine
+        self.max = max
+        self.increment = increment
+        self.ping_interval = ping_interval
+        self.idle = []
+        self.opened = 0
+        self._available = threading.Condition()
+        with self._available:
+            self._grow(min)
+
+    def _grow(self, count):
+        for _ in range(min(count, self.max - self.opened)):
+            self.idle.append((self.engine.connect(), time.monotonic()))
+            self.opened += 1
+
+    def acquire(self):
+        with self._available:
+            while not self.idle:
+                if self.opened < self.max:
+                    self._grow(self.increment)
+                else:
+                    self._available.wait()
+            conn, idle_since = self.idle.pop()
+        if time.monotonic() - idle_since > self.ping_interval:
+            try:
+                conn.ping()
+            except sqlite3.Error:
+                self.drop(conn)
+                return self.acquire()
+        return conn
+
+    def release(self, conn):
+        # Like cx_Oracle, anything left uncommitted is rolled back on release
+        conn.rollback()
+        with self._available:
+            self.idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    def drop(self, conn):
+        with self._available:
+            self.opened -= 1
+            self._available.notify()
+        conn.close()
+
+    def close(self):
+        with self._available:
+            for conn, _ in self.idle:
+                conn.close()
+            self.opened -= len(self.idle)
+            self.idle = []
+
+
+class SQLiteCursor:
+    """Cursor wrapper with Oracle style column names and stored procedure calls"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.raw = connection.raw.cursor()
+        self.arraysize = 100
+        self.prefetchrows = 2   # accepted for cx_Oracle compatibility, sqlite3 fetches rows on demand
+        self.batch_errors = []
+        self.dml_row_counts = []
+
+    @property
+    def description(self):
+        # Oracle reports unquoted identifiers in upper case
+        if self.raw.description is None:
+            return None
+        return [(desc[0].upper(),) + tuple(desc[1:]) for desc in self.raw.description]
+
+    @property
+    def rowcount(self):
+        return self.raw.rowcount
+
+    def execute(self, sql, parameters=()):
+        self.raw.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters, batcherrors=False, arraydmlrowcounts=False):
+        """Run a statement for each set of binds, like cx_Oracle collecting failed rows when batcherrors
+        is set and the rows each set changed when arraydmlrowcounts is set"""
+        if not batcherrors and not arraydmlrowcounts:
+            self.raw.executemany(sql, seq_of_parameters)
+            return
+        self.batch_errors = []
+        self.dml_row_counts = []
+        for offset, parameters in enumerate(seq_of_parameters):
+            try:
+                # A failing row only undoes its own statement, the rows before it stay in the transaction
+                self.raw.execute(sql, parameters)
+            except (sqlite3.IntegrityError, sqlite3.DataError) as e:
+                if not batcherrors:
+                    raise
+                self.batch_errors.append(BatchError(offset, str(e)))
+                self.dml_row_counts.append(0)
+            else:
+                self.dml_row_counts.append(self.raw.rowcount)
+
+    def getbatcherrors(self):
+        return self.batch_errors
+
+    def getarraydmlrowcounts(self):
+        return self.dml_row_counts
+
+    def callproc(self, name, parameters=()):
+        """Run a procedure from ProcedureCreation.sql, or its Python version from sqlite_procedures"""
+        procedure = self.connection.engine.procedures.get(name.lower())
+        if procedure is None and name.lower() in sqlite_procedures.PROCEDURES:
+            return sqlite_procedures.PROCEDURES[name.lower()](self, *parameters)
+        if procedure is None:
+            raise sqlite3.OperationalError(f"PLS-00201: identifier '{name.upper()}' must be declared")
+        param_names, statements = procedure
+        binds = dict(zip(param_names, parameters))
+        for sql in statements:
+            self.raw.execute(sql, binds)
+        return list(parameters)
+
+    def var(self, type):
+        """OUT parameter placeholder; the procedures return OUT values in callproc's result"""
+        return None
+
+    def fetchone(self):
+        return self.raw.fetchone()
+
+    def fetchmany(self, size=None):
+        return self.raw.fetchmany(size or self.arraysize)
+
+    def fetchall(self):
+        return self.raw.fetchall()
+
+    def close(self):
+        self.raw.close()
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+class BatchError:
+    """Row that failed in executemany(batcherrors=True), with the fields of a cx_Oracle batch error"""
+
+    def __init__(self, offset, message):
+        self.offset = offset
+        self.message = message
+        code = re.match(r"ORA-(\d+)", message)
+        self.code = int(code.group(1)) if code else 0
+
+    def __str__(self):
+        return self.message
+
+
+def read_script(name):
+    """Read a SQL script from the DBS folder"""
+    with open(os.path.join(DBS_DIR, name), encoding="utf-8") as script:
+        return script.read()
+
+
+def strip_comments(sql):
+    return re.sub(r"--[^\n]*", "", sql)
+
+
+def split_statements(sql):
+    """Split a plain SQL script on semicolons"""
+    return [stmt.strip() for stmt in strip_comments(sql).split(";") if stmt.strip()]
+
+
+def split_sqlite_script(sql):
+    """Split a SQLite script into statements, keeping trigger bodies whole"""
+    statements = []
+    current = ""
+    for line in strip_comments(sql).splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return statements
+
+
+def translate_tables(sql):
+    """Rewrite TableCreation.sql for SQLite, folding the ALTER TABLE constraints into CREATE TABLE"""
+    sql = strip_comments(sql)
+    foreign_keys = {}
+    for table, constraint, column, ref_table, ref_column in re.findall(
+            r"ALTER TABLE\s+(\w+)\s+ADD CONSTRAINT\s+(\w+)\s+FOREIGN KEY\s*\((\w+)\)\s*"
+            r"REFERENCES\s+(\w+)\s*\((\w+)\)", sql, re.IGNORECASE):
+        foreign_keys.setdefault(table.lower(), []).append(
+            f"CONSTRAINT {constraint} FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})")
+    modified = {}
+    for table, column, col_type in re.findall(r"ALTER TABLE\s+(\w+)\s+MODIFY\s+(\w+)\s+([\w()]+)",
+                                               sql, re.IGNORECASE):
+        modified[(table.lower(), column.lower())] = col_type
+
+    statements = []
+    for table, body in re.findall(r"CREATE TABLE\s+(\w+)\s*\((.*?)\);", sql, re.IGNORECASE | re.DOTALL):
+        columns = [col.strip() for col in body.split(",\n") if col.strip()]
+        for i, col in enumerate(columns):
+            col_name = col.split()[0]
+            if (table.lower(), col_name.lower()) in modified:
+                parts = col.split()
+                parts[1] = modified[(table.lower(), col_name.lower())]
+                columns[i] = " ".join(parts)
+        columns += foreign_keys.get(table.lower(), [])
+        statements.append(f"CREATE TABLE {table} (\n    " + ",\n    ".join(columns) + "\n)")
+    return statements
+
+
+def load_procedures(sql):
+    """Parse the DML-only procedures of a PL/SQL script into bindable statements"""
+    procedures = {}
+    for name, params, body in re.findall(
+            r"CREATE OR REPLACE PROCEDURE\s+(\w+)\s*(?:\(([^;]*?)\))?\s*AS\s+BEGIN\s+(.*?)\s*END;",
+            strip_comments(sql), re.IGNORECASE | re.DOTALL):
+        param_names = [param.split()[0] for param in params.split(",") if param.strip()]
+        statements = [re.sub(r"\b(p_\w+)\b", r":\1", stmt.strip())
+                      for stmt in body.split(";") if stmt.strip()]
+        if all(stmt.split()[0].upper() in ("INSERT", "UPDATE", "DELETE") for stmt in statements):
+            procedures[name.lower()] = (param_names, statements)
+    return procedures
+
+
+# Store Python dates the way the SQLite trigger rules compare them
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "seconds"))
+
+ENGINES = {"oracle": OracleEngine, "sqlite": SQLiteEngine}
+_engines = {}
+
+
+def get_engine(name=None):
+    """Return the shared engine for the given (or configured) backend"""
+    name = (name or BACKEND).lower()
+    if name not in _engines:
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
+
+
+def engine_for(conn):
+    """Return the engine a connection belongs to"""
+    return getattr(conn, "engine", None) or get_engine("oracle")
+
+
+def get_connection(backend=None):
     try:
-        dsn = cx_Oracle.makedsn(
-            "localhost",   # database host"
-            1521,          # port 
-            service_name=" "  # enter database service name
-        )
-        conn = cx_Oracle.connect(
-            user="system",    # database username
-            password="*******", # (edit) database password
-            dsn=dsn
-        )
+        conn = get_engine(backend).connect()
         print("Database connected!")
         return conn
-    except cx_Oracle.DatabaseError as e:
+    except (RuntimeError,) + DatabaseError as e:
         print("Database connection failed:", e)
         return None
@@ -0,0 +1,149 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from DBconnect import get_engine, DatabaseError, PING_INTERVAL
+
+# Pool settings
+POOL_MIN = 2              # sessions opened up front
+POOL_MAX = 8              # most sessions open at once
+POOL_INCREMENT = 1        # sessions opened when the pool runs dry
+STMT_CACHE_SIZE = 50      # statements cached per session
+RECONNECT_ATTEMPTS = 3    # tries to get a live session before giving up
+
+# Oracle errors meaning the session itself is gone rather than the statement failing
+CONNECTION_LOST_ERRORS = ("ORA-00028", "ORA-01012", "ORA-02396", "ORA-03113", "ORA-03114",
+                          "ORA-03135", "DPI-1010", "DPI-1080")
+
+
+class SessionPool:
+    """Hands out pooled database sessions, one per operation"""
+
+    def __init__(self, backend=None, min=POOL_MIN, max=POOL_MAX, increment=POOL_INCREMENT,
+                 stmtcachesize=STMT_CACHE_SIZE):
+        self.engine = get_engine(backend)
+        self.settings = dict(min=min, max=max, increment=increment, stmtcachesize=stmtcachesize,
+                             ping_interval=PING_INTERVAL)
+        self.pool = self.engine.create_pool(**self.settings)
+        # Sessions out on loan, mapped to the pool they came from
+        self.borrowed = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Borrow a live session, rebuilding the pool if the server went away"""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            pool = self.pool
+            try:
+                conn = pool.acquire()
+            except DatabaseError:
+                if attempt == RECONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(attempt)
+                self.reconnect()
+                continue
+            with self._lock:
+                self.borrowed[id(conn)] = pool
+            return conn
+
+    def release(self, conn):
+        """Give a session back to the pool"""
+        with self._lock:
+            pool = self.borrowed.pop(id(conn), self.pool)
+        pool.release(conn)
+
+    def drop(self, conn):
+        """Close a broken session instead of returning it to the pool"""
+        with self._lock:
+            pool = self.borrowed.pop(id(conn), self.pool)
+        try:
+            pool.drop(conn)
+        except DatabaseError:
+            pass
+
+    def check_health(self):
+        """Ping one session, replacing the pool if the server does not answer"""
+        conn = self.acquire()
+        try:
+            conn.ping()
+        except DatabaseError:
+            self.drop(conn)
+            self.reconnect()
+            return False
+        self.release(conn)
+        return True
+
+    def reconnect(self):
+        """Rebuild the pool after the server went away"""
+        old_pool = self.pool
+        self.pool = self.engine.create_pool(**self.settings)
+        try:
+            old_pool.close()
+        except DatabaseError:
+            pass
+
+    @contextmanager
+    def session(self):
+        """Borrow a session for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except DatabaseError as e:
+            if is_connection_lost(e):
+                self.drop(conn)
+            else:
+                self.rollback_quietly(conn)
+                self.release(conn)
+            raise
+        except BaseException:
+            self.rollback_quietly(conn)
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def run(self, work, retry=True):
+        """Call work(conn) on a pooled session, retrying once on a fresh session if the connection dropped.
+
+        Pass retry=False for writes: the lost connection may have been after the commit, and running
+        the work again would apply it twice.
+        """
+        try:
+            with self.session() as conn:
+                return work(conn)
+        except DatabaseError as e:
+            if not retry or not is_connection_lost(e):
+                raise
+        with self.session() as conn:
+            return work(conn)
+
+    def rollback_quietly(self, conn):
+        try:
+            conn.rollback()
+        except DatabaseError:
+            pass
+
+    def close(self):
+        self.pool.close()
+
+
+def is_connection_lost(error):
+    """Tell whether a database error means the session is no longer usable"""
+    message = str(error)
+    return any(code in message for code in CONNECTION_LOST_ERRORS)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(backend=None):
+    """Return the application wide session pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = SessionPool(backend)
+                print("Database connected!")
+            except (RuntimeError,) + DatabaseError as e:
+                print("Database connection failed:", e)
+        return _pool
@@ -0,0 +1,187 @@
+import threading
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+from DBconnect import DatabaseError
+from instrumentation import InstrumentedConnection
+
+WORKERS = 4             # database calls that may run at the same time
+POLL_INTERVAL = 50      # milliseconds between checks for finished work
+PROGRESS_DELAY = 400    # milliseconds before a progress window is shown
+
+
+class QueryCancelled(Exception):
+    """Raised inside a task once the user has cancelled it"""
+
+
+class NotConnected(Exception):
+    """Raised for work that needs the database when the pool could not be opened"""
+
+
+class QueryTask:
+    """A unit of database work running on a worker thread"""
+
+    def __init__(self, description=""):
+        self.description = description
+        self.future = None
+        self.rows = 0
+        self.cancelled = False
+        self.connection = None
+        self._lock = threading.Lock()
+
+    def report(self, rows):
+        """Record progress from the worker; stops the work if it was cancelled"""
+        self.rows = rows
+        if self.cancelled:
+            raise QueryCancelled()
+
+    def cancel(self):
+        """Cancel the task, interrupting the statement if one is running"""
+        self.cancelled = True
+        if self.future is not None and self.future.cancel():
+            return
+        with self._lock:
+            conn = self.connection
+        if conn is not None:
+            try:
+                conn.cancel()
+            except DatabaseError:
+                pass
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class ProgressDialog:
+    """Small window showing a running task with a Cancel button"""
+
+    def __init__(self, parent, task):
+        self.task = task
+        self.window = tk.Toplevel(parent)
+        self.window.title("Please wait")
+        self.window.geometry("320x130")
+        self.window.resizable(False, False)
+        self.window.configure(bg="#ffffff")
+        self.window.protocol("WM_DELETE_WINDOW", task.cancel)
+
+        self.label = ttk.Label(self.window, text=task.description or "Working...")
+        self.label.pack(pady=(15, 5))
+
+        self.bar = ttk.Progressbar(self.window, mode="indeterminate", length=260)
+        self.bar.pack(pady=5)
+        self.bar.start(15)
+
+        ttk.Button(self.window, text="Cancel", width=10, command=task.cancel).pack(pady=5)
+
+    def update(self):
+        text = self.task.description or "Working..."
+        if self.task.cancelled:
+            text = "Cancelling..."
+        elif self.task.rows:
+            text = f"{text} ({self.task.rows} rows)"
+        self.label.config(text=text)
+
+    def close(self):
+        self.bar.stop()
+        self.window.destroy()
+
+
+class BackgroundExecutor:
+    """Runs database work on a worker pool and hands results back on the Tk thread via root.after"""
+
+    def __init__(self, root, pool=None, workers=WORKERS, recorder=None):
+        self.root = root
+        self.pool = pool
+        # Every statement run by submitted work is timed into this QueryRecorder, when given
+        self.recorder = recorder
+        self.connecting = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.tasks = set()
+
+    def connect(self, open_pool, on_success=None, on_error=None):
+        """Open the pool with open_pool() on a worker thread; work submitted meanwhile waits for it"""
+        def run():
+            pool = open_pool()
+            if pool is None:
+                raise NotConnected("Failed to connect to the database!")
+            self.pool = pool
+            return pool
+
+        task = QueryTask()
+        task.future = self.connecting = self.executor.submit(run)
+        self.watch(task, on_success, on_error)
+        return task
+
+    def session_pool(self):
+        """The open pool, waiting for a connect() still in progress"""
+        if self.pool is None and self.connecting is not None:
+            return self.connecting.result()
+        if self.pool is None:
+            raise NotConnected("Not connected to the database")
+        return self.pool
+
+    def submit(self, work, on_success=None, on_error=None, description="", parent=None, retry=True):
+        """Run work(conn, task) on a pooled session; callbacks run on the Tk thread. Writes pass
+        retry=False, see SessionPool.run"""
+        task = QueryTask(description)
+
+        def run():
+            def call(conn):
+                with task._lock:
+                    task.connection = conn
+                if self.recorder is not None:
+                    conn = InstrumentedConnection(conn, self.recorder)
+                try:
+                    if task.cancelled:
+                        raise QueryCancelled()
+                    return work(conn, task)
+                finally:
+                    if self.recorder is not None:
+                        conn.finish()
+                    with task._lock:
+                        task.connection = None
+            return self.session_pool().run(call, retry)
+
+        task.future = self.executor.submit(run)
+        self.watch(task, on_success, on_error, description, parent)
+        return task
+
+    def watch(self, task, on_success=None, on_error=None, description="", parent=None):
+        """Poll a running task from the Tk loop, showing progress after a delay and delivering its outcome"""
+        self.tasks.add(task)
+        state = {"dialog": None, "waited": 0}
+
+        def poll():
+            if not task.done():
+                state["waited"] += POLL_INTERVAL
+                if description and state["dialog"] is None and state["waited"] >= PROGRESS_DELAY:
+                    state["dialog"] = ProgressDialog(parent or self.root, task)
+                if state["dialog"] is not None:
+                    state["dialog"].update()
+                self.root.after(POLL_INTERVAL, poll)
+                return
+
+            self.tasks.discard(task)
+            if state["dialog"] is not None:
+                state["dialog"].close()
+            if task.cancelled or task.future.cancelled():
+                return
+            error = task.future.exception()
+            if error is None:
+                if on_success:
+                    on_success(task.future.result())
+            elif isinstance(error, QueryCancelled):
+                return
+            elif on_error:
+                on_error(error)
+            else:
+                raise error
+
+        self.root.after(POLL_INTERVAL, poll)
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the worker threads"""
+        for task in list(self.tasks):
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
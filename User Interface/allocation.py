@@ -0,0 +1,188 @@
+"""First-expiry-first-out allocation of blood units to transfusion requests"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+import operations
+from metadata import schema
+
+RESERVATION_TIME = 600  # seconds a proposed unit is held back from other requests
+
+# Units that can still be issued: not expired, not logged as expired and not used by a transfusion
+AVAILABLE_UNITS = ("SELECT b.Inventory_ID, b.Blood_Type, b.Blood_Component, b.Quantity, b.Expiry_Date, "
+                   "b.Donation_ID FROM BloodInventory b "
+                   "WHERE b.Expiry_Date >= :now "
+                   "AND NOT EXISTS (SELECT 1 FROM ExpiredBlood e WHERE e.Inventory_ID = b.Inventory_ID) "
+                   "AND NOT EXISTS (SELECT 1 FROM Transfusion t WHERE t.Inventory_ID = b.Inventory_ID)")
+
+# Tables whose changes can make a unit available or unavailable; each has an Inventory_ID column
+WATCHED_TABLES = ("bloodinventory", "transfusion", "expiredblood")
+
+
+class Unit:
+    """A blood unit in stock"""
+
+    def __init__(self, inventory_id, blood_type, component, quantity, expiry_date, donation_id):
+        self.inventory_id = inventory_id
+        self.blood_type = blood_type
+        self.component = component
+        self.quantity = quantity
+        # SQLite hands dates back as ISO text
+        self.expiry_date = datetime.fromisoformat(expiry_date) if isinstance(expiry_date, str) else expiry_date
+        self.donation_id = donation_id
+
+    @property
+    def group(self):
+        return (self.blood_type, self.component)
+
+
+class InventoryIndex:
+    """Available units in one min-heap per (blood type, component), ordered by expiry date.
+
+    Heap entries are removed lazily: a popped entry only counts if the unit is still
+    in self.units with the same group and expiry date, and is not reserved.
+    """
+
+    def __init__(self, reservation_time=RESERVATION_TIME):
+        self.reservation_time = reservation_time
+        self.units = {}
+        self.heaps = {}
+        self.reserved = {}      # inventory id -> time the reservation lapses
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def add(self, unit):
+        self.units[unit.inventory_id] = unit
+        heapq.heappush(self.heaps.setdefault(unit.group, []),
+                       (unit.expiry_date, unit.inventory_id))
+
+    def remove(self, inventory_id):
+        self.units.pop(inventory_id, None)
+        self.reserved.pop(inventory_id, None)
+
+    def load(self, conn):
+        """Read every available unit and start following the ChangeLog from here"""
+        watermark = operations.change_watermark(conn)
+        rows, _ = operations.query(conn, AVAILABLE_UNITS, {"now": datetime.now()})
+        self.units = {}
+        self.heaps = {}
+        self.reserved = {key: until for key, until in self.reserved.items() if until > time.monotonic()}
+        for row in rows:
+            unit = Unit(*row)
+            self.units[unit.inventory_id] = unit
+            self.heaps.setdefault(unit.group, []).append((unit.expiry_date, unit.inventory_id))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+        self.watermark = watermark
+
+    def sync(self, conn):
+        """Apply inventory, transfusion and expiry changes made since the last load or sync"""
+        if self.watermark is None:
+            self.load(conn)
+            return
+        affected = set()
+        watermark = self.watermark
+        for table_name in WATCHED_TABLES:
+            newest, rows = operations.fetch_changes(conn, table_name, self.watermark)
+            if rows is None:
+                # The ChangeLog entries since the last sync were purged
+                self.load(conn)
+                return
+            inventory_column = schema.table(conn, table_name).index("Inventory_ID")
+            watermark = max(watermark, newest)
+            for key, row in rows.items():
+                if table_name == "bloodinventory":
+                    affected.add(key)
+                elif row is None:
+                    # A deleted transfusion or expiry log may free a unit we cannot identify any more
+                    self.load(conn)
+                    return
+                else:
+                    affected.add(row[inventory_column])
+        affected.discard(None)
+
+        keys = list(affected)
+        rows, _ = operations.fetch_in(conn, AVAILABLE_UNITS + " AND b.Inventory_ID IN ({keys})", keys,
+                                      {"now": datetime.now()})
+        available = {row[0]: row for row in rows}
+        for key in keys:
+            if key in available:
+                unit = Unit(*available[key])
+                current = self.units.get(key)
+                if current is None or current.group != unit.group or current.expiry_date != unit.expiry_date:
+                    self.add(unit)
+                else:
+                    self.units[key] = unit
+            else:
+                self.remove(key)
+        self.watermark = watermark
+
+    def next_units(self, groups, quantity, now):
+        """Pop the earliest-expiring free units across groups until their quantity covers the request"""
+        heaps = [self.heaps[group] for group in groups if self.heaps.get(group)]
+        picked = []
+        seen = set()
+        total = 0
+        while total < quantity:
+            heaps = [heap for heap in heaps if heap]
+            if not heaps:
+                break
+            heap = min(heaps, key=lambda candidate: candidate[0])
+            expiry_date, inventory_id = heapq.heappop(heap)
+            unit = self.units.get(inventory_id)
+            if (unit is None or self.heaps.get(unit.group) is not heap or unit.expiry_date != expiry_date
+                    or inventory_id in seen):
+                continue
+            seen.add(inventory_id)
+            if expiry_date < now:
+                self.remove(inventory_id)
+                continue
+            if self.reserved.get(inventory_id, 0) > time.monotonic():
+                picked.append((unit, False))
+                continue
+            picked.append((unit, True))
+            total += unit.quantity
+        return picked, total
+
+    def allocate(self, conn, blood_type, component, quantity, reserve=False, donor_types=None):
+        """Return the units closest to expiry that together cover the requested quantity.
+
+        donor_types lists the blood types that may serve the request, the requested type
+        first; units of that type are used before the others. Returns an empty list when
+        the stock cannot cover the request. With reserve, the units are held back from
+        other requests for reservation_time seconds.
+        """
+        donor_types = donor_types or [blood_type]
+        with self._lock:
+            self.sync(conn)
+            now = datetime.now()
+            picked, total = self.next_units([(donor_types[0], component)], quantity, now)
+            if total < quantity and len(donor_types) > 1:
+                more, extra = self.next_units([(other, component) for other in donor_types[1:]],
+                                              quantity - total, now)
+                picked += more
+                total += extra
+            # Every unit looked at goes back on its heap; reserved ones are skipped until they lapse
+            for unit, _ in picked:
+                heapq.heappush(self.heaps.setdefault(unit.group, []), (unit.expiry_date, unit.inventory_id))
+            units = [unit for unit, free in picked if free]
+            if total < quantity:
+                return []
+            if reserve:
+                until = time.monotonic() + self.reservation_time
+                for unit in units:
+                    self.reserved[unit.inventory_id] = until
+            return units
+
+    def stock(self):
+        """Return every unit currently available"""
+        with self._lock:
+            return list(self.units.values())
+
+    def release(self, inventory_ids):
+        """Give reserved units back to the pool"""
+        with self._lock:
+            for inventory_id in inventory_ids:
+                self.reserved.pop(inventory_id, None)
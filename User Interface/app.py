@@ -1,15 +1,33 @@
+import time
+# Startup is timed from the first import; see BloodBankApp.mark_startup
+STARTED_AT = time.perf_counter()
+
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import cx_Oracle
-from DBconnect import get_connection 
-from PIL import Image, ImageTk
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from DBconnect import DatabaseError
+from DBpool import get_pool
+from DBworker import BackgroundExecutor
+from virtual_grid import VirtualTable
+from statistics_service import StatisticsService
+from allocation import InventoryIndex
+from compatibility import CompatibilityTable
+from intake import STORAGE, DonationIntake
+import operations
+from metadata import schema
+import instrumentation
+import importlib
+import importlib.util
 import os
-import webbrowser
-from ttkthemes import ThemedTk
-from datetime import datetime
+from datetime import datetime, timedelta
+
+IMPORTED_AT = time.perf_counter()
+
+BATCH_ROWS = 10     # empty rows the batch entry grid starts with, and adds at a time
+FORECAST_POLL = 5000    # milliseconds between checks whether a write made the stock forecast stale
 
 class BloodBankApp:
-    def __init__(self, root):
+    def __init__(self, root, startup_report=False):
         self.root = root
         self.root.title("Life Line - Blood Bank Management System")
         self.root.geometry("1000x700")
@@ -21,14 +39,27 @@ class BloodBankApp:
         self.accent_color = "#1D3557"  # Dark blue
         self.light_accent = "#A8DADC"  # Light blue
         
-        # Connect to database
-        self.conn = get_connection()
-        if not self.conn:
-            messagebox.showerror("Connection Error", "Failed to connect to the database!")
-            root.destroy()
-            return
-        
-        self.cursor = self.conn.cursor()
+        # Seconds since launch at which each startup phase finished
+        self.startup_report = startup_report
+        self.startup_times = {"modules imported": IMPORTED_AT - STARTED_AT}
+        
+        # Database calls run on worker threads so the window never freezes. The pool is opened
+        # on one of them too, so the window shows at once; work submitted meanwhile waits for it
+        self.pool = None
+        self.executor = BackgroundExecutor(root, recorder=instrumentation.recorder)
+        self.executor.connect(get_pool, self.connected, self.connection_failed)
+        self.stats = StatisticsService()
+        self.allocator = InventoryIndex()
+        self.compatibility = CompatibilityTable()
+        # Created on first use, so their modules are not imported before the window shows
+        self.rules = None
+        self.search = None
+        # Re-run after every inventory change to flag blood running low; needs NumPy, which is only
+        # imported by the first forecast, on a worker thread
+        self.forecast_available = importlib.util.find_spec("numpy") is not None
+        self.stock_forecast = None
+        self.forecast_running = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Create styles
         self.style = ttk.Style()
@@ -81,13 +112,45 @@ class BloodBankApp:
         self.notebook.add(self.admin_tab, text="  Admin  ")
         self.notebook.add(self.staff_tab, text="  Staff  ")
         
-        # Initialize all tabs
+        # Initialize the home tab now, the others the first time they are selected
         self.initialize_home_tab()
-        self.initialize_admin_tab()
-        self.initialize_staff_tab()
+        self.tab_builders = {str(self.admin_tab): self.initialize_admin_tab,
+                             str(self.staff_tab): self.initialize_staff_tab}
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         
         # Create footer
         self.create_footer()
+        
+        self.mark_startup("window built")
+        self.root.after_idle(self.mark_startup, "window shown")
+
+    def connected(self, pool):
+        """Called on the Tk thread once the session pool is open"""
+        self.pool = pool
+        self.status_label.config(text="")
+        self.mark_startup("database connected")
+        self.refresh_rules()
+        self.check_stock()
+
+    def connection_failed(self, error):
+        messagebox.showerror("Connection Error", "Failed to connect to the database!")
+        self.on_close()
+
+    def mark_startup(self, phase):
+        """Record when a startup phase finished; print the report once the window is up and connected"""
+        self.startup_times[phase] = time.perf_counter() - STARTED_AT
+        if (self.startup_report and "window shown" in self.startup_times
+                and "database connected" in self.startup_times):
+            print("Startup times (seconds since app.py started loading):")
+            for name, seconds in sorted(self.startup_times.items(), key=lambda item: item[1]):
+                print(f"  {name:<20} {seconds:.3f}")
+            self.startup_report = False
+
+    def on_tab_changed(self, event):
+        """Build a tab the first time it is selected"""
+        builder = self.tab_builders.pop(self.notebook.select(), None)
+        if builder:
+            builder()
 
     def create_header(self):
         """Create a header with logo and title"""
@@ -139,9 +202,20 @@ class BloodBankApp:
                               font=('Arial', 9))
         footer_text.pack(side="left")
         
+        # Blood types and components the stock forecast expects to run short, see check_stock
+        self.stock_label = ttk.Label(footer_frame, text="", font=('Arial', 9, 'bold'), foreground=self.primary_color)
+        self.stock_label.pack(side="left", padx=10)
+        
         help_button = ttk.Button(footer_frame, text="Help", width=8, 
                                command=lambda: messagebox.showinfo("Help", "For assistance, please contact the administrator."))
         help_button.pack(side="right", padx=5)
+        
+        diagnostics_button = ttk.Button(footer_frame, text="Diagnostics", width=11, command=self.view_diagnostics)
+        diagnostics_button.pack(side="right", padx=5)
+        
+        # Shows the connection state until the session pool is open
+        self.status_label = ttk.Label(footer_frame, text="Connecting to the database...", font=('Arial', 9))
+        self.status_label.pack(side="right", padx=10)
 
     # Home Tab
     def initialize_home_tab(self):
@@ -185,7 +259,7 @@ class BloodBankApp:
         # We Offer info box 
         self.create_info_box(right_panel, "We Offer:", 
                            "Blood Types:\nA+, A-, B+, B-, AB+, AB-, O+, O-\n\n"
-                           "Blood Components:\nWhole Blood\nPacked RBCs\nPlatelets\nPlasma\nCryoprecipitate")
+                           "Blood Components:\n" + "\n".join(STORAGE))
         
         # Emergency contacts info box 
         self.create_info_box(right_panel, "Emergency Contacts", 
@@ -206,57 +280,270 @@ class BloodBankApp:
         content_label = ttk.Label(frame, text=content, justify="left")
         content_label.pack(anchor="w", padx=10, pady=(0, 10))
 
+    def check_stock(self):
+        """Re-run the stock forecast in the background once a write made it stale and show low stock in the footer"""
+        if not self.forecast_available:
+            return
+        if not self.forecast_running and (self.stock_forecast is None or self.stock_forecast.needs_refresh()):
+            stock_forecast = self.stock_forecast
+
+            def refresh(conn, task):
+                # The first run imports forecast, and NumPy with it, here rather than on the Tk thread
+                current = stock_forecast or importlib.import_module("forecast").StockForecast()
+                try:
+                    return current, current.refresh(conn)
+                except Exception:
+                    if stock_forecast is None:
+                        current.close()
+                    raise
+
+            def show(result):
+                self.forecast_running = False
+                self.stock_forecast, low = result
+                groups = [f"{row[0]} {row[1]} ({row[6]} days)" for row in low]
+                if len(groups) > 3:
+                    groups = groups[:3] + [f"{len(low) - 3} more"]
+                self.stock_label.config(text=f"Low stock: {', '.join(groups)}" if groups else "")
+
+            def failed(error):
+                # Tried again on the next check; the forecast is advisory only
+                self.forecast_running = False
+
+            self.forecast_running = True
+            self.executor.submit(refresh, show, failed)
+        self.root.after(FORECAST_POLL, self.check_stock)
+
+    def on_close(self):
+        """Stop background database work and close the application"""
+        self.executor.shutdown()
+        self.root.destroy()
+
+    def run_in_background(self, description, work, on_success, parent=None, retry=True):
+        """Run work(conn, task) on a worker thread and pass its result to on_success on the Tk thread"""
+        return self.executor.submit(work, on_success, self.show_database_error,
+                                    description=description, parent=parent, retry=retry)
+
+    def run_query(self, description, sql, params=None, on_success=None, parent=None):
+        """Run a query in the background; on_success receives (rows, column_names)"""
+        return self.run_in_background(
+            description, lambda conn, task: operations.query(conn, sql, params, task.report), on_success, parent)
+
+    def run_page(self, description, table_name, on_success, parent=None):
+        """Fetch the first page of a table in the background; on_success receives (rows, column_names, watermark)"""
+        def work(conn, task):
+            # Read the change watermark first so no change made during the fetch is missed
+            watermark = operations.change_watermark(conn)
+            return operations.fetch_page(conn, table_name) + (watermark,)
+
+        return self.run_in_background(description, work, on_success, parent)
+
+    def run_statement(self, description, sql, params, on_success, parent=None):
+        """Execute and commit a statement in the background, then call on_success()"""
+        return self.run_in_background(
+            description, lambda conn, task: operations.execute(conn, sql, params), lambda _: on_success(), parent,
+            retry=False)
+
+    def run_write(self, description, work, on_success, parent, error_title):
+        """Run an insert, update or delete from operations in the background, reporting rejected input"""
+        def failed(error):
+            if isinstance(error, ValueError):
+                messagebox.showerror(error_title, str(error), parent=parent)
+            else:
+                self.show_database_error(error)
+
+        return self.executor.submit(work, lambda _: on_success(), failed, description=description, parent=parent,
+                                    retry=False)
+
+    def rule_cache(self):
+        """The validation cache, created on first use"""
+        if self.rules is None:
+            from validation import RuleCache
+            self.rules = RuleCache(self.compatibility)
+        return self.rules
+
+    def person_search(self):
+        """The donor and recipient search, created on first use"""
+        if self.search is None:
+            from search import PersonSearch
+            self.search = PersonSearch()
+        return self.search
+
+    def refresh_rules(self):
+        """Bring the validation cache up to date in the background; if it fails the triggers still decide"""
+        rules = self.rule_cache()
+        return self.executor.submit(lambda conn, task: rules.refresh(conn), on_error=lambda error: None)
+
+    def validate(self, table_name, values, parent, updating=False):
+        """Check a submission against the cached trigger rules; return False after reporting a violation"""
+        from validation import RuleViolation
+        try:
+            self.rule_cache().check(table_name, {column.upper(): value for column, value in values.items()},
+                                    updating)
+        except RuleViolation as e:
+            messagebox.showerror("Validation Error", str(e), parent=parent)
+            return False
+        return True
+
+    def show_database_error(self, error):
+        """Report a failed background database call"""
+        if isinstance(error, DatabaseError):
+            messagebox.showerror("Database Error", str(error))
+        else:
+            raise error
+
     def view_blood_inventory(self):
         """View blood inventory data"""
-        try:
-            self.cursor.execute("SELECT * FROM bloodinventory")
-            data = self.cursor.fetchall()
-            column_names = [desc[0] for desc in self.cursor.description]
-            
+        def show(result):
+            data, column_names, watermark = result
             if data:
-                self.display_table(data, column_names, "Blood Inventory")
+                self.display_table(data, column_names, "Blood Inventory", table_name="bloodinventory",
+                                   watermark=watermark)
             else:
                 messagebox.showinfo("No Data", "No inventory records found.")
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+
+        self.run_page("Loading blood inventory...", "bloodinventory", show)
 
     def view_statistics(self):
         """Show system statistics"""
-        try:
-            # Get donor count
-            self.cursor.execute("SELECT COUNT(*) FROM donor")
-            donor_count = self.cursor.fetchone()[0]
-            
-            # Get recipient count
-            self.cursor.execute("SELECT COUNT(*) FROM recipient")
-            recipient_count = self.cursor.fetchone()[0]
-            
-            # Get blood units
-            self.cursor.execute("SELECT COUNT(*) FROM bloodinventory")
-            blood_units = self.cursor.fetchone()[0]
-            
-            # Get transfusion count
-            self.cursor.execute("SELECT COUNT(*) FROM transfusion")
-            transfusion_count = self.cursor.fetchone()[0]
-            
-            stats_window = tk.Toplevel(self.root)
-            stats_window.title("System Statistics")
-            stats_window.geometry("400x300")
-            stats_window.resizable(False, False)
-            stats_window.configure(bg=self.secondary_color)
-            
-            ttk.Label(stats_window, text="System Statistics", style="Header.TLabel").pack(pady=20)
-            
-            stats_frame = ttk.Frame(stats_window)
-            stats_frame.pack(fill="both", expand=True, padx=20, pady=10)
-            
-            self.create_stat_item(stats_frame, "Total Donors ", donor_count, 0)
-            self.create_stat_item(stats_frame, "Total Recipients ", recipient_count, 1)
-            self.create_stat_item(stats_frame, "Blood Units Available ", blood_units, 2)
-            self.create_stat_item(stats_frame, "Transfusions Performed ", transfusion_count, 3)
-            
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+        counts = self.stats.cached()
+        if counts is not None:
+            self.show_statistics(counts)
+            return
+        self.run_in_background("Loading statistics...",
+                               lambda conn, task: self.stats.snapshot(conn), self.show_statistics)
+
+    def show_statistics(self, counts):
+        """Display the statistics window"""
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("System Statistics")
+        stats_window.geometry("460x560")
+        stats_window.resizable(False, False)
+        stats_window.configure(bg=self.secondary_color)
+        
+        ttk.Label(stats_window, text="System Statistics", style="Header.TLabel").pack(pady=20)
+        
+        stats_frame = ttk.Frame(stats_window)
+        stats_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        self.create_stat_item(stats_frame, "Total Donors ", counts["donor"], 0)
+        self.create_stat_item(stats_frame, "Total Recipients ", counts["recipient"], 1)
+        self.create_stat_item(stats_frame, "Blood Units Available ", counts["bloodinventory"], 2)
+        self.create_stat_item(stats_frame, "Transfusions Performed ", counts["transfusion"], 3)
+
+        # Units in stock per blood type and per component
+        row = 4
+        for title, groups in (("By Blood Type", counts["by_blood_type"]), ("By Component", counts["by_component"])):
+            ttk.Label(stats_frame, text=title, style="Subheader.TLabel").grid(row=row, column=0, sticky="w",
+                                                                            pady=(15, 5))
+            row += 1
+            for name, units in sorted(groups.items()):
+                self.create_stat_item(stats_frame, f"{name} ", units, row)
+                row += 1
+
+    def view_daily_report(self):
+        """Ask for a date range and show the daily report totals over it"""
+        import report
+        report_window = tk.Toplevel(self.root)
+        report_window.title("Daily Report")
+        report_window.geometry("420x300")
+        report_window.configure(bg=self.secondary_color)
+        
+        main_frame = ttk.Frame(report_window)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ttk.Label(main_frame, text="Daily Report", style="Header.TLabel").pack(pady=(0, 20))
+        
+        start, end = report.date_range()
+        fields = {}
+        for label, value in (("From (YYYY-MM-DD)", start), ("To (YYYY-MM-DD)", end - timedelta(days=1))):
+            frame = ttk.Frame(main_frame)
+            frame.pack(fill="x", pady=5)
+            ttk.Label(frame, text=f"{label}:", width=20, anchor="e").pack(side="left", padx=(0, 10))
+            entry = ttk.Entry(frame, width=20)
+            entry.insert(0, value.isoformat())
+            entry.pack(side="left", fill="x", expand=True)
+            fields[label] = entry
+        
+        # Breakdowns offered, as report.GROUPS keys
+        breakdowns = {"Blood type and component": ("type", "component"), "Blood type": ("type",),
+                      "Component": ("component",), "Day": ("day",), "Day and blood type": ("day", "type")}
+        frame = ttk.Frame(main_frame)
+        frame.pack(fill="x", pady=5)
+        ttk.Label(frame, text="Totals by:", width=20, anchor="e").pack(side="left", padx=(0, 10))
+        breakdown = ttk.Combobox(frame, values=list(breakdowns), state="readonly", width=25)
+        breakdown.current(0)
+        breakdown.pack(side="left", fill="x", expand=True)
+        
+        def show():
+            try:
+                first, last = (report.parse_day(entry.get().strip()) for entry in fields.values())
+                report.date_range(first, last)
+            except ValueError as e:
+                messagebox.showerror("Input Error", str(e), parent=report_window)
+                return
+            title = f"Daily Report {first} to {last}"
+            self.run_in_background("Loading report...",
+                                   lambda conn, task: report.daily_report(conn, first, last,
+                                                                          breakdowns[breakdown.get()]),
+                                   lambda result: self.display_table(result[0], result[1], title),
+                                   parent=report_window)
+        
+        ttk.Button(main_frame, text="Show", style="Action.TButton", width=10, command=show).pack(pady=20)
+
+    def view_stock_forecast(self):
+        """Show the projected days of supply per blood type and component, shortest first"""
+        if not self.forecast_available:
+            messagebox.showerror("Stock Forecast", "The stock forecast needs NumPy: pip install numpy")
+            return
+        self.run_in_background("Projecting stock...",
+                               lambda conn, task: importlib.import_module("forecast").forecast(conn),
+                               lambda result: self.display_table(result[0], result[1], "Stock Forecast"))
+
+    def view_diagnostics(self):
+        """Show the statements that took the most database time since startup"""
+        window = tk.Toplevel(self.root)
+        window.title("Query Diagnostics")
+        window.geometry("1000x500")
+        window.configure(bg=self.secondary_color)
+        
+        main_frame = ttk.Frame(window)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ttk.Label(main_frame, text="Top Statements by Total Time", style="Header.TLabel").pack(pady=(0, 20))
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill="both", expand=True)
+        
+        scrollbar_y = ttk.Scrollbar(tree_frame)
+        scrollbar_y.pack(side="right", fill="y")
+        
+        columns = ("Statement", "Calls", "Errors", "Total ms", "Mean ms", "p95 ms", "Max ms", "Rows", "Round Trips")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings", yscrollcommand=scrollbar_y.set)
+        scrollbar_y.config(command=tree.yview)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=80, anchor="center")
+        tree.column("Statement", width=400, anchor="w")
+        tree.pack(fill="both", expand=True)
+        
+        def fill():
+            tree.delete(*tree.get_children())
+            for stats in instrumentation.recorder.top():
+                tree.insert("", "end", values=(stats.statement, stats.calls, stats.errors, f"{stats.total_ms:.1f}",
+                                               f"{stats.mean_ms:.1f}", f"{stats.percentile(0.95):g}",
+                                               f"{stats.max_ms:.1f}", stats.rows, stats.round_trips))
+        
+        def reset():
+            instrumentation.recorder.reset()
+            fill()
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x", pady=(10, 0))
+        ttk.Button(button_frame, text="Close", style="TButton", width=10,
+                 command=window.destroy).pack(side="right", padx=5)
+        ttk.Button(button_frame, text="Reset", style="TButton", width=10, command=reset).pack(side="right", padx=5)
+        ttk.Button(button_frame, text="Refresh", style="TButton", width=10, command=fill).pack(side="right", padx=5)
+        fill()
 
     def create_stat_item(self, parent, label, value, row):
         """Create a statistics item with label and value"""
@@ -265,34 +552,49 @@ class BloodBankApp:
             row=row, column=1, sticky="e", pady=5)
 
     def view_donor_data(self):
-        """View donor data based on ID"""
-        donor_id = self.custom_dialog("Donor Query", "Enter Donor ID:")
-        if donor_id:
-            try:
-                self.cursor.execute("SELECT * FROM donorrecord WHERE donor_id = :id", {"id": donor_id})
-                data = self.cursor.fetchall()
-                if data:
-                    column_names = [desc[0] for desc in self.cursor.description]
-                    self.display_table(data, column_names, f"Donor Data - ID: {donor_id}")
-                else:
-                    messagebox.showinfo("No Record", "No Donor found with the given ID.")
-            except cx_Oracle.DatabaseError as e:
-                messagebox.showerror("Database Error", str(e))
+        """Find donors by ID, name, NIC number or contact and show their records"""
+        term = self.custom_dialog("Donor Query", "Enter Donor ID, name, NIC or contact:")
+        if term:
+            self.find_person("donor", "Donor", term.strip())
 
     def view_recipient_data(self):
-        """View recipient data based on ID"""
-        recipient_id = self.custom_dialog("Recipient Query", "Enter Recipient ID:")
-        if recipient_id:
-            try:
-                self.cursor.execute("SELECT * FROM recipientrecord WHERE recipient_id = :id", {"id": recipient_id})
-                data = self.cursor.fetchall()
-                if data:
-                    column_names = [desc[0] for desc in self.cursor.description]
-                    self.display_table(data, column_names, f"Recipient Data - ID: {recipient_id}")
-                else:
-                    messagebox.showinfo("No Record", "No Recipient found with the given ID.")
-            except cx_Oracle.DatabaseError as e:
-                messagebox.showerror("Database Error", str(e))
+        """Find recipients by ID, name, NIC number or contact and show their records"""
+        term = self.custom_dialog("Recipient Query", "Enter Recipient ID, name, NIC or contact:")
+        if term:
+            self.find_person("recipient", "Recipient", term.strip())
+
+    def find_person(self, table_name, label, term):
+        """Search in the background; a single match opens its record, several are listed to pick from"""
+        def show(result):
+            data, column_names = result
+            if not data:
+                messagebox.showinfo("No Record", f"No {label} found matching \"{term}\".")
+            elif len(data) == 1:
+                self.show_person(table_name, label, data[0][0])
+            else:
+                self.display_table(data, column_names, f"{label} Search - {term}",
+                                   on_open=lambda row: self.show_person(table_name, label, row[0]))
+
+        search = self.person_search()
+        self.run_in_background(f"Searching {label.lower()}s...",
+                               lambda conn, task: search.find(conn, table_name, term), show)
+
+    def show_person(self, table_name, label, record_id):
+        """Show one donor's or recipient's record, from the cache when it was viewed recently"""
+        def show(result):
+            data, column_names = result
+            if data:
+                self.display_table(data, column_names, f"{label} Data - ID: {record_id}")
+            else:
+                messagebox.showinfo("No Record", f"No {label} found with the given ID.")
+
+        search = self.person_search()
+        cached = search.records.get(table_name, record_id)
+        if cached is not None:
+            show(cached)
+            return
+        self.run_in_background(f"Looking up {label.lower()}...",
+                               lambda conn, task: search.record(conn, table_name, record_id), show)
 
     def custom_dialog(self, title, prompt):
         """Custom dialog for input with styled appearance"""
@@ -438,93 +740,118 @@ class BloodBankApp:
 
     def admin_table_actions(self, table_name):
         """Display and provide actions for the selected table"""
-        try:
-            # Fetch the data from the selected table
-            self.cursor.execute(f"SELECT * FROM {table_name}")
-            data = self.cursor.fetchall()
-            column_names = [desc[0] for desc in self.cursor.description]
-            
-            # Display the table data in a new window
-            table_window = tk.Toplevel(self.root)
-            table_window.title(f"{table_name.capitalize()} Management")
-            table_window.geometry("800x600")
-            table_window.configure(bg=self.secondary_color)
-            
-            main_frame = ttk.Frame(table_window)
-            main_frame.pack(fill="both", expand=True, padx=20, pady=20)
-            
-            # Title
-            ttk.Label(main_frame, text=f"{table_name.capitalize()} Records", 
-                    style="Header.TLabel").pack(pady=(0, 20))
-            
-            # Table display
-            tree_frame = ttk.Frame(main_frame)
-            tree_frame.pack(fill="both", expand=True)
-            
-            # Create scrollbar
-            scrollbar_y = ttk.Scrollbar(tree_frame)
-            scrollbar_y.pack(side="right", fill="y")
-            
-            scrollbar_x = ttk.Scrollbar(tree_frame, orient="horizontal")
-            scrollbar_x.pack(side="bottom", fill="x")
-            
-            # Create treeview
-            tree = ttk.Treeview(tree_frame, columns=column_names, show="headings",
-                              yscrollcommand=scrollbar_y.set, xscrollcommand=scrollbar_x.set)
-            
-            # Configure scrollbars
-            scrollbar_y.config(command=tree.yview)
-            scrollbar_x.config(command=tree.xview)
-            
-            # Configure columns and headings
-            for col in column_names:
-                tree.heading(col, text=col.upper())
-                tree.column(col, width=100, anchor="center")
-            
-            # Insert data
-            for row in data:
-                tree.insert("", "end", values=row)
-            
-            tree.pack(fill="both", expand=True)
-            
-            # Buttons frame
-            button_frame = ttk.Frame(main_frame)
-            button_frame.pack(fill="x", pady=20)
-            
-            # Action buttons
-            ttk.Button(button_frame, text="Insert Record", style="Action.TButton",
-                     command=lambda: self.insert_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
-            
-            ttk.Button(button_frame, text="Update Record", style="Action.TButton",
-                     command=lambda: self.update_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
-            
-            ttk.Button(button_frame, text="Delete Record", style="Action.TButton",
-                     command=lambda: self.delete_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
-            
-            ttk.Button(button_frame, text="Refresh", style="TButton",
-                     command=lambda: self.refresh_table(table_name, tree)).pack(side="right", padx=5)
-            
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+        self.run_page(f"Loading {table_name}...", table_name,
+                      lambda result: self.show_table_actions(table_name, *result))
+
+    def show_table_actions(self, table_name, data, column_names, watermark=None):
+        """Open the management window for a table"""
+        # Display the table data in a new window
+        table_window = tk.Toplevel(self.root)
+        table_window.title(f"{table_name.capitalize()} Management")
+        table_window.geometry("800x600")
+        table_window.configure(bg=self.secondary_color)
+        
+        main_frame = ttk.Frame(table_window)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Title
+        ttk.Label(main_frame, text=f"{table_name.capitalize()} Records", 
+                style="Header.TLabel").pack(pady=(0, 20))
+        
+        # Table display, loading further pages as the user scrolls
+        tree = VirtualTable(main_frame, self.executor, table_name, column_names, data, watermark,
+                            on_error=self.show_database_error)
+        tree.pack(fill="both", expand=True)
+        
+        # Buttons frame
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x", pady=20)
+        
+        # Action buttons
+        ttk.Button(button_frame, text="Insert Record", style="Action.TButton",
+                 command=lambda: self.insert_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
+        
+        ttk.Button(button_frame, text="Batch Insert", style="Action.TButton",
+                 command=lambda: self.batch_insert_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
+        
+        ttk.Button(button_frame, text="Update Record", style="Action.TButton",
+                 command=lambda: self.update_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
+        
+        ttk.Button(button_frame, text="Delete Record", style="Action.TButton",
+                 command=lambda: self.delete_data(table_name, column_names, table_window, tree)).pack(side="left", padx=5)
+        
+        if table_name.lower() == "donation":
+            ttk.Button(button_frame, text="Register Donation", style="Action.TButton",
+                     command=lambda: self.register_donation(table_window, tree)).pack(side="left", padx=5)
+        
+        from importer import IMPORT_TABLES
+        if table_name.lower() in IMPORT_TABLES:
+            ttk.Button(button_frame, text="Import File", style="Action.TButton",
+                     command=lambda: self.import_data(table_name, table_window, tree)).pack(side="left", padx=5)
+        
+        ttk.Button(button_frame, text="Export", style="TButton",
+                 command=lambda: self.export_data(table_name, table_window)).pack(side="right", padx=5)
+        
+        ttk.Button(button_frame, text="Refresh", style="TButton",
+                 command=lambda: self.refresh_table(table_name, tree)).pack(side="right", padx=5)
 
     def refresh_table(self, table_name, tree):
         """Refresh the treeview with updated data"""
-        try:
-            # Clear existing data
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # Fetch and insert new data
-            self.cursor.execute(f"SELECT * FROM {table_name}")
-            data = self.cursor.fetchall()
-            
-            for row in data:
-                tree.insert("", "end", values=row)
-                
-            messagebox.showinfo("Success", "Table data refreshed successfully!")
-            
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+        tree.refresh(lambda: messagebox.showinfo("Success", "Table data refreshed successfully!"))
+
+    def import_data(self, table_name, parent_window, tree=None):
+        """Load a CSV or JSON Lines file into the table and report the rows that were rejected"""
+        import importer
+        path = filedialog.askopenfilename(parent=parent_window, title=f"Import {table_name.capitalize()} Records",
+                                          filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl *.ndjson")])
+        if not path:
+            return
+
+        def imported(result):
+            message = (f"Read {result['read']} rows, inserted {result['inserted']}, "
+                       f"rejected {len(result['errors'])}.")
+            if tree:
+                tree.refresh()
+            if not result["errors"]:
+                messagebox.showinfo("Import Complete", message, parent=parent_window)
+                return
+            if messagebox.askyesno("Import Complete", message + "\n\nSave the rejected rows to a file?",
+                                   parent=parent_window):
+                report_path = filedialog.asksaveasfilename(parent=parent_window, defaultextension=".csv",
+                                                           initialfile=os.path.basename(path) + ".errors.csv")
+                if report_path:
+                    importer.write_error_report(result["errors"], report_path)
+
+        def failed(error):
+            if isinstance(error, (ValueError, OSError)):
+                messagebox.showerror("Import Error", str(error), parent=parent_window)
+            else:
+                self.show_database_error(error)
+
+        self.executor.submit(lambda conn, task: importer.import_file(conn, table_name, path, progress=task.report),
+                             imported, failed, description="Importing records...", parent=parent_window, retry=False)
+
+    def export_data(self, table_name, parent_window):
+        """Save the whole table to a CSV, JSON Lines or Parquet file"""
+        path = filedialog.asksaveasfilename(parent=parent_window, title=f"Export {table_name.capitalize()} Records",
+                                            initialfile=f"{table_name}.csv", defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"),
+                                                       ("Parquet files", "*.parquet")])
+        if not path:
+            return
+
+        def failed(error):
+            if isinstance(error, (ValueError, RuntimeError, OSError)):
+                messagebox.showerror("Export Error", str(error), parent=parent_window)
+            else:
+                self.show_database_error(error)
+
+        # exporter brings in pyarrow when it is installed, so it is imported on the worker thread
+        self.executor.submit(lambda conn, task: importlib.import_module("exporter").export(
+                                 conn, table_name, path, progress=task.report),
+                             lambda written: messagebox.showinfo("Export Complete", f"Exported {written} rows.",
+                                                                 parent=parent_window),
+                             failed, description="Exporting records...", parent=parent_window)
 
     def insert_data(self, table_name, column_names, parent_window, tree=None):
         """Open a form to insert new data into the selected table"""
@@ -536,6 +863,7 @@ class BloodBankApp:
             insert_window.configure(bg=self.secondary_color)
             insert_window.transient(parent_window)
             insert_window.grab_set()
+            self.refresh_rules()
             
             main_frame = ttk.Frame(insert_window)
             main_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -570,75 +898,41 @@ class BloodBankApp:
                 label = ttk.Label(frame, text=f"{col.upper()}:", width=20, anchor="e")
                 label.pack(side="left", padx=(0, 10))
                 
-                entry = ttk.Entry(frame, width=30)
+                if "component" in col.lower():
+                    # Offer the names the compatibility rules and the trigger are keyed by
+                    entry = ttk.Combobox(frame, values=list(STORAGE), width=28)
+                else:
+                    entry = ttk.Entry(frame, width=30)
                 entry.pack(side="left", fill="x", expand=True)
                 entry_fields[col] = entry
             
             button_frame = ttk.Frame(form_frame)
             button_frame.pack(side="bottom")
             
+            if table_name.lower() == "transfusion":
+                ttk.Button(form_frame, text="Suggest Unit", style="TButton",
+                         command=lambda: self.suggest_unit(entry_fields, insert_window)).pack(pady=5)
+            
             def submit_insert():
                 data = {col: entry.get() for col, entry in entry_fields.items()}
+                if not self.validate(table_name, data, insert_window):
+                    return
                 
-                # Use stored procedures for specific tables
-                if table_name.lower() == "donation":
-                    try:
-                        # Call the InsertDonation procedure
-                        self.cursor.callproc("InsertDonation", [
-                            int(data.get("DONATION_ID")),
-                            int(data.get("DONOR_ID")),
-                            data.get("DONATED_BLOODTYPE"),
-                            int(data.get("DONATED_QUANTITY")),
-                            data.get("DONATION_DATE"),
-                            int(data.get("RECIPIENT_ID")),
-                            int(data.get("INVENTORY_ID"))
-                        ])
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Donation record inserted successfully!")
-                        insert_window.destroy()
-                        if tree:
-                            self.refresh_table(table_name, tree)
-                    except cx_Oracle.DatabaseError as e:
-                        messagebox.showerror("Database Error", str(e))
-                elif table_name.lower() == "transfusion":
-                    try:
-                        # Call the InsertTransfusion procedure
-                        self.cursor.callproc("InsertTransfusion", [
-                            int(data.get("TRANSFUSION_ID")),
-                            int(data.get("RECIPIENT_ID")),
-                            data.get("REQUESTED_BLOODTYPE"),
-                            data.get("REQUESTED_COMPONENT"),
-                            int(data.get("REQUESTED_QUANTITY")),
-                            data.get("REQUEST_DATE"),
-                            data.get("EXCHANGE_TYPE"),
-                            int(data.get("EXCHANGE_DONOR_ID")),
-                            int(data.get("DONATION_ID")),
-                            int(data.get("INVENTORY_ID"))
-                        ])
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Transfusion record inserted successfully!")
-                        insert_window.destroy()
-                        if tree:
-                            self.refresh_table(table_name, tree)
-                    except cx_Oracle.DatabaseError as e:
-                        messagebox.showerror("Database Error", str(e))
-                else:
-                    # Default insert for other tables
-                    placeholders = ", ".join([f":{col}" for col in column_names])
-                    sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
+                def inserted(message):
+                    messagebox.showinfo("Success", message)
+                    insert_window.destroy()
                     
-                    try:
-                        self.cursor.execute(sql, data)
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Record inserted successfully!")
-                        insert_window.destroy()
-                        
-                        # Refresh the table if available
-                        if tree:
-                            self.refresh_table(table_name, tree)
-                            
-                    except cx_Oracle.DatabaseError as e:
-                        messagebox.showerror("Database Error", str(e))
+                    # Refresh the table if available
+                    if tree:
+                        self.refresh_table(table_name, tree)
+                
+                # Donation and Transfusion go through their Insert procedures
+                messages = {"donation": "Donation record inserted successfully!",
+                            "transfusion": "Transfusion record inserted successfully!"}
+                self.run_write("Saving record...",
+                               lambda conn, task: operations.insert_record(conn, table_name, data),
+                               lambda: inserted(messages.get(table_name.lower(), "Record inserted successfully!")),
+                               insert_window, "Input Error")
             
             ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
                      command=insert_window.destroy).pack(side="left", padx=5)
@@ -646,9 +940,250 @@ class BloodBankApp:
             ttk.Button(button_frame, text="Submit", style="Action.TButton", width=10,
                      command=submit_insert).pack(side="right", padx=5)
             
-        except cx_Oracle.DatabaseError as e:
+        except DatabaseError as e:
             messagebox.showerror("Database Error", str(e))
 
+    def register_donation(self, parent_window, tree=None):
+        """Open a form registering a donation together with the blood units separated from it"""
+        register_window = tk.Toplevel(parent_window)
+        register_window.title("Register Donation")
+        register_window.geometry("500x520")
+        register_window.configure(bg=self.secondary_color)
+        register_window.transient(parent_window)
+        register_window.grab_set()
+        self.refresh_rules()
+        
+        main_frame = ttk.Frame(register_window)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ttk.Label(main_frame, text="Register Donation", style="Header.TLabel").pack(pady=(0, 20))
+        
+        entry_fields = {}
+        for label, key in (("DONOR_ID", "donor_id"), ("BLOOD_TYPE", "blood_type"), ("QUANTITY", "quantity"),
+                           ("RECIPIENT_ID", "recipient_id")):
+            frame = ttk.Frame(main_frame)
+            frame.pack(fill="x", pady=5)
+            ttk.Label(frame, text=f"{label}:", width=20, anchor="e").pack(side="left", padx=(0, 10))
+            entry = ttk.Entry(frame, width=30)
+            entry.pack(side="left", fill="x", expand=True)
+            entry_fields[key] = entry
+        entry_fields["quantity"].insert(0, "1")
+        
+        # One row per component: ticked components become units, with their own quantity
+        ttk.Label(main_frame, text="Units:").pack(anchor="w", pady=(15, 5))
+        unit_fields = {}
+        for component in STORAGE:
+            frame = ttk.Frame(main_frame)
+            frame.pack(fill="x", pady=2)
+            selected = tk.BooleanVar(value=False)
+            ttk.Checkbutton(frame, text=component, variable=selected, width=20).pack(side="left")
+            quantity = ttk.Entry(frame, width=8)
+            quantity.insert(0, "1")
+            quantity.pack(side="left")
+            unit_fields[component] = (selected, quantity)
+        
+        def submit():
+            values = {key: entry.get().strip() for key, entry in entry_fields.items()}
+            values["units"] = [{"component": component, "quantity": quantity.get().strip()}
+                               for component, (selected, quantity) in unit_fields.items() if selected.get()]
+            if not values["units"]:
+                messagebox.showerror("Input Error", "Tick at least one component", parent=register_window)
+                return
+            try:
+                intake = DonationIntake.from_values(values)
+            except ValueError as e:
+                messagebox.showerror("Input Error", str(e), parent=register_window)
+                return
+            if not self.validate("donation", {"donor_id": intake.donor_id}, register_window):
+                return
+            
+            def registered(result):
+                donation_id, inventory_ids = result
+                messagebox.showinfo("Success", f"Donation {donation_id} registered with units "
+                                               f"{', '.join(map(str, inventory_ids))}", parent=parent_window)
+                register_window.destroy()
+                if tree:
+                    self.refresh_table("donation", tree)
+            
+            def failed(error):
+                if isinstance(error, ValueError):
+                    messagebox.showerror("Input Error", str(error), parent=register_window)
+                else:
+                    self.show_database_error(error)
+            
+            self.executor.submit(lambda conn, task: intake.register(conn), registered, failed,
+                                 description="Registering donation...", parent=register_window, retry=False)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=20)
+        ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
+                 command=register_window.destroy).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Register", style="Action.TButton", width=10,
+                 command=submit).pack(side="left", padx=5)
+
+    def batch_insert_data(self, table_name, column_names, parent_window, tree=None):
+        """Open a spreadsheet-style grid for entering many records, saved together in one transaction"""
+        from validation import prepare_batch
+        batch_window = tk.Toplevel(parent_window)
+        batch_window.title(f"Batch Insert - {table_name.capitalize()}")
+        batch_window.geometry("1000x500")
+        batch_window.configure(bg=self.secondary_color)
+        batch_window.transient(parent_window)
+        self.refresh_rules()
+        # The table window was opened from a fetched page, so the schema is already loaded
+        table = schema.get(table_name)
+        
+        main_frame = ttk.Frame(batch_window)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ttk.Label(main_frame, text=f"Add {table_name.capitalize()} Records", 
+                style="Header.TLabel").pack(pady=(0, 10))
+        ttk.Label(main_frame, text="Rows left empty are ignored. Rows copied from a spreadsheet can be pasted in."
+                  ).pack(anchor="w", pady=(0, 10))
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(side="bottom", fill="x", pady=(10, 0))
+        
+        grid_area = ttk.Frame(main_frame)
+        grid_area.pack(fill="both", expand=True)
+        canvas = tk.Canvas(grid_area, bg=self.secondary_color, highlightthickness=0)
+        scrollbar_y = ttk.Scrollbar(grid_area, orient="vertical", command=canvas.yview)
+        scrollbar_x = ttk.Scrollbar(grid_area, orient="horizontal", command=canvas.xview)
+        canvas.configure(yscrollcommand=scrollbar_y.set, xscrollcommand=scrollbar_x.set)
+        scrollbar_y.pack(side="right", fill="y")
+        scrollbar_x.pack(side="bottom", fill="x")
+        canvas.pack(side="left", fill="both", expand=True)
+        
+        grid_frame = ttk.Frame(canvas)
+        canvas.create_window((0, 0), window=grid_frame, anchor="nw")
+        grid_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        
+        for j, col in enumerate(column_names):
+            ttk.Label(grid_frame, text=col.upper(), anchor="center").grid(row=0, column=j + 1, padx=1, sticky="ew")
+        
+        # (row number label, entries in column order) for every grid row
+        grid_rows = []
+        
+        def add_rows(count=BATCH_ROWS):
+            for _ in range(count):
+                i = len(grid_rows) + 1
+                number = ttk.Label(grid_frame, text=str(i), width=4, anchor="e")
+                number.grid(row=i, column=0, padx=(0, 5))
+                entries = []
+                for j in range(len(column_names)):
+                    entry = ttk.Entry(grid_frame, width=16)
+                    entry.grid(row=i, column=j + 1, padx=1, pady=1)
+                    entries.append(entry)
+                grid_rows.append((number, entries))
+        
+        def filled_rows():
+            return [i for i, (_, entries) in enumerate(grid_rows) if any(entry.get().strip() for entry in entries)]
+        
+        def paste_rows():
+            """Fill the rows after the last filled one from tab-separated clipboard text"""
+            try:
+                text = batch_window.clipboard_get()
+            except tk.TclError:
+                return
+            lines = [line.split("\t") for line in text.splitlines() if line.strip()]
+            filled = filled_rows()
+            start = filled[-1] + 1 if filled else 0
+            if start + len(lines) > len(grid_rows):
+                add_rows(start + len(lines) - len(grid_rows))
+            for line, (_, entries) in zip(lines, grid_rows[start:]):
+                for value, entry in zip(line, entries):
+                    entry.delete(0, "end")
+                    entry.insert(0, value.strip())
+        
+        def show_errors(errors):
+            """Flag the grid rows at fault and list their messages; errors maps grid row index to message"""
+            for i, (number, _) in enumerate(grid_rows):
+                number.configure(text=f"! {i + 1}" if i in errors else str(i + 1),
+                                 foreground=self.primary_color if i in errors else self.accent_color)
+            listed = "\n".join(f"Row {i + 1}: {message}" for i, message in sorted(errors.items())[:15])
+            if len(errors) > 15:
+                listed += f"\n... and {len(errors) - 15} more"
+            messagebox.showerror("Batch Rejected", f"Nothing was saved. Fix these rows and submit again:\n\n{listed}",
+                                 parent=batch_window)
+        
+        def submit_batch():
+            filled = filled_rows()
+            if not filled:
+                messagebox.showerror("Input Error", "Enter at least one row!", parent=batch_window)
+                return
+            values = [{col: entry.get() for col, entry in zip(column_names, grid_rows[i][1])} for i in filled]
+            records, errors = prepare_batch(self.rule_cache(), table, values)
+            if errors:
+                show_errors({filled[offset]: message for offset, message in errors.items()})
+                return
+            
+            def saved(_):
+                messagebox.showinfo("Success", f"{len(records)} records inserted successfully!", parent=parent_window)
+                batch_window.destroy()
+                # One fetch of the changed rows patches them all into the table
+                if tree:
+                    tree.refresh()
+            
+            def failed(error):
+                if isinstance(error, operations.BatchRejected):
+                    show_errors({filled[offset]: message for offset, message in error.errors})
+                elif isinstance(error, ValueError):
+                    messagebox.showerror("Input Error", str(error), parent=batch_window)
+                else:
+                    self.show_database_error(error)
+            
+            self.executor.submit(lambda conn, task: operations.insert_records(conn, table_name, records),
+                                 saved, failed, description=f"Saving {len(records)} records...", parent=batch_window,
+                                 retry=False)
+        
+        add_rows()
+        
+        ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
+                 command=batch_window.destroy).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Add Rows", style="TButton", width=10,
+                 command=add_rows).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Paste Rows", style="TButton", width=12,
+                 command=paste_rows).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Submit All", style="Action.TButton", width=12,
+                 command=submit_batch).pack(side="right", padx=5)
+
+    def suggest_unit(self, entry_fields, parent_window):
+        """Fill in the compatible unit closest to expiry that covers the requested blood type, component and quantity"""
+        blood_type = entry_fields["REQUESTED_BLOODTYPE"].get().strip()
+        component = entry_fields["REQUESTED_COMPONENT"].get().strip()
+        try:
+            quantity = int(entry_fields["REQUESTED_QUANTITY"].get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Enter the requested blood type, component and quantity first.",
+                                 parent=parent_window)
+            return
+
+        def find(conn, task):
+            table = self.compatibility.load(conn)
+            units = self.allocator.allocate(conn, blood_type, component, quantity, reserve=True,
+                                            donor_types=table.donor_types(blood_type, component))
+            return units, table.servable(self.allocator.stock(), blood_type, component)
+
+        def suggested(result):
+            units, servable = result
+            if not units:
+                available = sum(unit.quantity for unit in servable)
+                messagebox.showinfo("No Stock", f"Only {available} units of {component} compatible with "
+                                    f"{blood_type} are free, which does not cover this request.",
+                                    parent=parent_window)
+                return
+            # A transfusion records one unit; the rest of the proposal is shown for the staff to issue
+            for col, value in (("INVENTORY_ID", units[0].inventory_id), ("DONATION_ID", units[0].donation_id)):
+                entry_fields[col].delete(0, "end")
+                entry_fields[col].insert(0, str(value))
+            if len(units) > 1:
+                listed = ", ".join(f"{unit.inventory_id} ({unit.blood_type}, expires {unit.expiry_date:%d %b %Y})"
+                                   for unit in units)
+                messagebox.showinfo("Suggested Units", f"Units to issue, closest to expiry first: {listed}",
+                                    parent=parent_window)
+
+        self.run_in_background("Finding units...", find, suggested, parent_window)
+
     def update_data(self, table_name, column_names, parent_window, tree=None):
         """Open a form to update existing data in the selected table"""
         try:
@@ -658,6 +1193,9 @@ class BloodBankApp:
             update_window.configure(bg=self.secondary_color)
             update_window.transient(parent_window)
             update_window.grab_set()
+            self.refresh_rules()
+            # The table window was opened from a fetched page, so the schema is already loaded
+            key_column = schema.get(table_name).row_key
             
             main_frame = ttk.Frame(update_window)
             main_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -669,7 +1207,7 @@ class BloodBankApp:
             id_frame = ttk.Frame(main_frame)
             id_frame.pack(fill="x", pady=10)
             
-            ttk.Label(id_frame, text=f"{column_names[0].upper()}:", width=20, anchor="e").pack(
+            ttk.Label(id_frame, text=f"{key_column}:", width=20, anchor="e").pack(
                 side="left", padx=(0, 10))
             
             id_entry = ttk.Entry(id_frame, width=30)
@@ -705,38 +1243,26 @@ class BloodBankApp:
                 if not pk_value or not column or not new_value:
                     messagebox.showerror("Input Error", "All fields are required!")
                     return
+                if not self.validate(table_name, {key_column: pk_value, column: new_value}, update_window,
+                                     updating=True):
+                    return
                 
-                try:
-                    # Use stored procedures for specific tables
-                    if table_name.lower() == "donation":
-                        if column.upper() == "DONATED_QUANTITY":
-                            self.cursor.callproc("UpdateDonation", [int(pk_value), int(new_value)])
-                            self.conn.commit()
-                            messagebox.showinfo("Success", "Donation record updated successfully!")
-                        else:
-                            messagebox.showerror("Update Error", "Only Donated_Quantity can be updated for Donation records")
-                    elif table_name.lower() == "transfusion":
-                        if column.upper() == "REQUESTED_QUANTITY":
-                            self.cursor.callproc("UpdateTransfusion", [int(pk_value), int(new_value)])
-                            self.conn.commit()
-                            messagebox.showinfo("Success", "Transfusion record updated successfully!")
-                        else:
-                            messagebox.showerror("Update Error", "Only Requested_Quantity can be updated for Transfusion records")
-                    else:
-                        # Default update for other tables
-                        sql = f"UPDATE {table_name} SET {column} = :new_value WHERE {column_names[0]} = :pk_value"
-                        self.cursor.execute(sql, {"new_value": new_value, "pk_value": pk_value})
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Record updated successfully!")
-                    
+                def updated(message):
+                    messagebox.showinfo("Success", message)
                     update_window.destroy()
                     
                     # Refresh the table if available
                     if tree:
                         self.refresh_table(table_name, tree)
-                        
-                except cx_Oracle.DatabaseError as e:
-                    messagebox.showerror("Database Error", str(e))
+                
+                # Only the quantity of a Donation or Transfusion can change, through its Update procedure
+                messages = {"donation": "Donation record updated successfully!",
+                            "transfusion": "Transfusion record updated successfully!"}
+                self.run_write("Updating record...",
+                               lambda conn, task: operations.update_record(conn, table_name, pk_value, column,
+                                                                           new_value),
+                               lambda: updated(messages.get(table_name.lower(), "Record updated successfully!")),
+                               update_window, "Update Error")
             
             ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
                      command=update_window.destroy).pack(side="left", padx=5)
@@ -744,7 +1270,7 @@ class BloodBankApp:
             ttk.Button(button_frame, text="Update", style="Action.TButton", width=10,
                      command=submit_update).pack(side="right", padx=5)
             
-        except cx_Oracle.DatabaseError as e:
+        except DatabaseError as e:
             messagebox.showerror("Database Error", str(e))
 
     def delete_data(self, table_name, column_names, parent_window, tree=None):
@@ -756,6 +1282,7 @@ class BloodBankApp:
             delete_window.configure(bg=self.secondary_color)
             delete_window.transient(parent_window)
             delete_window.grab_set()
+            key_column = schema.get(table_name).row_key
             
             main_frame = ttk.Frame(delete_window)
             main_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -772,7 +1299,7 @@ class BloodBankApp:
             id_frame = ttk.Frame(main_frame)
             id_frame.pack(fill="x", pady=10)
             
-            ttk.Label(id_frame, text=f"{column_names[0].upper()}:", width=20, anchor="e").pack(
+            ttk.Label(id_frame, text=f"{key_column}:", width=20, anchor="e").pack(
                 side="left", padx=(0, 10))
             
             id_entry = ttk.Entry(id_frame, width=30)
@@ -793,31 +1320,21 @@ class BloodBankApp:
                 if not confirm:
                     return
                 
-                try:
-                    # Use stored procedures 
-                    if table_name.lower() == "donation":
-                        self.cursor.callproc("DeleteDonation", [int(pk_value)])
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Donation record deleted successfully!")
-                    elif table_name.lower() == "transfusion":
-                        self.cursor.callproc("DeleteTransfusion", [int(pk_value)])
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Transfusion record deleted successfully!")
-                    else:
-                        # Default delete for other tables
-                        sql = f"DELETE FROM {table_name} WHERE {column_names[0]} = :pk_value"
-                        self.cursor.execute(sql, {"pk_value": pk_value})
-                        self.conn.commit()
-                        messagebox.showinfo("Success", "Record deleted successfully!")
-                    
+                def deleted(message):
+                    messagebox.showinfo("Success", message)
                     delete_window.destroy()
                     
                     # Refresh the table if available
                     if tree:
                         self.refresh_table(table_name, tree)
-                        
-                except cx_Oracle.DatabaseError as e:
-                    messagebox.showerror("Database Error", str(e))
+                
+                # Donation and Transfusion go through their Delete procedures
+                messages = {"donation": "Donation record deleted successfully!",
+                            "transfusion": "Transfusion record deleted successfully!"}
+                self.run_write("Deleting record...",
+                               lambda conn, task: operations.delete_record(conn, table_name, pk_value),
+                               lambda: deleted(messages.get(table_name.lower(), "Record deleted successfully!")),
+                               delete_window, "Input Error")
             
             ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
                      command=delete_window.destroy).pack(side="left", padx=5)
@@ -825,11 +1342,15 @@ class BloodBankApp:
             ttk.Button(button_frame, text="Delete", style="Action.TButton", width=10,
                      command=submit_delete).pack(side="right", padx=5)
             
-        except cx_Oracle.DatabaseError as e:
+        except DatabaseError as e:
             messagebox.showerror("Database Error", str(e))
 
-    def display_table(self, data, column_names, title="Database Records"):
-        """Display data in a styled table view"""
+    def display_table(self, data, column_names, title="Database Records", table_name=None, watermark=None,
+                      on_open=None):
+        """Display data in a styled table view; with a table_name, data is the first page and more load on scroll.
+
+        on_open, if given, is called with the values of a row when it is double-clicked.
+        """
         top = tk.Toplevel(self.root)
         top.title(title)
         top.geometry("800x500")
@@ -840,6 +1361,13 @@ class BloodBankApp:
         
         ttk.Label(main_frame, text=title, style="Header.TLabel").pack(pady=(0, 20))
         
+        if table_name:
+            VirtualTable(main_frame, self.executor, table_name, column_names, data, watermark,
+                         on_error=self.show_database_error).pack(fill="both", expand=True)
+            ttk.Button(main_frame, text="Close", command=top.destroy, style="TButton",
+                       width=15).pack(pady=10)
+            return
+        
         tree_frame = ttk.Frame(main_frame)
         tree_frame.pack(fill="both", expand=True)
         
@@ -861,11 +1389,15 @@ class BloodBankApp:
             tree.column(col, width=100, anchor="center")
         
         # Insert data
+        rows = {}
         for row in data:
-            tree.insert("", "end", values=row)
+            rows[tree.insert("", "end", values=row)] = row
         
         tree.pack(fill="both", expand=True)
         
+        if on_open:
+            tree.bind("<Double-1>", lambda event: tree.focus() and on_open(rows[tree.focus()]))
+        
         # Button to close the window
         ttk.Button(main_frame, text="Close", command=top.destroy, style="TButton",
                  width=15).pack(pady=10)
@@ -945,32 +1477,38 @@ class BloodBankApp:
             expired_button = ttk.Button(right_panel, text="Check Expired Blood", style="Dashboard.TButton",
                                   command=self.check_expired_blood)
             expired_button.pack(pady=5, fill="x")
+            
+            forecast_button = ttk.Button(right_panel, text="Stock Forecast", style="Dashboard.TButton",
+                                   command=self.view_stock_forecast)
+            forecast_button.pack(pady=5, fill="x")
+            
+            report_button = ttk.Button(left_panel, text="Daily Report", style="Dashboard.TButton",
+                                 command=self.view_daily_report)
+            report_button.pack(pady=5, fill="x")
                     
             self.staff_logged_in = True
 
     def donor_screening(self):
         """Open form for donor screening"""
-        try:
-            self.cursor.execute("SELECT * FROM donorscreening WHERE 1=0")  
-            column_names = [desc[0] for desc in self.cursor.description]
-            
-            self.insert_data("donorscreening", column_names, None , None)
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+        table = schema.get("donorscreening")
+        if table is not None:
+            self.insert_data("donorscreening", table.column_names, None, None)
+            return
+        self.run_in_background("Opening screening form...",
+                               lambda conn, task: schema.table(conn, "donorscreening").column_names,
+                               lambda column_names: self.insert_data("donorscreening", column_names, None, None))
 
     def check_expired_blood(self):
         """Check and display expired blood units"""
-        try:
-            self.cursor.execute("SELECT * FROM expiredblood")
-            data = self.cursor.fetchall()
-            column_names = [desc[0] for desc in self.cursor.description]
-            
+        def show(result):
+            data, column_names, watermark = result
             if data:
-                self.display_table(data, column_names, "Expired Blood Units")
+                self.display_table(data, column_names, "Expired Blood Units", table_name="expiredblood",
+                                   watermark=watermark)
             else:
                 messagebox.showinfo("Expired Blood", "No expired blood units found.")
-        except cx_Oracle.DatabaseError as e:
-            messagebox.showerror("Database Error", str(e))
+
+        self.run_page("Loading expired blood...", "expiredblood", show)
 
     def create_staff_form(self, title, table_name, column_names):
         """Create a properly aligned staff form with buttons below input fields"""
@@ -978,6 +1516,7 @@ class BloodBankApp:
         form_window.title(title)
         form_window.geometry("600x700")
         form_window.configure(bg=self.secondary_color)
+        self.refresh_rules()
         
         main_frame = ttk.Frame(form_window)
         main_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -1076,18 +1615,18 @@ class BloodBankApp:
             if not all(data.values()):
                 messagebox.showerror("Input Error", "All fields are required!")
                 return
+            if not self.validate(table_name, data, form_window):
+                return
             
             # Prepare the SQL query
             placeholders = ", ".join([f":{col}" for col in column_names])
             sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
             
-            try:
-                self.cursor.execute(sql, data)
-                self.conn.commit()
+            def submitted():
                 messagebox.showinfo("Success", "Record submitted successfully!")
                 form_window.destroy()
-            except cx_Oracle.DatabaseError as e:
-                messagebox.showerror("Database Error", str(e))
+
+            self.run_statement("Submitting record...", sql, data, submitted, form_window)
             
         ttk.Button(button_frame, text="Cancel", style="TButton", width=10,
                  command=form_window.destroy).pack(side="left", padx=5)
@@ -1098,10 +1637,17 @@ class BloodBankApp:
 
 # Main program
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Life Line - Blood Bank Management System")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long each startup phase took")
+    args = parser.parse_args()
+    
     try:
+        # The theme package is optional, so it is only imported here
+        from ttkthemes import ThemedTk
         root = ThemedTk(theme="arc")  
     except:
         root = tk.Tk()
         
-    app = BloodBankApp(root)
+    app = BloodBankApp(root, args.startup_report)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Measure trigger and lookup latency with and without the migration indexes as the tables grow.
+
+Runs on a scratch SQLite database built from the DBS scripts, so no real data is touched.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from DBconnect import SQLiteEngine
+import migrations
+
+SIZES = [1000, 10000, 100000]   # rows in Donation, DonorScreening and BloodInventory
+SAMPLES = 200                   # statements timed per check
+DONATIONS_PER_DONOR = 10
+
+
+def donor_of(row):
+    return (row - 1) // DONATIONS_PER_DONOR + 1
+
+
+def fill(conn, start, size):
+    """Grow the tables from start to size rows, keeping every trigger rule satisfied"""
+    cursor = conn.cursor()
+    today = date.today()
+    donors = range(start // DONATIONS_PER_DONOR + 1, size // DONATIONS_PER_DONOR + 1)
+    cursor.executemany("INSERT INTO Donor (Donor_ID, Donor_Name, Donor_NICnumber, Donor_Age, Donor_Gender, "
+                       "Donor_BloodType, Eligibility_Status) VALUES (:id, :name, :id, 30, 'M', 'O+', 'Eligible')",
+                       [{"id": i, "name": f"Donor {i}"} for i in donors])
+    rows = range(start + 1, size + 1)
+    # Donations more than a year old, so check_donation_interval lets new ones through
+    cursor.executemany("INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, "
+                       "Donation_Date) VALUES (:id, :donor, 'O+', 1, :day)",
+                       [{"id": i, "donor": donor_of(i), "day": today - timedelta(days=400 + i % 1000)} for i in rows])
+    cursor.executemany("INSERT INTO DonorScreening (Donor_ID, HB_Level, Weight, HIV_Test, Hepatitis_Test, "
+                       "Syphilis_Test, Malaria_Test) VALUES (:donor, 14, 70, 'N', 'N', 'N', 'N')",
+                       [{"donor": donor_of(i)} for i in rows])
+    cursor.executemany("INSERT INTO BloodInventory (Inventory_ID, Blood_Type, Blood_Component, Quantity, "
+                       "Expiry_Date, Donation_ID) VALUES (:id, 'O+', 'Whole Blood', 1, :day, :id)",
+                       [{"id": i, "day": today + timedelta(days=1 + i % 42)} for i in rows])
+    conn.commit()
+
+
+def timed(conn, statements):
+    """Run each (sql, binds) pair, returning the median latency in milliseconds; changes are rolled back"""
+    cursor = conn.cursor()
+    latencies = []
+    for sql, binds in statements:
+        started = time.perf_counter()
+        cursor.execute(sql, binds)
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    conn.rollback()
+    return statistics.median(latencies)
+
+
+def checks(size):
+    """The statements whose cost depends on the new indexes"""
+    donors = size // DONATIONS_PER_DONOR
+    sample = random.sample(range(1, donors + 1), min(SAMPLES, donors))
+    soon = date.today() + timedelta(days=7)
+    return {
+        "Donation insert (interval check)": [
+            ("INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, Donation_Date) "
+             "VALUES (:id, :donor, 'O+', 1, :day)",
+             {"id": size + n + 1, "donor": donor, "day": date.today() - timedelta(days=200)})
+            for n, donor in enumerate(sample)],
+        "Donor update (screening check)": [
+            ("UPDATE Donor SET Eligibility_Status = 'Eligible' WHERE Donor_ID = :donor", {"donor": donor})
+            for donor in sample],
+        "Units expiring within a week": [
+            ("SELECT COUNT(*) FROM BloodInventory WHERE Expiry_Date < :day", {"day": soon})] * min(SAMPLES, 20),
+    }
+
+
+def run(sizes, path):
+    engine = SQLiteEngine(path)
+    conn = engine.connect()
+    results = []
+    loaded = 0
+    for size in sizes:
+        migrations.migrate(conn)
+        fill(conn, loaded, size)
+        loaded = size
+        work = checks(size)
+        after = {name: timed(conn, statements) for name, statements in work.items()}
+        migrations.migrate(conn, target=0)
+        before = {name: timed(conn, statements) for name, statements in work.items()}
+        for name in work:
+            results.append((size, name, before[name], after[name]))
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        results = run(sorted(args.sizes), os.path.join(folder, "benchmark.db"))
+
+    print(f"{'Rows':>8}  {'Check':<34} {'No index (ms)':>14} {'Indexed (ms)':>13} {'Speedup':>8}")
+    for size, name, before, after in results:
+        print(f"{size:>8}  {name:<34} {before:>14.3f} {after:>13.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Donation and Transfusion writes in bulk through the array procedures of DBS/BulkProcedures.sql.
+
+Lists of values are bound as collections and applied with FORALL ... SAVE EXCEPTIONS, so
+thousands of rows cost one procedure call per BULK_ROWS rows. Rows the database refuses
+come back as (row offset, message), like cx_Oracle's batch errors. Updates and deletes also
+report the rows whose key matched nothing, with a NOT_FOUND message.
+"""
+
+from metadata import schema
+import operations
+
+BULK_ROWS = 1000    # rows passed per procedure call
+NOT_FOUND = "ORA-01403"     # start of the message of a row whose key matched nothing
+
+# Collection type of each array parameter of the bulk procedures, in order
+PARAMETER_TYPES = {
+    "DONATION_ID": "IdList", "DONOR_ID": "IdList", "DONATED_BLOODTYPE": "NameList", "DONATED_QUANTITY": "NumberList",
+    "DONATION_DATE": "DateList", "RECIPIENT_ID": "IdList", "INVENTORY_ID": "IdList", "TRANSFUSION_ID": "IdList",
+    "REQUESTED_BLOODTYPE": "NameList", "REQUESTED_COMPONENT": "NameList", "REQUESTED_QUANTITY": "NumberList",
+    "REQUEST_DATE": "DateList", "EXCHANGE_TYPE": "NameList", "EXCHANGE_DONOR_ID": "IdList",
+}
+
+
+def bulk_table(table_name):
+    table_name = table_name.lower()
+    if table_name not in operations.PROCEDURE_COLUMNS:
+        raise ValueError(f"Bulk writes are only available for {' and '.join(operations.PROCEDURE_COLUMNS)}")
+    return table_name
+
+
+def as_list(collection):
+    """Elements of a collection OUT parameter: a cx_Oracle object on Oracle, a list on SQLite"""
+    return collection.aslist() if hasattr(collection, "aslist") else list(collection or ())
+
+
+def call_bulk(conn, name, columns, rows):
+    """Run a bulk procedure over rows of scalar values in BULK_ROWS chunks; returns [(row offset, message)]"""
+    cursor = conn.cursor()
+    engine = operations.engine_for(conn)
+    errors = []
+    for start in range(0, len(rows), BULK_ROWS):
+        chunk = rows[start:start + BULK_ROWS]
+        arrays = [engine.collection(cursor, PARAMETER_TYPES[column], values)
+                  for column, values in zip(columns, zip(*chunk))]
+        result = cursor.callproc(name, arrays + [engine.collection(cursor, "IdList"),
+                                                 engine.collection(cursor, "MessageList")])
+        offsets, messages = as_list(result[-2]), as_list(result[-1])
+        errors += [(start + int(offset), message) for offset, message in zip(offsets, messages)]
+    return errors
+
+
+def not_found(errors):
+    """Offsets of the rows whose key matched nothing"""
+    return [offset for offset, message in errors if message.startswith(NOT_FOUND)]
+
+
+def finish(conn, table_name, errors, count, atomic):
+    """Commit what the bulk call applied, or roll all of it back when atomic and a row failed.
+
+    Keys that matched nothing changed nothing, so they do not fail an atomic batch.
+    """
+    errors.sort()
+    failed = [(offset, message) for offset, message in errors if not message.startswith(NOT_FOUND)]
+    if failed and atomic:
+        conn.rollback()
+        raise operations.BatchRejected(failed)
+    conn.commit()
+    if len(errors) < count:
+        operations.notify_write(table_name)
+    return errors
+
+
+def insert_many(conn, table_name, records, atomic=False):
+    """Insert {column: value} records with Insert{Table}s. Returns [(row offset, message)] of the
+    rows refused; the others are committed, unless atomic, which raises BatchRejected instead"""
+    table_name = bulk_table(table_name)
+    table = schema.table(conn, table_name)
+    columns = operations.PROCEDURE_COLUMNS[table_name]
+    rows = []
+    for values in records:
+        values = operations.record_values(table, values)
+        rows.append([values.get(column) for column in columns])
+    errors = call_bulk(conn, f"Insert{table_name.capitalize()}s", columns, rows) if rows else []
+    return finish(conn, table_name, errors, len(rows), atomic)
+
+
+def update_many(conn, table_name, changes, atomic=False):
+    """Set the updatable quantity for (key, value) pairs with Update{Table}s; errors as insert_many"""
+    table_name = bulk_table(table_name)
+    columns = operations.PROCEDURE_COLUMNS[table_name][0], operations.UPDATABLE_COLUMNS[table_name]
+    rows = [list(change) for change in changes]
+    errors = call_bulk(conn, f"Update{table_name.capitalize()}s", columns, rows) if rows else []
+    return finish(conn, table_name, errors, len(rows), atomic)
+
+
+def delete_many(conn, table_name, keys, atomic=False):
+    """Delete the rows with the given keys with Delete{Table}s; errors as insert_many"""
+    table_name = bulk_table(table_name)
+    columns = operations.PROCEDURE_COLUMNS[table_name][:1]
+    rows = [[key] for key in keys]
+    errors = call_bulk(conn, f"Delete{table_name.capitalize()}s", columns, rows) if rows else []
+    return finish(conn, table_name, errors, len(rows), atomic)
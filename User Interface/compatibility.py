@@ -0,0 +1,60 @@
+"""Blood type compatibility as bitmasks, read from the BloodTypes and BloodCompatibility tables"""
+
+import threading
+
+
+class CompatibilityTable:
+    """The compatibility rules the transfusion trigger uses, cached in memory.
+
+    Every blood type has one bit. The mask for a (component, recipient type) pair holds
+    the bits of every donor type that can serve it. Components without rules only accept
+    the recipient's own type, like the trigger.
+    """
+
+    def __init__(self):
+        self.type_bits = {}
+        self.masks = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        """Read the tables once; later calls reuse the cached masks"""
+        with self._lock:
+            if self.loaded:
+                return self
+            cursor = conn.cursor()
+            cursor.execute("SELECT Blood_Type, Type_Bit FROM BloodTypes")
+            self.type_bits = dict(cursor.fetchall())
+            cursor.execute("SELECT Component, Recipient_Type, Donor_Mask FROM BloodCompatibility")
+            self.masks = {(component.upper(), recipient): mask for component, recipient, mask in cursor.fetchall()}
+            self.loaded = True
+        return self
+
+    def donor_mask(self, recipient_type, component):
+        """Bits of the donor types that can serve a recipient type with a component"""
+        mask = self.masks.get((component.strip().upper(), recipient_type))
+        if mask is None:
+            mask = self.type_bits.get(recipient_type, 0)
+        return mask
+
+    def donor_types(self, recipient_type, component):
+        """Donor types that can serve a recipient, the recipient's own type first"""
+        mask = self.donor_mask(recipient_type, component)
+        types = [blood_type for blood_type, bit in sorted(self.type_bits.items(), key=lambda item: item[1])
+                 if bit & mask]
+        if recipient_type in types:
+            types.remove(recipient_type)
+            types.insert(0, recipient_type)
+        return types
+
+    def compatible(self, donor_type, recipient_type, component):
+        return donor_type == recipient_type or bool(
+            self.type_bits.get(donor_type, 0) & self.donor_mask(recipient_type, component))
+
+    def servable(self, units, recipient_type, component):
+        """Filter stock to the units that can serve a request in one pass over their type bits"""
+        mask = self.donor_mask(recipient_type, component)
+        wanted = component.strip().upper()
+        bits = self.type_bits
+        return [unit for unit in units
+                if bits.get(unit.blood_type, 0) & mask and unit.component.strip().upper() == wanted]
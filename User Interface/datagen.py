@@ -0,0 +1,214 @@
+"""Deterministic synthetic data for the Blood Bank tables, for load testing at realistic sizes.
+
+Every row satisfies the foreign keys in TableCreation.sql and the trigger rules: donations
+are more than three months apart and only from eligible donors, screenings pass, units in
+stock have not expired and transfusions use a unit of the recipient's own blood type.
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from DBconnect import DatabaseError
+from DBpool import get_pool
+import operations
+
+CHUNK_SIZE = 2000           # donors generated, inserted and committed together
+DONATIONS_PER_DONOR = 10    # average; 1M donors give about 10M donations
+RECIPIENTS_PER_DONOR = 0.1
+STAFF_COUNT = 50
+INELIGIBLE_SHARE = 0.05     # donors marked Not Eligible, with a positive test in their screening
+INVENTORY_SHARE = 0.3       # donations still held as a unit in stock
+TRANSFUSED_SHARE = 0.3      # units in stock that have been used by a transfusion
+DISCARDED_SHARE = 0.05      # units in stock logged in ExpiredBlood
+
+# Blood type frequencies among donors
+BLOOD_TYPES = {"O+": 38, "A+": 34, "B+": 9, "O-": 7, "A-": 6, "AB+": 3, "B-": 2, "AB-": 1}
+COMPONENTS = ("Whole Blood", "Red Blood Cells", "Platelets", "Plasma", "Cryoprecipitate")
+STAFF_ROLES = ("Phlebotomist", "Lab Technician", "Nurse", "Receptionist", "Manager")
+
+
+class Generator:
+    """Produces the rows for one database, the same rows for the same seed and size"""
+
+    def __init__(self, donors, seed=1, now=None):
+        self.donors = donors
+        self.recipients = max(1, int(donors * RECIPIENTS_PER_DONOR))
+        self.random = random.Random(seed)
+        self.now = (now or datetime.now()).replace(microsecond=0)
+        self.types = list(BLOOD_TYPES)
+        self.weights = list(BLOOD_TYPES.values())
+        self.recipients_by_type = {}
+        self.next_ids = {"donation": 1, "inventory": 1, "transfusion": 1, "expired": 1}
+
+    def next_id(self, name):
+        value = self.next_ids[name]
+        self.next_ids[name] += 1
+        return value
+
+    def blood_type(self):
+        return self.random.choices(self.types, self.weights)[0]
+
+    def contact(self):
+        return f"03{self.random.randrange(10 ** 9):09d}"
+
+    def staff(self):
+        return [{"id": i, "name": f"Staff {i}", "role": STAFF_ROLES[i % len(STAFF_ROLES)], "contact": self.contact()}
+                for i in range(1, STAFF_COUNT + 1)]
+
+    def recipient_rows(self):
+        rows = []
+        for i in range(1, self.recipients + 1):
+            blood_type = self.blood_type()
+            self.recipients_by_type.setdefault(blood_type, []).append(i)
+            rows.append({"id": i, "name": f"Recipient {i}", "nic": f"R{i:012d}", "age": self.random.randint(1, 90),
+                         "gender": self.random.choice("MF"), "type": blood_type, "contact": self.contact()})
+        return rows
+
+    def donor_chunk(self, first, last):
+        """Rows for donors first..last and everything that hangs off them, as a dict of row lists"""
+        rows = {name: [] for name in ("donor", "screening", "donation", "inventory", "link", "transfusion",
+                                      "expired")}
+        for donor_id in range(first, last + 1):
+            blood_type = self.blood_type()
+            eligible = self.random.random() >= INELIGIBLE_SHARE
+            rows["donor"].append({
+                "id": donor_id, "name": f"Donor {donor_id}", "nic": f"D{donor_id:012d}",
+                "age": self.random.randint(18, 50), "gender": self.random.choice("MF"), "type": blood_type,
+                "contact": self.contact(), "status": "Eligible" if eligible else "Not Eligible"})
+
+            # Screenings pass the HB, weight and age checks; ineligible donors tested positive
+            positive = "N" if eligible else "P"
+            count = self.random.randint(0, 2 * DONATIONS_PER_DONOR) if eligible else 0
+            # Newest donation 100 to 400 days ago, the earlier ones 100 to 200 days apart
+            day = self.now - timedelta(days=self.random.randint(100, 400))
+            rows["screening"].append({
+                "donor": donor_id, "last": day if count else None,
+                "hb": round(self.random.uniform(13, 17), 1), "weight": round(self.random.uniform(50, 110), 1),
+                "hiv": positive, "hepatitis": "N", "syphilis": "N", "malaria": "N"})
+
+            for _ in range(count):
+                donation_id = self.next_id("donation")
+                rows["donation"].append({"id": donation_id, "donor": donor_id, "type": blood_type,
+                                         "quantity": self.random.randint(1, 3), "day": day})
+                if self.random.random() < INVENTORY_SHARE:
+                    self.add_unit(rows, donation_id, blood_type)
+                day -= timedelta(days=self.random.randint(100, 200))
+        return rows
+
+    def add_unit(self, rows, donation_id, blood_type):
+        """A unit in stock for a donation, possibly already transfused or discarded"""
+        inventory_id = self.next_id("inventory")
+        component = self.random.choice(COMPONENTS)
+        quantity = self.random.randint(1, 3)
+        rows["inventory"].append({
+            "id": inventory_id, "type": blood_type, "component": component, "quantity": quantity,
+            "temperature": round(self.random.uniform(-30, 6), 1),
+            "expiry": self.now + timedelta(days=self.random.randint(2, 365)), "donation": donation_id})
+        rows["link"].append({"id": donation_id, "inventory": inventory_id})
+
+        chance = self.random.random()
+        recipients = self.recipients_by_type.get(blood_type)
+        if chance < TRANSFUSED_SHARE and recipients:
+            rows["transfusion"].append({
+                "id": self.next_id("transfusion"), "recipient": self.random.choice(recipients), "type": blood_type,
+                "component": component, "quantity": quantity,
+                "day": self.now - timedelta(days=self.random.randint(1, 90)), "donation": donation_id,
+                "inventory": inventory_id})
+        elif chance < TRANSFUSED_SHARE + DISCARDED_SHARE:
+            rows["expired"].append({
+                "id": self.next_id("expired"), "inventory": inventory_id, "type": blood_type, "component": component,
+                "day": self.now - timedelta(days=self.random.randint(1, 30)),
+                "staff": self.random.randint(1, STAFF_COUNT), "remarks": "Bag damaged in storage"})
+
+
+INSERTS = {
+    "staff": "INSERT INTO Staff (Staff_ID, Staff_Name, Staff_Role, Staff_Contact) "
+             "VALUES (:id, :name, :role, :contact)",
+    "recipient": "INSERT INTO Recipient (Recipient_ID, Recipient_Name, Recipient_NICnumber, Recipient_Age, "
+                 "Recipient_Gender, Recipient_BloodType, Recipient_Contact) "
+                 "VALUES (:id, :name, :nic, :age, :gender, :type, :contact)",
+    "donor": "INSERT INTO Donor (Donor_ID, Donor_Name, Donor_NICnumber, Donor_Age, Donor_Gender, Donor_BloodType, "
+             "Donor_Contact, Eligibility_Status) VALUES (:id, :name, :nic, :age, :gender, :type, :contact, :status)",
+    "screening": "INSERT INTO DonorScreening (Donor_ID, Last_DonationDate, HB_Level, Weight, HIV_Test, "
+                 "Hepatitis_Test, Syphilis_Test, Malaria_Test) "
+                 "VALUES (:donor, :last, :hb, :weight, :hiv, :hepatitis, :syphilis, :malaria)",
+    "donation": "INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, Donation_Date) "
+                "VALUES (:id, :donor, :type, :quantity, :day)",
+    "inventory": "INSERT INTO BloodInventory (Inventory_ID, Blood_Type, Blood_Component, Quantity, Temperature, "
+                 "Expiry_Date, Donation_ID) VALUES (:id, :type, :component, :quantity, :temperature, :expiry, "
+                 ":donation)",
+    # Donation and BloodInventory reference each other, so the unit is linked once it exists
+    "link": "UPDATE Donation SET Inventory_ID = :inventory WHERE Donation_ID = :id",
+    "transfusion": "INSERT INTO Transfusion (Transfusion_ID, Recipient_ID, Requested_BloodType, Requested_Component, "
+                   "Requested_Quantity, Request_Date, Exchange_Type, Donation_ID, Inventory_ID) "
+                   "VALUES (:id, :recipient, :type, :component, :quantity, :day, 'None', :donation, :inventory)",
+    "expired": "INSERT INTO ExpiredBlood (Expired_Log_ID, Inventory_ID, Expired_BloodType, Expired_BloodComponent, "
+               "Disposal_Date, Staff_ID, Remarks) VALUES (:id, :inventory, :type, :component, :day, :staff, :remarks)",
+}
+
+# Insert order within a chunk, parents before children
+CHUNK_ORDER = ("donor", "screening", "donation", "inventory", "link", "transfusion", "expired")
+
+
+def insert(cursor, name, rows):
+    if rows:
+        cursor.executemany(INSERTS[name], rows)
+
+
+def generate(conn, donors, seed=1, chunk_size=CHUNK_SIZE, progress=None):
+    """Fill empty tables with synthetic data for the given number of donors; returns rows written per table"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM Donor")
+    if cursor.fetchone()[0]:
+        raise ValueError("The Donor table already has rows; generate into an empty database")
+
+    generator = Generator(donors, seed)
+    counts = dict.fromkeys(INSERTS, 0)
+    for name, rows in (("staff", generator.staff()), ("recipient", generator.recipient_rows())):
+        insert(cursor, name, rows)
+        counts[name] += len(rows)
+    conn.commit()
+
+    for first in range(1, donors + 1, chunk_size):
+        rows = generator.donor_chunk(first, min(first + chunk_size - 1, donors))
+        for name in CHUNK_ORDER:
+            insert(cursor, name, rows[name])
+            counts[name] += len(rows[name])
+        conn.commit()
+        if progress:
+            progress(min(first + chunk_size - 1, donors))
+
+    for table_name in ("staff", "recipient", "donor", "donorscreening", "donation", "bloodinventory",
+                       "transfusion", "expiredblood"):
+        operations.notify_write(table_name)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill an empty Blood Bank database with synthetic data")
+    parser.add_argument("--donors", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1, help="the same seed and size give the same rows")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        with pool.session() as conn:
+            counts = generate(conn, args.donors, args.seed, args.chunk_size,
+                              lambda done: print(f"\r{done} of {args.donors} donors", end="", flush=True))
+    except (ValueError,) + DatabaseError as e:
+        raise SystemExit(f"\nGeneration failed: {e}")
+    finally:
+        pool.close()
+
+    print()
+    for name, count in counts.items():
+        print(f"{name:<12} {count:>10}")
+
+
+if __name__ == "__main__":
+    main()
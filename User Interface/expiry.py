@@ -0,0 +1,75 @@
+"""Scheduled sweep logging blood units that expired in storage into ExpiredBlood"""
+
+import argparse
+import time
+from datetime import datetime
+
+from DBconnect import DatabaseError
+from DBpool import get_pool
+import operations
+
+BATCH_SIZE = 500            # units logged and committed per batch
+DAY_MAX_BATCHES = 4         # batches per run during opening hours, so a run stays short
+DAY_HOURS = range(7, 20)    # hours when staff are using the inventory
+SWEEP_INTERVAL = 15         # minutes between scheduled runs
+
+
+def sweep(conn, staff_id, batch_size=BATCH_SIZE, max_batches=None):
+    """Run SweepExpiredBlood and return the number of units it logged"""
+    cursor = conn.cursor()
+    swept = cursor.var(int)
+    result = cursor.callproc("SweepExpiredBlood", [staff_id, batch_size, max_batches, swept])
+    if result[3]:
+        operations.notify_write("expiredblood")
+    return result[3]
+
+
+def batch_limit(now=None):
+    """Batches allowed in one run: bounded while the blood bank is open, unlimited at night"""
+    hour = (now or datetime.now()).hour
+    return DAY_MAX_BATCHES if hour in DAY_HOURS else None
+
+
+def run_scheduled(pool, staff_id, interval=SWEEP_INTERVAL, batch_size=BATCH_SIZE, once=False):
+    """Sweep every interval minutes until interrupted, purging old ChangeLog entries after each run"""
+    change_tracking = pool.run(operations.change_watermark) is not None
+    while True:
+        try:
+            swept = pool.run(lambda conn: sweep(conn, staff_id, batch_size, batch_limit()))
+            print(f"{datetime.now():%Y-%m-%d %H:%M} logged {swept} expired units")
+        except DatabaseError as e:
+            print(f"{datetime.now():%Y-%m-%d %H:%M} sweep failed: {e}")
+        if change_tracking:
+            try:
+                purged = pool.run(operations.purge_changes)
+                if purged:
+                    print(f"{datetime.now():%Y-%m-%d %H:%M} purged {purged} old ChangeLog entries")
+            except DatabaseError as e:
+                print(f"{datetime.now():%Y-%m-%d %H:%M} ChangeLog purge failed: {e}")
+        if once:
+            return
+        time.sleep(interval * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log expired blood units into ExpiredBlood")
+    parser.add_argument("--staff-id", type=int, required=True, help="staff member recorded on the log rows")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--every", type=int, default=SWEEP_INTERVAL, help="minutes between runs")
+    parser.add_argument("--once", action="store_true", help="run a single sweep and exit")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        run_scheduled(pool, args.staff_id, args.every, args.batch_size, args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
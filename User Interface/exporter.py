@@ -0,0 +1,248 @@
+"""Streaming export of tables and views to CSV, JSON Lines or Parquet"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Only needed for Parquet output
+    pyarrow = None
+
+from DBconnect import DatabaseError, engine_for
+from DBpool import get_pool
+
+ARRAY_SIZE = 5000       # rows per fetch when exporting
+PARQUET_COMPRESSION = "zstd"
+
+# Tables from the admin panel and views from ViewsCreation.sql, with the date column used for range filters
+EXPORT_SOURCES = {
+    "donor": None,
+    "donorscreening": "Last_DonationDate",
+    "recipient": None,
+    "staff": None,
+    "donation": "Donation_Date",
+    "transfusion": "Request_Date",
+    "bloodinventory": "Expiry_Date",
+    "expiredblood": "Disposal_Date",
+    "donorrecord": None,
+    "donationdetails": "Donation_Date",
+    "donormedical": "Last_DonationDate",
+    "staffrecord": None,
+    "inventoryinfo": "Expiry_Date",
+    "recipientrecord": None,
+    "transfusiondetails": "Request_Date",
+}
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+# Declared types of a table's or view's columns in SELECT * order, for the Parquet schema
+ORACLE_COLUMN_TYPES = ("SELECT Data_Type, Data_Scale FROM user_tab_columns "
+                       "WHERE Table_Name = :source ORDER BY Column_ID")
+SQLITE_COLUMN_TYPES = "SELECT type FROM pragma_table_info(:source) ORDER BY cid"
+
+
+def stream_rows(conn, source, start=None, end=None, arraysize=ARRAY_SIZE):
+    """Run the export query and return its column names and a generator of row batches.
+
+    start and end limit the rows to a date range (both inclusive) on the source's date column.
+    """
+    source = source.lower()
+    if source not in EXPORT_SOURCES:
+        raise ValueError(f"Exporting {source} is not supported")
+
+    sql = f"SELECT * FROM {source}"
+    params = {}
+    if start is not None or end is not None:
+        date_column = EXPORT_SOURCES[source]
+        if date_column is None:
+            raise ValueError(f"{source} has no date column to filter on")
+        conditions = []
+        if start is not None:
+            conditions.append(f"{date_column} >= :start_date")
+            params["start_date"] = start
+        if end is not None:
+            # Dates may carry a time of day, so compare against the start of the next day
+            conditions.append(f"{date_column} < :end_date")
+            params["end_date"] = end + timedelta(days=1)
+        sql += " WHERE " + " AND ".join(conditions)
+
+    cursor = conn.cursor()
+    cursor.arraysize = arraysize
+    # One extra row so a full fetch does not need a second round trip to learn there is no more data
+    cursor.prefetchrows = arraysize + 1
+    cursor.execute(sql, params)
+    column_names = [desc[0] for desc in cursor.description]
+
+    def batches():
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                return
+            yield rows
+
+    return column_names, batches()
+
+
+def open_output(path):
+    """Open a text file for writing, gzip compressed when the name ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def json_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def write_csv(path, column_names, batches, progress=None):
+    written = 0
+    with open_output(path) as output:
+        writer = csv.writer(output)
+        writer.writerow(column_names)
+        for rows in batches:
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+def write_jsonl(path, column_names, batches, progress=None):
+    written = 0
+    with open_output(path) as output:
+        for rows in batches:
+            output.writelines(json.dumps(dict(zip(column_names, row)), default=json_value) + "\n" for row in rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+def column_types(conn, source):
+    """Return (declared type, decimal places) per column of a table or view; places are None when not declared"""
+    cursor = conn.cursor()
+    if engine_for(conn).name == "oracle":
+        cursor.execute(ORACLE_COLUMN_TYPES, {"source": source.upper()})
+        return [(data_type, scale) for data_type, scale in cursor.fetchall()]
+    cursor.execute(SQLITE_COLUMN_TYPES, {"source": source})
+    types = []
+    for data_type, in cursor.fetchall():
+        # DECIMAL(5, 2) has 2 places; DECIMAL(5) none
+        size = re.search(r"\(\s*\d+\s*(?:,\s*(\d+)\s*)?\)", data_type)
+        types.append((data_type, int(size.group(1) or 0) if size else None))
+    return types
+
+
+def arrow_type(data_type, scale=None):
+    """Parquet column type for a declared column type; numbers with decimal places become doubles"""
+    data_type = data_type.upper()
+    if data_type.startswith(("DATE", "TIMESTAMP")):
+        return pyarrow.timestamp("s")
+    if data_type.startswith(("INT", "BIGINT", "SMALLINT")):
+        return pyarrow.int64()
+    if data_type.startswith(("NUMBER", "DECIMAL", "NUMERIC")):
+        return pyarrow.int64() if scale == 0 else pyarrow.float64()
+    if data_type.startswith(("FLOAT", "REAL", "DOUBLE", "BINARY_")):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def arrow_value(field_type):
+    """Convert a fetched value to what pyarrow takes for the column type, or None if it needs no change.
+
+    SQLite hands back dates as ISO text and a DECIMAL as int or float depending on the value.
+    """
+    if pyarrow.types.is_timestamp(field_type):
+        return lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+    if pyarrow.types.is_floating(field_type):
+        return lambda value: None if value is None else float(value)
+    if pyarrow.types.is_string(field_type):
+        return lambda value: None if value is None or isinstance(value, str) else str(value)
+    return None
+
+
+def write_parquet(path, column_names, batches, progress=None, types=None):
+    """Write each batch as a Parquet row group.
+
+    types are the column_types of the source; without them every column is written as text.
+    """
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is not installed, Parquet export is unavailable")
+    types = types or [("VARCHAR", None)] * len(column_names)
+    if len(types) != len(column_names):
+        raise ValueError("The column types do not match the exported columns")
+    schema = pyarrow.schema([(name, arrow_type(*column_type)) for name, column_type in zip(column_names, types)])
+    converters = [arrow_value(field.type) for field in schema]
+    written = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION) as writer:
+        for rows in batches:
+            arrays = [pyarrow.array(values if convert is None else [convert(value) for value in values],
+                                    type=field.type)
+                      for values, field, convert in zip(zip(*rows), schema, converters)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def format_for(path):
+    """Guess the export format from a file name"""
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension == "ndjson":
+        return "jsonl"
+    if extension not in WRITERS:
+        raise ValueError(f"Cannot tell the export format of {os.path.basename(path)}, use .csv, .jsonl or .parquet")
+    return extension
+
+
+def export(conn, source, path, export_format=None, start=None, end=None, progress=None):
+    """Stream a table or view to a file and return the number of rows written"""
+    export_format = export_format or format_for(path)
+    if export_format == "parquet":
+        types = column_types(conn, source)
+        column_names, batches = stream_rows(conn, source, start, end)
+        return write_parquet(path, column_names, batches, progress, types)
+    column_names, batches = stream_rows(conn, source, start, end)
+    return WRITERS[export_format](path, column_names, batches, progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Blood Bank table or view")
+    parser.add_argument("source", choices=sorted(EXPORT_SOURCES))
+    parser.add_argument("output", help="file to write; add .gz to compress CSV or JSON Lines")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="defaults to the output file extension")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        with pool.session() as conn:
+            written = export(conn, args.source, args.output, args.format, args.start, args.end)
+    except (ValueError, RuntimeError, OSError) + DatabaseError as e:
+        raise SystemExit(f"Export failed: {e}")
+    print(f"Exported {written} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Low-stock forecast: how many days the blood in stock lasts for each blood type and component.
+
+Daily totals come from the DailyReport table as one array row per group and one column per day,
+so every group is handled at once with NumPy: rolling donation and transfusion rates, the units in
+stock by the day they expire, and a day by day projection of the stock left.
+"""
+
+import argparse
+import threading
+from datetime import date, timedelta
+
+try:
+    import numpy
+except ImportError:
+    # Only needed for the forecast
+    numpy = None
+
+from DBpool import get_pool
+from allocation import AVAILABLE_UNITS
+from intake import STORAGE
+import operations
+
+HISTORY_DAYS = 730      # days of daily totals read for the rolling rates
+RATE_WINDOW = 28        # days averaged into the current donation and transfusion rates
+HORIZON = 42            # days projected ahead
+LEAD_DAYS = 7           # groups projected to run short within this many days are flagged
+DEFAULT_SHELF_LIFE = 35
+
+# Tables whose writes change the stock or the rates
+FORECAST_TABLES = {"donation", "bloodinventory", "transfusion", "expiredblood"}
+
+COLUMNS = ["BLOOD_TYPE", "BLOOD_COMPONENT", "IN_STOCK", "USED_PER_DAY", "STOCKED_PER_DAY", "EXPIRING",
+           "DAYS_OF_SUPPLY", "LOW_STOCK"]
+
+
+def day_numbers(values):
+    """Dates as days since the epoch; SQLite hands them back as ISO text, Oracle as datetimes"""
+    return numpy.array([str(value)[:10] for value in values], dtype="datetime64[D]").astype(numpy.int64)
+
+
+def group_keys(blood_types, components):
+    return [f"{blood_type}|{component}" for blood_type, component in zip(blood_types, components)]
+
+
+def load_history(conn, today, days=HISTORY_DAYS):
+    """Return group keys and the daily stocked and transfused quantities, each a (groups, days) array"""
+    rows, _ = operations.query(conn, "SELECT Report_Date, Blood_Type, Blood_Component, Stocked_Quantity, "
+                                     "Transfused_Quantity FROM DailyReport "
+                                     "WHERE Report_Date >= :range_start AND Report_Date < :range_end",
+                               {"range_start": today - timedelta(days=days), "range_end": today})
+    if not rows:
+        return [], numpy.zeros((0, days)), numpy.zeros((0, days))
+    report_dates, blood_types, components, stocked, transfused = zip(*rows)
+    keys, group = numpy.unique(group_keys(blood_types, components), return_inverse=True)
+    column = day_numbers(report_dates) - day_numbers([today - timedelta(days=days)])[0]
+    cells = group * days + column
+    size = len(keys) * days
+    stocked = numpy.bincount(cells, weights=numpy.array(stocked, dtype=float), minlength=size)
+    transfused = numpy.bincount(cells, weights=numpy.array(transfused, dtype=float), minlength=size)
+    return list(keys), stocked.reshape(len(keys), days), transfused.reshape(len(keys), days)
+
+
+def load_stock(conn, today):
+    """Return group keys, the day each available unit expires (days from today) and its quantity"""
+    rows, _ = operations.query(conn, AVAILABLE_UNITS, {"now": today})
+    if not rows:
+        return [], numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0)
+    _, blood_types, components, quantities, expiry_dates, _ = zip(*rows)
+    expires_in = day_numbers(expiry_dates) - day_numbers([today])[0]
+    return group_keys(blood_types, components), expires_in, numpy.array(quantities, dtype=float)
+
+
+def rolling_rates(daily, window=RATE_WINDOW):
+    """Mean per day over each window of days ending on each day, for every group row"""
+    totals = numpy.cumsum(numpy.pad(daily, ((0, 0), (1, 0))), axis=1)
+    return (totals[:, window:] - totals[:, :-window]) / window
+
+
+def project(expiring, in_stock, used, stocked, shelf_life):
+    """Day by day stock left over the horizon, first expiry first out, for every group at once.
+
+    expiring is (groups, horizon): the quantity in stock expiring on each day; in_stock includes
+    the units expiring after the horizon. used and stocked are daily rates, shelf_life how long
+    new units keep. Returns the stock left and the demand not met, both (groups, horizon).
+    """
+    horizon = expiring.shape[1]
+    days = numpy.arange(horizon)
+    demand = used[:, None] * (days + 1)
+    # Units are used oldest first, so stock only goes to waste when more has expired by some day
+    # than the demand up to that day took; served is capped by what did not go to waste
+    wasted = numpy.maximum(numpy.maximum.accumulate(numpy.cumsum(expiring, axis=1) - demand, axis=1), 0)
+    served = numpy.minimum(demand, in_stock[:, None] - wasted)
+    # Demand the current stock did not cover is taken from the units donated meanwhile, oldest first,
+    # so no more than shelf_life days of donations are ever on the shelf. One step per day, each
+    # over every group at once
+    unmet = numpy.diff(demand - served, axis=1, prepend=0)
+    new_stock = numpy.zeros_like(demand)
+    short = numpy.zeros_like(demand)
+    on_shelf = numpy.zeros(len(used))
+    missing = numpy.zeros(len(used))
+    for day in range(horizon):
+        on_shelf = on_shelf + stocked - unmet[:, day]
+        missing = missing + numpy.maximum(-on_shelf, 0)
+        on_shelf = numpy.clip(on_shelf, 0, stocked * shelf_life)
+        new_stock[:, day] = on_shelf
+        short[:, day] = missing
+    return in_stock[:, None] - served - wasted + new_stock, short
+
+
+def forecast(conn, today=None, horizon=HORIZON):
+    """Return (rows, column names): per blood type and component the stock, rates and days of supply"""
+    if numpy is None:
+        raise RuntimeError("NumPy is not installed, the stock forecast is unavailable")
+    if horizon < 1:
+        raise ValueError("The forecast must look at least one day ahead")
+    today = today or date.today()
+    history_keys, stocked, transfused = load_history(conn, today)
+    stock_keys, expires_in, quantities = load_stock(conn, today)
+
+    keys, stock_group = numpy.unique(list(history_keys) + stock_keys, return_inverse=True)
+    history_group = stock_group[:len(history_keys)]
+    stock_group = stock_group[len(history_keys):]
+    count = len(keys)
+    if not count:
+        return [], COLUMNS
+
+    used = numpy.zeros(count)
+    supply = numpy.zeros(count)
+    if len(history_keys):
+        used[history_group] = rolling_rates(transfused)[:, -1]
+        supply[history_group] = rolling_rates(stocked)[:, -1]
+
+    in_stock = numpy.bincount(stock_group, weights=quantities, minlength=count)
+    within = expires_in < horizon
+    expiring = numpy.bincount(stock_group[within] * horizon + expires_in[within], weights=quantities[within],
+                              minlength=count * horizon).reshape(count, horizon)
+
+    blood_types, components = zip(*(key.split("|", 1) for key in keys))
+    shelf_life = numpy.array([STORAGE.get(component, (DEFAULT_SHELF_LIFE,))[0] for component in components])
+    left, short = project(expiring, in_stock, used, supply, shelf_life)
+
+    # Days until the first day with demand left unmet; groups never short get the whole horizon
+    runs_short = short > 0
+    days_of_supply = numpy.where(runs_short.any(axis=1), runs_short.argmax(axis=1), horizon)
+    low = days_of_supply < LEAD_DAYS
+
+    rows = []
+    for i in numpy.argsort(days_of_supply, kind="stable"):
+        rows.append((blood_types[i], components[i], int(in_stock[i]), round(float(used[i]), 2),
+                     round(float(supply[i]), 2), int(expiring[i].sum()),
+                     int(days_of_supply[i]) if days_of_supply[i] < horizon else f"{horizon}+",
+                     "Yes" if low[i] else "No"))
+    return rows, COLUMNS
+
+
+class StockForecast:
+    """Keeps the latest forecast and marks it stale when a table it reads is written or the day changes"""
+
+    def __init__(self):
+        self.rows = None
+        self.taken_on = None
+        self.stale = True
+        self._lock = threading.Lock()
+        operations.write_listeners.append(self.invalidate)
+
+    def needs_refresh(self):
+        with self._lock:
+            return self.stale or self.taken_on != date.today()
+
+    def refresh(self, conn):
+        """Re-run the forecast if it is stale; returns the rows of the groups flagged as running low"""
+        with self._lock:
+            if not self.stale and self.taken_on == date.today():
+                return self.low()
+            self.stale = False
+        today = date.today()
+        try:
+            rows, _ = forecast(conn, today)
+        except Exception:
+            with self._lock:
+                self.stale = True
+            raise
+        with self._lock:
+            self.rows = rows
+            self.taken_on = today
+            return self.low()
+
+    def low(self):
+        return [row for row in self.rows or () if row[-1] == "Yes"]
+
+    def invalidate(self, table_name=None):
+        """Mark the forecast stale after a write to one of the tables it reads"""
+        if table_name is not None and table_name.lower() not in FORECAST_TABLES:
+            return
+        with self._lock:
+            self.stale = True
+
+    def close(self):
+        if self.invalidate in operations.write_listeners:
+            operations.write_listeners.remove(self.invalidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project the days of supply left per blood type and component")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="days to project ahead")
+    parser.add_argument("--low", action="store_true", help="only list the groups flagged as running low")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+    if args.horizon < 1:
+        parser.error("--horizon must be at least 1")
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        rows, column_names = pool.run(lambda conn: forecast(conn, horizon=args.horizon))
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    finally:
+        pool.close()
+
+    print("  ".join(f"{name.replace('_', ' ').title():<16}" for name in column_names))
+    for row in rows:
+        if args.low and row[-1] != "Yes":
+            continue
+        print("  ".join(f"{str(value):<16}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Bulk import of CSV and JSON Lines files into the Blood Bank tables"""
+
+import argparse
+import csv
+import json
+import os
+from datetime import date, datetime
+
+from DBconnect import DatabaseError
+from DBpool import get_pool
+import operations
+from metadata import schema
+
+CHUNK_SIZE = 1000   # rows sent per executemany call and committed together
+
+# Tables that can be loaded from a file
+IMPORT_TABLES = ("donor", "donorscreening", "donation", "bloodinventory", "transfusion")
+
+
+def read_records(path):
+    """Yield (line number, record) from a CSV or JSON Lines file without reading it all into memory.
+
+    A JSON line that cannot be parsed is yielded as the ValueError instead of a record.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Unsupported file type '{extension}', expected .csv or .jsonl")
+
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        if extension == ".csv":
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, ValueError(f"Invalid JSON: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    record = ValueError("Each line must hold a JSON object")
+                yield line_number, record
+
+
+def convert(column, value):
+    """Turn a value read from the file into the bind value for a metadata.Column"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if column.is_date and isinstance(value, str):
+        value = value.strip()
+        return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    return value
+
+
+def import_file(conn, table_name, path, chunk_size=CHUNK_SIZE, progress=None):
+    """Insert every record of a file into a table, collecting the rows that fail instead of stopping.
+
+    Returns a dict with the number of records read and inserted and a list of
+    (line number, error message) for the rows that were rejected.
+    """
+    table_name = table_name.lower()
+    if table_name not in IMPORT_TABLES:
+        raise ValueError(f"Importing into {table_name} is not supported")
+
+    table = schema.table(conn, table_name)
+    known_columns = table.column_names
+    # Donation and Transfusion rows take the parameters of InsertDonation and InsertTransfusion,
+    # so they go through the same insert and the same trigger rules as the forms
+    columns = operations.PROCEDURE_COLUMNS.get(table_name)
+    result = {"table": table_name, "read": 0, "inserted": 0, "errors": []}
+    cursor = conn.cursor()
+    sql = None
+    chunk = []
+    line_numbers = []
+
+    def flush():
+        try:
+            cursor.executemany(sql, chunk, batcherrors=True)
+            failed = {error.offset: error.message for error in cursor.getbatcherrors()}
+        except DatabaseError:
+            # A statement-level rule (the Donation compound trigger) rejected the whole chunk;
+            # insert it row by row to find the rows at fault
+            conn.rollback()
+            failed = {}
+            for offset, row in enumerate(chunk):
+                try:
+                    cursor.execute(sql, row)
+                except DatabaseError as e:
+                    failed[offset] = str(e)
+        conn.commit()
+        result["inserted"] += len(chunk) - len(failed)
+        result["errors"].extend((line_numbers[offset], message) for offset, message in sorted(failed.items()))
+        chunk.clear()
+        line_numbers.clear()
+        if progress:
+            progress(result["read"])
+
+    for line_number, record in read_records(path):
+        result["read"] += 1
+        if isinstance(record, ValueError):
+            result["errors"].append((line_number, str(record)))
+            continue
+        record = {key.strip().upper(): value for key, value in record.items() if key}
+
+        if columns is None:
+            # The first record decides which columns are loaded
+            columns = [column for column in known_columns if column in record]
+            if not columns:
+                raise ValueError(f"None of the columns in {os.path.basename(path)} belong to {table_name}")
+        if sql is None:
+            placeholders = ", ".join(f":{column}" for column in columns)
+            sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+        unknown = [key for key in record if key not in columns]
+        if unknown:
+            result["errors"].append((line_number, f"Unknown column(s): {', '.join(unknown)}"))
+            continue
+        try:
+            chunk.append({column: convert(table.column(column), record.get(column)) for column in columns})
+        except ValueError as e:
+            result["errors"].append((line_number, f"Invalid date: {e}"))
+            continue
+        line_numbers.append(line_number)
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+    result["errors"].sort()
+    if result["inserted"]:
+        operations.notify_write(table_name)
+    return result
+
+
+def write_error_report(errors, path):
+    """Save the rejected rows as a CSV file of line numbers and messages"""
+    with open(path, "w", newline="", encoding="utf-8") as report:
+        writer = csv.writer(report)
+        writer.writerow(["line", "error"])
+        writer.writerows(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a CSV or JSON Lines file into a Blood Bank table")
+    parser.add_argument("table", choices=IMPORT_TABLES)
+    parser.add_argument("file")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--errors", help="where to write the rejected rows (default: <file>.errors.csv)")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        with pool.session() as conn:
+            result = import_file(conn, args.table, args.file, args.chunk_size)
+    except (ValueError, OSError) + DatabaseError as e:
+        raise SystemExit(f"Import failed: {e}")
+
+    print(f"Read {result['read']} rows, inserted {result['inserted']}, rejected {len(result['errors'])}")
+    if result["errors"]:
+        report_path = args.errors or args.file + ".errors.csv"
+        write_error_report(result["errors"], report_path)
+        print("Rejected rows written to", report_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Timing of every statement the application runs, kept as per-statement histograms and a rotating JSON log"""
+
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+from DBconnect import DatabaseError
+
+# Upper bounds of the latency buckets in milliseconds; the last bucket takes everything slower
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Directory of the application's logs, the logs folder at the top of the repository unless BLOODBANK_LOG_DIR is set
+LOG_DIR = os.environ.get("BLOODBANK_LOG_DIR",
+                         os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"))
+# JSON log of every call, one object per line; set BLOODBANK_QUERY_LOG to "" to turn it off
+QUERY_LOG = os.environ.get("BLOODBANK_QUERY_LOG", os.path.join(LOG_DIR, "bloodbank-queries.jsonl"))
+LOG_MAX_BYTES = 5 * 1024 * 1024     # size at which the log is rotated
+LOG_BACKUPS = 3                     # rotated logs kept
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape: literals become ?, bind lists in IN (...) collapse, whitespace is folded"""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"(?<![\w:])\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\bIN\s*\((?:\s*:\w+\s*,)+\s*:\w+\s*\)", "IN (:list)", sql, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class StatementStats:
+    """Totals and a latency histogram for one statement fingerprint"""
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.round_trips = 0
+        self.binds = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed_ms, rows, round_trips, binds, error):
+        self.calls += 1
+        self.errors += error is not None
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        self.round_trips += round_trips
+        self.binds += binds
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed_ms)] += 1
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls; the maximum for the last bucket"""
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return bound
+        return self.max_ms
+
+
+class QueryRecorder:
+    """Collects one record per database call from any thread"""
+
+    def __init__(self, log_path=QUERY_LOG):
+        self.log_path = log_path
+        self.stats = {}
+        self.logger = None
+        self._lock = threading.Lock()
+
+    def record(self, kind, sql, elapsed_ms, rows=0, round_trips=1, binds=0, error=None):
+        statement = fingerprint(sql)
+        with self._lock:
+            stats = self.stats.get(statement)
+            if stats is None:
+                stats = self.stats[statement] = StatementStats(statement)
+            stats.add(elapsed_ms, rows, round_trips, binds, error)
+        self.log({"time": datetime.now().isoformat(timespec="milliseconds"), "kind": kind, "sql": statement,
+                  "binds": binds, "rows": rows, "round_trips": round_trips,
+                  "elapsed_ms": round(elapsed_ms, 3), "error": error})
+
+    def log(self, entry):
+        if not self.log_path:
+            return
+        if self.logger is None:
+            with self._lock:
+                if self.logger is None:
+                    # The file and its directory are only created once the first statement runs
+                    directory = os.path.dirname(self.log_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    handler = logging.handlers.RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES,
+                                                                   backupCount=LOG_BACKUPS, encoding="utf-8",
+                                                                   delay=True)
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger = logging.getLogger("bloodbank.queries")
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False
+                    logger.addHandler(handler)
+                    self.logger = logger
+        self.logger.info(json.dumps(entry))
+
+    def top(self, count=20):
+        """The statements that took the most time in total"""
+        with self._lock:
+            return sorted(self.stats.values(), key=lambda stats: stats.total_ms, reverse=True)[:count]
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times execute, executemany and callproc, counting the fetches that follow a query.
+
+    A query is recorded once its rows run out, the next statement starts on the cursor,
+    or the connection wrapper is finished.
+    """
+
+    def __init__(self, cursor, recorder):
+        object.__setattr__(self, "cursor", cursor)
+        object.__setattr__(self, "recorder", recorder)
+        object.__setattr__(self, "pending", None)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __setattr__(self, name, value):
+        # arraysize, prefetchrows, ... belong to the real cursor
+        setattr(self.cursor, name, value)
+
+    def run(self, kind, sql, binds, call):
+        self.finish()
+        start = time.perf_counter()
+        try:
+            result = call()
+        except DatabaseError as e:
+            self.recorder.record(kind, sql, (time.perf_counter() - start) * 1000, binds=binds, error=str(e))
+            raise
+        entry = {"kind": kind, "sql": sql, "elapsed": time.perf_counter() - start, "rows": 0, "round_trips": 1,
+                 "binds": binds}
+        if kind == "execute" and self.cursor.description is not None:
+            object.__setattr__(self, "pending", entry)
+            return result
+        if kind != "callproc":
+            # Rows written by a DML statement
+            entry["rows"] = max(self.cursor.rowcount or 0, 0)
+        self.write(entry)
+        return result
+
+    def write(self, entry, error=None):
+        self.recorder.record(entry["kind"], entry["sql"], entry["elapsed"] * 1000, entry["rows"],
+                             entry["round_trips"], entry["binds"], error)
+
+    def finish(self, error=None):
+        """Record the query whose rows are being fetched, if any"""
+        entry = self.pending
+        if entry is not None:
+            object.__setattr__(self, "pending", None)
+            self.write(entry, error)
+
+    def fetch(self, call, count_rows, exhausted):
+        start = time.perf_counter()
+        try:
+            result = call()
+        except DatabaseError as e:
+            self.finish(str(e))
+            raise
+        entry = self.pending
+        if entry is not None:
+            entry["elapsed"] += time.perf_counter() - start
+            entry["rows"] += count_rows(result)
+            entry["round_trips"] += 1
+            if exhausted(result):
+                self.finish()
+        return result
+
+    def execute(self, sql, parameters=()):
+        self.run("execute", sql, len(parameters or ()), lambda: self.cursor.execute(sql, parameters))
+        return self
+
+    def executemany(self, sql, seq_of_parameters, **kwargs):
+        seq_of_parameters = list(seq_of_parameters)
+        binds = sum(len(parameters) for parameters in seq_of_parameters)
+        return self.run("executemany", sql, binds,
+                        lambda: self.cursor.executemany(sql, seq_of_parameters, **kwargs))
+
+    def callproc(self, name, parameters=()):
+        return self.run("callproc", f"CALL {name}", len(parameters),
+                        lambda: self.cursor.callproc(name, parameters))
+
+    def fetchone(self):
+        return self.fetch(self.cursor.fetchone, lambda row: row is not None, lambda row: row is None)
+
+    def fetchmany(self, size=None):
+        size = size or self.cursor.arraysize
+        return self.fetch(lambda: self.cursor.fetchmany(size), len, lambda rows: len(rows) < size)
+
+    def fetchall(self):
+        return self.fetch(self.cursor.fetchall, len, lambda rows: True)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany()
+            yield from rows
+            if len(rows) < self.cursor.arraysize:
+                return
+
+    def close(self):
+        self.finish()
+        self.cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection wrapper handing out instrumented cursors; everything else goes to the real connection"""
+
+    def __init__(self, conn, recorder):
+        self.conn = conn
+        self.recorder = recorder
+        self.cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def cursor(self):
+        cursor = InstrumentedCursor(self.conn.cursor(), self.recorder)
+        self.cursors.append(cursor)
+        return cursor
+
+    def finish(self):
+        """Record the queries still being fetched when the work is done"""
+        for cursor in self.cursors:
+            cursor.finish()
+        self.cursors = []
+
+
+# Shared by the whole application
+recorder = QueryRecorder()
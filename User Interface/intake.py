@@ -0,0 +1,98 @@
+"""Donation intake: a donation and the blood units separated from it, registered in one call.
+
+Donation and BloodInventory reference each other, so the rows must be created together.
+RegisterDonation (DBS/RegisterDonation.sql) inserts both sides with the keys deferred and
+hands back the new ids; nothing is left half-linked when any rule rejects the donation.
+"""
+
+from datetime import datetime, timedelta
+
+from validation import parse_date
+import operations
+
+# Days a unit keeps and the temperature it is stored at, per component
+STORAGE = {
+    "Whole Blood": (35, 4),
+    "Red Blood Cells": (42, 4),
+    "Platelets": (5, 22),
+    "Plasma": (365, -30),
+    "Cryoprecipitate": (365, -30),
+}
+
+
+class DonationIntake:
+    """One donation and its units, collected first and then written as a single unit of work"""
+
+    def __init__(self, donor_id, blood_type, quantity, donation_date=None, recipient_id=None):
+        self.donor_id = donor_id
+        self.blood_type = blood_type
+        self.quantity = quantity
+        self.donation_date = donation_date or datetime.now().replace(microsecond=0)
+        self.recipient_id = recipient_id
+        self.units = []     # (component, quantity, temperature, expiry date)
+
+    @classmethod
+    def from_values(cls, values):
+        """Build an intake from {donor_id, blood_type, quantity, donation_date, recipient_id,
+        units: [{component, quantity, expiry_date, temperature}]}, with dates given as text"""
+        def date_value(value, name):
+            if value in (None, ""):
+                return None
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(f"{name} is not a date: {value}")
+            return parsed
+
+        try:
+            intake = cls(int(values["donor_id"]), values["blood_type"], int(values.get("quantity", 1)),
+                         date_value(values.get("donation_date"), "donation_date"),
+                         int(values["recipient_id"]) if values.get("recipient_id") not in (None, "") else None)
+            for unit in values.get("units", ()):
+                intake.add_unit(unit["component"], int(unit.get("quantity", 1)),
+                                date_value(unit.get("expiry_date"), "expiry_date"), unit.get("temperature"))
+        except KeyError as e:
+            raise ValueError(f"{e.args[0]} is required")
+        except TypeError:
+            raise ValueError("Send the donation as {donor_id, blood_type, quantity, units: [{component, ...}]}")
+        return intake
+
+    def add_unit(self, component, quantity, expiry_date=None, temperature=None):
+        """Add a unit; its expiry and temperature default to the component's storage rules"""
+        if component not in STORAGE and (expiry_date is None or temperature is None):
+            raise ValueError(f"Unknown component {component}; give its expiry date and temperature")
+        shelf_days, storage_temperature = STORAGE.get(component, (None, None))
+        if expiry_date is None:
+            expiry_date = self.donation_date + timedelta(days=shelf_days)
+        if temperature is None:
+            temperature = storage_temperature
+        self.units.append((component, quantity, temperature, expiry_date))
+        return self
+
+    def register(self, conn):
+        """Call RegisterDonation and commit; returns the donation id and the ids of its units"""
+        if not self.units:
+            raise ValueError("A donation is registered with at least one blood unit")
+        cursor = conn.cursor()
+        engine = operations.engine_for(conn)
+        components, quantities, temperatures, expiry_dates = zip(*self.units)
+        donation_id = cursor.var(int)
+        inventory_ids = engine.collection(cursor, "IdList")
+        try:
+            result = cursor.callproc("RegisterDonation", [
+                self.donor_id, self.blood_type, self.quantity, self.donation_date, self.recipient_id,
+                engine.collection(cursor, "NameList", components),
+                engine.collection(cursor, "NumberList", quantities),
+                engine.collection(cursor, "NumberList", temperatures),
+                engine.collection(cursor, "DateList", expiry_dates),
+                donation_id, inventory_ids])
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        operations.notify_write("donation")
+        operations.notify_write("bloodinventory")
+
+        donation_id, inventory_ids = result[9], result[10]
+        if hasattr(inventory_ids, "aslist"):
+            inventory_ids = inventory_ids.aslist()
+        return int(donation_id), [int(inventory_id) for inventory_id in inventory_ids]
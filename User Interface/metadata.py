@@ -0,0 +1,143 @@
+"""Columns, types and keys of the Blood Bank tables, read once from the data dictionary"""
+
+import threading
+
+from DBconnect import engine_for
+
+# The application tables, in the order TableCreation.sql creates them
+TABLES = ("donor", "recipient", "staff", "donorscreening", "donation", "bloodinventory", "expiredblood",
+          "transfusion")
+
+# Oracle: one query for the columns of every table and one for their primary and foreign keys
+ORACLE_COLUMNS = ("SELECT Table_Name, Column_Name, Data_Type, Nullable FROM user_tab_columns "
+                  "WHERE Table_Name IN ({tables}) ORDER BY Table_Name, Column_ID")
+ORACLE_KEYS = ("SELECT c.Table_Name, c.Constraint_Type, cc.Column_Name, rc.Table_Name, rc.Column_Name "
+               "FROM user_constraints c "
+               "JOIN user_cons_columns cc ON cc.Constraint_Name = c.Constraint_Name "
+               "LEFT JOIN user_cons_columns rc ON rc.Constraint_Name = c.R_Constraint_Name "
+               "AND rc.Position = cc.Position "
+               "WHERE c.Constraint_Type IN ('P', 'R') AND c.Table_Name IN ({tables}) "
+               "ORDER BY c.Table_Name, cc.Position")
+
+
+class Column:
+    """A table column as the data dictionary describes it"""
+
+    def __init__(self, name, data_type, nullable):
+        self.name = name
+        self.data_type = data_type
+        self.nullable = nullable
+
+    @property
+    def is_date(self):
+        return self.data_type.startswith(("DATE", "TIMESTAMP"))
+
+    @property
+    def is_number(self):
+        return self.data_type.startswith(("NUMBER", "INT", "FLOAT", "DECIMAL", "NUMERIC", "REAL", "DOUBLE"))
+
+
+class Table:
+    """Columns in SELECT * order, the primary key and the foreign keys of one table"""
+
+    def __init__(self, name, columns, primary_key=None, foreign_keys=None):
+        self.name = name
+        self.columns = columns
+        self.primary_key = primary_key
+        self.foreign_keys = foreign_keys or {}  # column -> (referenced table, referenced column)
+        self.positions = {column.name: i for i, column in enumerate(columns)}
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    @property
+    def row_key(self):
+        """Column the forms identify a row by: the primary key, or the first foreign key without one"""
+        return self.primary_key or next(iter(self.foreign_keys), None)
+
+    def index(self, column_name):
+        return self.positions[column_name.upper()]
+
+    def column(self, column_name):
+        return self.columns[self.index(column_name)]
+
+
+def read_oracle(cursor):
+    """Return (table, column, type, nullable, primary key) and (table, column, ref table, ref column) rows"""
+    binds = {f"t{i}": table_name.upper() for i, table_name in enumerate(TABLES)}
+    tables = ", ".join(f":{name}" for name in binds)
+    cursor.execute(ORACLE_COLUMNS.format(tables=tables), binds)
+    columns = [(table_name, column, data_type, nullable == "Y") for table_name, column, data_type, nullable
+               in cursor.fetchall()]
+    cursor.execute(ORACLE_KEYS.format(tables=tables), binds)
+    keys = cursor.fetchall()
+    primary_keys = {(table_name, column) for table_name, kind, column, _, _ in keys if kind == "P"}
+    foreign_keys = [(table_name, column, ref_table, ref_column)
+                    for table_name, kind, column, ref_table, ref_column in keys if kind == "R"]
+    return [row + ((row[0], row[1]) in primary_keys,) for row in columns], foreign_keys
+
+
+def read_sqlite(cursor):
+    """Same rows as read_oracle, from the table_info and foreign_key_list pragmas"""
+    columns = []
+    foreign_keys = []
+    for table_name in TABLES:
+        cursor.execute('SELECT name, type, "notnull", pk FROM pragma_table_info(:table_name) ORDER BY cid',
+                       {"table_name": table_name})
+        columns += [(table_name.upper(), name.upper(), data_type.upper(), not notnull and not pk, bool(pk))
+                    for name, data_type, notnull, pk in cursor.fetchall()]
+        cursor.execute('SELECT "from", "table", "to" FROM pragma_foreign_key_list(:table_name) ORDER BY id',
+                       {"table_name": table_name})
+        foreign_keys += [(table_name.upper(), column.upper(), ref_table.upper(), ref_column.upper())
+                         for column, ref_table, ref_column in cursor.fetchall()]
+    return columns, foreign_keys
+
+
+READERS = {"oracle": read_oracle, "sqlite": read_sqlite}
+
+
+class SchemaMetadata:
+    """The eight tables described once per process; later lookups never touch the database"""
+
+    def __init__(self):
+        self.tables = None
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        """Read the data dictionary on first use"""
+        with self._lock:
+            if self.tables is not None:
+                return self
+            columns, foreign_keys = READERS[engine_for(conn).name](conn.cursor())
+            described = {}
+            primary_keys = {}
+            for table_name, column, data_type, nullable, primary_key in columns:
+                described.setdefault(table_name.lower(), []).append(Column(column, data_type, nullable))
+                if primary_key:
+                    primary_keys[table_name.lower()] = column
+            references = {}
+            for table_name, column, ref_table, ref_column in foreign_keys:
+                references.setdefault(table_name.lower(), {})[column] = (ref_table.lower(), ref_column)
+            self.tables = {table_name: Table(table_name, table_columns, primary_keys.get(table_name),
+                                             references.get(table_name))
+                           for table_name, table_columns in described.items()}
+        return self
+
+    def table(self, conn, table_name):
+        """Describe a table, reading the dictionary if this is the first lookup"""
+        table = self.load(conn).tables.get(table_name.lower())
+        if table is None:
+            raise KeyError(f"Unknown table {table_name}")
+        return table
+
+    def get(self, table_name):
+        """Describe a table from the cache only; None until something has loaded it"""
+        return self.tables.get(table_name.lower()) if self.tables is not None else None
+
+    def primary_key(self, conn, table_name):
+        return self.table(conn, table_name).primary_key
+
+
+# Shared by every module; the schema does not change while the application runs
+schema = SchemaMetadata()
@@ -0,0 +1,161 @@
+"""Versioned schema changes applied on top of the DBS scripts"""
+
+import argparse
+from datetime import datetime
+
+from DBconnect import DatabaseError
+from DBpool import get_pool
+
+# (version, description, statements to apply, statements to undo), applied in order
+MIGRATIONS = [
+    (1, "Indexes for the trigger and expiry lookups", [
+        # check_donation_interval: MAX(Donation_Date) for one donor becomes a single index probe
+        "CREATE INDEX Donation_Donor_Date_Idx ON Donation (Donor_ID, Donation_Date)",
+        # validate_donor_eligibility: screening results of one donor
+        "CREATE INDEX DonorScreening_Donor_Idx ON DonorScreening (Donor_ID)",
+        # expiry checks and sweeps: units expiring before a date
+        "CREATE INDEX BloodInventory_Expiry_Idx ON BloodInventory (Expiry_Date)",
+    ], [
+        "DROP INDEX Donation_Donor_Date_Idx",
+        "DROP INDEX DonorScreening_Donor_Idx",
+        "DROP INDEX BloodInventory_Expiry_Idx",
+    ]),
+    (2, "Index for finding units already logged as expired", [
+        # SweepExpiredBlood: skip units that already have an ExpiredBlood row
+        "CREATE INDEX ExpiredBlood_Inventory_Idx ON ExpiredBlood (Inventory_ID)",
+    ], [
+        "DROP INDEX ExpiredBlood_Inventory_Idx",
+    ]),
+    (3, "Normalized-key indexes for donor and recipient search", [
+        # search.py: prefix matches on the upper-case name, the NIC number without dashes and spaces
+        # and the contact number without dashes, spaces and +; the expressions match search.py's keys
+        "CREATE INDEX Donor_Name_Idx ON Donor (UPPER(Donor_Name))",
+        "CREATE INDEX Donor_NIC_Idx ON Donor (REPLACE(REPLACE(UPPER(Donor_NICnumber), '-', ''), ' ', ''))",
+        "CREATE INDEX Donor_Contact_Idx ON Donor "
+        "(REPLACE(REPLACE(REPLACE(Donor_Contact, '-', ''), ' ', ''), '+', ''))",
+        "CREATE INDEX Recipient_Name_Idx ON Recipient (UPPER(Recipient_Name))",
+        "CREATE INDEX Recipient_NIC_Idx ON Recipient "
+        "(REPLACE(REPLACE(UPPER(Recipient_NICnumber), '-', ''), ' ', ''))",
+        "CREATE INDEX Recipient_Contact_Idx ON Recipient "
+        "(REPLACE(REPLACE(REPLACE(Recipient_Contact, '-', ''), ' ', ''), '+', ''))",
+    ], [
+        "DROP INDEX Donor_Name_Idx",
+        "DROP INDEX Donor_NIC_Idx",
+        "DROP INDEX Donor_Contact_Idx",
+        "DROP INDEX Recipient_Name_Idx",
+        "DROP INDEX Recipient_NIC_Idx",
+        "DROP INDEX Recipient_Contact_Idx",
+    ]),
+    (4, "Index for the units of a donation", [
+        # DailyReport triggers: the units stocked from a donation when it is added or moved
+        "CREATE INDEX BloodInventory_Donation_Idx ON BloodInventory (Donation_ID)",
+    ], [
+        "DROP INDEX BloodInventory_Donation_Idx",
+    ]),
+    (5, "Index for finding units already transfused", [
+        # AVAILABLE_UNITS (allocation and the stock forecast): skip units that have a Transfusion row
+        "CREATE INDEX Transfusion_Inventory_Idx ON Transfusion (Inventory_ID)",
+    ], [
+        "DROP INDEX Transfusion_Inventory_Idx",
+    ]),
+    (6, "Table recording how far the expiry sweep has got", [
+        # SweepExpiredBlood: every unit expiring before Swept_Until is logged, so runs start from there
+        "CREATE TABLE ExpirySweep (Swept_Until DATE NOT NULL)",
+    ], [
+        "DROP TABLE ExpirySweep",
+    ]),
+    (7, "Index for the donations within the donation interval", [
+        # validation.RuleCache: loads only the donations newer than the 3-month cutoff
+        "CREATE INDEX Donation_Date_Idx ON Donation (Donation_Date)",
+    ], [
+        "DROP INDEX Donation_Date_Idx",
+    ]),
+    (8, "Table recording how far the ChangeLog has been purged", [
+        # operations.purge_changes: readers following the log from an older id have missed entries
+        "CREATE TABLE ChangeLogPurge (Purged_Through INT NOT NULL)",
+    ], [
+        "DROP TABLE ChangeLogPurge",
+    ]),
+]
+
+# Errors meaning a statement's change is already in place, left over from an interrupted run
+ALREADY_APPLIED_ERRORS = ("ORA-00955", "ORA-01408", "ORA-01418", "already exists", "no such index")
+
+
+def ensure_version_table(conn):
+    """Create the SchemaVersion table on first use"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM SchemaVersion")
+    except DatabaseError:
+        cursor.execute("CREATE TABLE SchemaVersion ("
+                       "Version INT PRIMARY KEY, "
+                       "Description VARCHAR(200) NOT NULL, "
+                       "Applied_At DATE NOT NULL)")
+
+
+def current_version(conn):
+    """Return the newest migration applied to the database, 0 if none"""
+    ensure_version_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(Version), 0) FROM SchemaVersion")
+    return cursor.fetchone()[0]
+
+
+def run_statement(cursor, sql):
+    try:
+        cursor.execute(sql)
+    except DatabaseError as e:
+        if not any(code in str(e) for code in ALREADY_APPLIED_ERRORS):
+            raise
+
+
+def migrate(conn, target=None, log=None):
+    """Apply or undo migrations until the database is at the target version (default: latest)"""
+    latest = MIGRATIONS[-1][0] if MIGRATIONS else 0
+    target = latest if target is None else target
+    version = current_version(conn)
+    cursor = conn.cursor()
+
+    for number, description, apply, undo in MIGRATIONS:
+        if version < number <= target:
+            for sql in apply:
+                run_statement(cursor, sql)
+            cursor.execute("INSERT INTO SchemaVersion (Version, Description, Applied_At) "
+                           "VALUES (:version, :description, :applied_at)",
+                           {"version": number, "description": description, "applied_at": datetime.now()})
+            conn.commit()
+            if log:
+                log(f"Applied {number}: {description}")
+
+    for number, description, apply, undo in reversed(MIGRATIONS):
+        if target < number <= version:
+            for sql in undo:
+                run_statement(cursor, sql)
+            cursor.execute("DELETE FROM SchemaVersion WHERE Version = :version", {"version": number})
+            conn.commit()
+            if log:
+                log(f"Undid {number}: {description}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bring the Blood Bank schema up to date")
+    parser.add_argument("--to", dest="target", type=int, help="version to migrate to (default: latest)")
+    parser.add_argument("--status", action="store_true", help="only show the current version")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    with pool.session() as conn:
+        if args.status:
+            print("Schema version", current_version(conn))
+            return
+        version = migrate(conn, args.target, log=print)
+    print("Schema version", version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Database operations used by the application, each taking an open connection"""
+
+import re
+
+from DBconnect import engine_for, DatabaseError
+from metadata import schema
+
+FETCH_SIZE = 500    # rows fetched per round trip
+PAGE_SIZE = 200     # rows per page in the table views
+IN_LIST_SIZE = 500  # keys bound per IN (...) list, below Oracle's limit of 1000
+CHANGE_LAG = 60     # seconds a ChangeLog entry is read again on every refresh; longer than any write transaction
+CHANGE_RETENTION = 24 * 60 * 60     # seconds ChangeLog entries are kept; readers idle for longer reload
+PURGE_BATCH = 10000                 # ChangeLog ids deleted and committed per batch
+
+# Record lookups behind the Home tab's quick actions
+DONOR_LOOKUP = "SELECT * FROM donorrecord WHERE donor_id = :id"
+RECIPIENT_LOOKUP = "SELECT * FROM recipientrecord WHERE recipient_id = :id"
+
+# Donation and Transfusion rows are written through their Insert/Update/Delete procedures, so the
+# trigger rules and the procedures' own logic apply; InsertX takes these columns in this order
+PROCEDURE_COLUMNS = {
+    "donation": ["DONATION_ID", "DONOR_ID", "DONATED_BLOODTYPE", "DONATED_QUANTITY", "DONATION_DATE",
+                 "RECIPIENT_ID", "INVENTORY_ID"],
+    "transfusion": ["TRANSFUSION_ID", "RECIPIENT_ID", "REQUESTED_BLOODTYPE", "REQUESTED_COMPONENT",
+                    "REQUESTED_QUANTITY", "REQUEST_DATE", "EXCHANGE_TYPE", "EXCHANGE_DONOR_ID", "DONATION_ID",
+                    "INVENTORY_ID"],
+}
+
+# The only column UpdateDonation and UpdateTransfusion change
+UPDATABLE_COLUMNS = {"donation": "DONATED_QUANTITY", "transfusion": "REQUESTED_QUANTITY"}
+
+# Called with the table name after every committed write; they run on the calling (worker) thread
+write_listeners = []
+
+
+def notify_write(table_name):
+    """Tell the caches that a table has changed"""
+    for listener in list(write_listeners):
+        listener(table_name.lower())
+
+
+def written_table(sql):
+    """Return the table an INSERT, UPDATE or DELETE statement writes to"""
+    match = re.match(r"\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", sql, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def query(conn, sql, params=None, progress=None):
+    """Run a query and return its rows and column names, reporting rows fetched to progress"""
+    cursor = conn.cursor()
+    cursor.arraysize = FETCH_SIZE
+    cursor.execute(sql, params or {})
+    column_names = [desc[0] for desc in cursor.description]
+    rows = []
+    while True:
+        batch = cursor.fetchmany(FETCH_SIZE)
+        if not batch:
+            break
+        rows.extend(batch)
+        if progress:
+            progress(len(rows))
+    return rows, column_names
+
+
+def execute(conn, sql, params=None):
+    """Execute a statement and commit it; returns the number of rows it changed"""
+    cursor = conn.cursor()
+    cursor.execute(sql, params or {})
+    count = cursor.rowcount
+    conn.commit()
+    table_name = written_table(sql)
+    if table_name:
+        notify_write(table_name)
+    return count
+
+
+def call_procedure(conn, name, params):
+    """Call a stored procedure and commit it"""
+    conn.cursor().callproc(name, params)
+    conn.commit()
+    # InsertDonation, UpdateTransfusion, ... write to the table named after the action
+    match = re.match(r"(?:Insert|Update|Delete)(\w+)", name, re.IGNORECASE)
+    if match:
+        notify_write(match.group(1))
+
+
+class BatchRejected(Exception):
+    """Rows of a batch the database refused; nothing from the batch was committed"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} row(s) rejected")
+        self.errors = errors    # [(row offset, message)]
+
+
+def record_values(table, values):
+    """Upper-case the columns of {column: value} and store empty values as NULL; unknown columns are refused"""
+    values = {column.upper(): None if value == "" else value for column, value in values.items()}
+    unknown = [column for column in values if column not in table.positions]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table.name}: {', '.join(unknown)}")
+    return values
+
+
+def insert_record(conn, table_name, values):
+    """Insert a row given as {column: value}; empty values are stored as NULL"""
+    table_name = table_name.lower()
+    values = record_values(schema.table(conn, table_name), values)
+    if table_name in PROCEDURE_COLUMNS:
+        call_procedure(conn, "Insert" + table_name.capitalize(),
+                       [values.get(column) for column in PROCEDURE_COLUMNS[table_name]])
+        return
+    columns = list(values)
+    execute(conn, f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                  f"VALUES ({', '.join(':' + column for column in columns)})", values)
+
+
+def insert_records(conn, table_name, records):
+    """Insert many rows with one array-bound statement in one transaction: all of them or none.
+
+    Raises BatchRejected with (row offset, message) for every row the database refused.
+    """
+    table_name = table_name.lower()
+    table = schema.table(conn, table_name)
+    records = [record_values(table, values) for values in records]
+    # InsertDonation and InsertTransfusion are a single INSERT of these columns, so binding the
+    # INSERT directly fires the same triggers as the procedures do
+    columns = PROCEDURE_COLUMNS.get(table_name) or [column for column in table.column_names
+                                                     if any(column in values for values in records)]
+    sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+           f"VALUES ({', '.join(':' + column for column in columns)})")
+    rows = [{column: values.get(column) for column in columns} for values in records]
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(sql, rows, batcherrors=True)
+        errors = [(error.offset, error.message) for error in cursor.getbatcherrors()]
+    except DatabaseError:
+        # A statement-level rule (the Donation compound trigger) refused the whole batch;
+        # insert row by row to find the rows at fault
+        conn.rollback()
+        errors = []
+        for offset, row in enumerate(rows):
+            try:
+                cursor.execute(sql, row)
+            except DatabaseError as e:
+                errors.append((offset, str(e)))
+    if errors:
+        conn.rollback()
+        raise BatchRejected(errors)
+    conn.commit()
+    notify_write(table_name)
+
+
+def lock_row(conn, table, key):
+    """Whether the row with the key exists, kept from changing by other sessions until the transaction ends"""
+    return bool(engine_for(conn).lock_rows(conn.cursor(), f"SELECT {table.row_key} FROM {table.name} "
+                                                          f"WHERE {table.row_key} = :pk_value", {"pk_value": key}))
+
+
+def update_record(conn, table_name, key, column, value):
+    """Set one column of the row identified by the table's row key; returns the number of rows changed"""
+    table_name = table_name.lower()
+    table = schema.table(conn, table_name)
+    column = column.upper()
+    if column not in table.positions:
+        raise ValueError(f"Unknown column for {table_name}: {column}")
+    if table_name in UPDATABLE_COLUMNS:
+        if column != UPDATABLE_COLUMNS[table_name]:
+            raise ValueError(f"Only {UPDATABLE_COLUMNS[table_name].title()} can be updated for "
+                             f"{table_name.capitalize()} records")
+        # The procedures do not say whether they found the row, so it is looked up and locked first
+        if not lock_row(conn, table, key):
+            conn.rollback()
+            return 0
+        call_procedure(conn, "Update" + table_name.capitalize(), [key, value])
+        return 1
+    return execute(conn, f"UPDATE {table_name} SET {column} = :new_value WHERE {table.row_key} = :pk_value",
+                   {"new_value": value, "pk_value": key})
+
+
+def delete_record(conn, table_name, key):
+    """Delete the row identified by the table's row key; returns the number of rows deleted"""
+    table_name = table_name.lower()
+    table = schema.table(conn, table_name)
+    if table_name in PROCEDURE_COLUMNS:
+        if not lock_row(conn, table, key):
+            conn.rollback()
+            return 0
+        call_procedure(conn, "Delete" + table_name.capitalize(), [key])
+        return 1
+    return execute(conn, f"DELETE FROM {table_name} WHERE {table.row_key} = :pk_value", {"pk_value": key})
+
+
+def fetch_statistics(conn):
+    """Return the System Statistics counts and inventory breakdown in one round trip"""
+    engine = engine_for(conn)
+    cursor = conn.cursor()
+    # The totals row is joined to every inventory group, or once with NULLs when the inventory is empty
+    cursor.execute("SELECT c.donors, c.recipients, c.transfusions, "
+                   "b.Blood_Type, b.Blood_Component, b.units, b.quantity "
+                   "FROM (SELECT (SELECT COUNT(*) FROM Donor) AS donors, "
+                   "(SELECT COUNT(*) FROM Recipient) AS recipients, "
+                   f"(SELECT COUNT(*) FROM Transfusion) AS transfusions{engine.dual}) c "
+                   "LEFT JOIN (SELECT Blood_Type, Blood_Component, COUNT(*) AS units, SUM(Quantity) AS quantity "
+                   "FROM BloodInventory GROUP BY Blood_Type, Blood_Component) b ON 1 = 1 "
+                   "ORDER BY b.Blood_Type, b.Blood_Component")
+    rows = cursor.fetchall()
+
+    donors, recipients, transfusions = rows[0][:3]
+    breakdown = [row[3:] for row in rows if row[3] is not None]
+    by_blood_type = {}
+    by_component = {}
+    for blood_type, component, units, quantity in breakdown:
+        by_blood_type[blood_type] = by_blood_type.get(blood_type, 0) + units
+        by_component[component] = by_component.get(component, 0) + units
+    return {
+        "donor": donors,
+        "recipient": recipients,
+        "bloodinventory": sum(units for _, _, units, _ in breakdown),
+        "transfusion": transfusions,
+        "by_blood_type": by_blood_type,
+        "by_component": by_component,
+        "breakdown": breakdown,
+    }
+
+
+def fetch_page(conn, table_name, after=None, before=None, offset=0, page_size=PAGE_SIZE):
+    """Fetch one page of a table, by keyset on the primary key or by offset when it has none"""
+    engine = engine_for(conn)
+    primary_key = schema.primary_key(conn, table_name)
+    params = {"page_size": page_size}
+    if primary_key is None:
+        sql = engine.paginate(f"SELECT * FROM {table_name} ORDER BY ROWID", offset=True)
+        params["page_offset"] = offset
+        return query(conn, sql, params)
+
+    if before is not None:
+        sql = f"SELECT * FROM {table_name} WHERE {primary_key} < :boundary ORDER BY {primary_key} DESC"
+        params["boundary"] = before
+    elif after is not None:
+        sql = f"SELECT * FROM {table_name} WHERE {primary_key} > :boundary ORDER BY {primary_key}"
+        params["boundary"] = after
+    else:
+        sql = f"SELECT * FROM {table_name} ORDER BY {primary_key}"
+    rows, column_names = query(conn, engine.paginate(sql), params)
+    if before is not None:
+        rows.reverse()
+    return rows, column_names
+
+
+def change_watermark(conn):
+    """Return the id of the newest ChangeLog entry older than CHANGE_LAG seconds, or None when
+    change tracking is not installed.
+
+    Change ids are drawn from the sequence before commit, so a transaction still open can make
+    a lower id visible after a higher one was read. Following the log from an id that old means
+    the entries after it are read again until they are CHANGE_LAG seconds old, and none is missed.
+    """
+    engine = engine_for(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(engine.paginate(f"SELECT Change_ID FROM ChangeLog "
+                                       f"WHERE Changed_At < {engine.seconds_ago.format(':lag')} "
+                                       f"ORDER BY Change_ID DESC"),
+                       {"lag": CHANGE_LAG, "page_size": 1})
+    except DatabaseError:
+        return None
+    row = cursor.fetchone()
+    # Never behind the purged entries, or a new reader would be told to reload on every refresh
+    return max(row[0] if row else 0, purged_through(conn))
+
+
+def purged_through(conn):
+    """Return the newest ChangeLog id purge_changes has deleted, 0 if none"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(Purged_Through) FROM ChangeLogPurge")
+    except DatabaseError:
+        return 0
+    return cursor.fetchone()[0] or 0
+
+
+def purge_changes(conn, retention=CHANGE_RETENTION, batch_size=PURGE_BATCH):
+    """Delete the ChangeLog entries older than retention seconds in committed batches; returns how many.
+
+    The newest id deleted is recorded in ChangeLogPurge before anything is deleted, so a reader
+    following the log from an older watermark learns it missed entries, see changed_keys.
+    """
+    engine = engine_for(conn)
+    cursor = conn.cursor()
+    cursor.execute(engine.paginate(f"SELECT Change_ID FROM ChangeLog "
+                                   f"WHERE Changed_At < {engine.seconds_ago.format(':age')} "
+                                   f"ORDER BY Change_ID DESC"),
+                   {"age": retention, "page_size": 1})
+    row = cursor.fetchone()
+    if row is None or row[0] <= purged_through(conn):
+        return 0
+    through = row[0]
+    cursor.execute("UPDATE ChangeLogPurge SET Purged_Through = :through WHERE Purged_Through < :through",
+                   {"through": through})
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO ChangeLogPurge (Purged_Through) "
+                       f"SELECT :through{engine.dual} WHERE NOT EXISTS (SELECT 1 FROM ChangeLogPurge)",
+                       {"through": through})
+    conn.commit()
+
+    cursor.execute("SELECT MIN(Change_ID) FROM ChangeLog")
+    low = cursor.fetchone()[0]
+    deleted = 0
+    while low is not None and low <= through:
+        high = min(low + batch_size, through + 1)
+        cursor.execute("DELETE FROM ChangeLog WHERE Change_ID >= :low AND Change_ID < :high",
+                       {"low": low, "high": high})
+        deleted += cursor.rowcount
+        conn.commit()
+        low = high
+    return deleted
+
+
+def changed_keys(conn, table_name, since):
+    """Return a new watermark and the keys of the rows of a table changed since the given one.
+
+    The watermark only moves past entries older than CHANGE_LAG seconds, see change_watermark;
+    keys changed more recently are returned again by the next calls. The keys are None when
+    entries after the given watermark were purged, and the caller has to reload.
+    """
+    if purged_through(conn) > since:
+        return since, None
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT Row_Key, MAX(CASE WHEN Changed_At < {engine_for(conn).seconds_ago.format(':lag')} "
+                   f"THEN Change_ID END) FROM ChangeLog "
+                   f"WHERE Table_Name = :table_name AND Change_ID > :since GROUP BY Row_Key",
+                   {"table_name": table_name.upper(), "since": since, "lag": CHANGE_LAG})
+    changed = cursor.fetchall()
+    settled = [change_id for _, change_id in changed if change_id is not None]
+    return max(settled + [since]), [key for key, _ in changed]
+
+
+def fetch_in(conn, sql, keys, params=None):
+    """Run a query whose {keys} placeholder becomes an IN list, in chunks of IN_LIST_SIZE keys"""
+    rows = []
+    column_names = None
+    for start in range(0, len(keys), IN_LIST_SIZE):
+        binds = {f"k{i}": key for i, key in enumerate(keys[start:start + IN_LIST_SIZE])}
+        placeholders = ", ".join(f":{name}" for name in binds)
+        chunk, column_names = query(conn, sql.format(keys=placeholders), dict(params or {}, **binds))
+        rows.extend(chunk)
+    return rows, column_names
+
+
+def fetch_changes(conn, table_name, since):
+    """Return a new watermark and the current row for every key changed since the given one.
+
+    Deleted rows map to None. For tables without a primary key, or when the entries after the
+    watermark were purged, the rows are None and the caller has to reload.
+    """
+    watermark, keys = changed_keys(conn, table_name, since)
+    if keys is None:
+        return since, None
+    if not keys:
+        return since, {}
+
+    primary_key = schema.primary_key(conn, table_name)
+    if primary_key is None:
+        return watermark, None
+
+    rows = dict.fromkeys(keys)
+    found, _ = fetch_in(conn, f"SELECT * FROM {table_name} WHERE {primary_key} IN ({{keys}})", keys)
+    key_index = schema.table(conn, table_name).index(primary_key)
+    for row in found:
+        rows[row[key_index]] = row
+    return watermark, rows
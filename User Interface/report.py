@@ -0,0 +1,128 @@
+"""Daily transaction and inventory report read from the DailyReport table.
+
+The triggers of DBS/DailyReport.sql keep one row of totals per day, blood type and component,
+so a report over any date range sums a few rows per day. rebuild() recounts a range from the
+transactional tables, to fill the table for rows older than the triggers or to check it.
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+
+from DBpool import get_pool
+import operations
+
+REPORT_DAYS = 30    # days covered when no range is given
+
+# Totals kept per row, with their report headings
+MEASURES = [
+    ("DONATIONS", "Donations"),
+    ("DONATED_QUANTITY", "Donated Qty"),
+    ("TRANSFUSIONS", "Transfusions"),
+    ("TRANSFUSED_QUANTITY", "Transfused Qty"),
+    ("UNITS_STOCKED", "Units Stocked"),
+    ("STOCKED_QUANTITY", "Stocked Qty"),
+    ("UNITS_EXPIRED", "Units Expired"),
+]
+
+# What a report can be broken down by
+GROUPS = {"day": "Report_Date", "type": "Blood_Type", "component": "Blood_Component"}
+
+# The same totals counted from the transactional tables; a unit is stocked on its donation's date
+SOURCE_ROWS = """
+    SELECT {donation_day} AS Report_Date, Donated_BloodType AS Blood_Type, 'Whole Blood' AS Blood_Component,
+           1 AS Donations, COALESCE(Donated_Quantity, 0) AS Donated_Quantity, 0 AS Transfusions,
+           0 AS Transfused_Quantity, 0 AS Units_Stocked, 0 AS Stocked_Quantity, 0 AS Units_Expired
+    FROM Donation WHERE Donation_Date >= :range_start AND Donation_Date < :range_end
+    UNION ALL
+    SELECT {request_day}, Requested_BloodType, Requested_Component, 0, 0, 1, Requested_Quantity, 0, 0, 0
+    FROM Transfusion WHERE Request_Date >= :range_start AND Request_Date < :range_end
+    UNION ALL
+    SELECT {stocked_day}, b.Blood_Type, b.Blood_Component, 0, 0, 0, 0, 1, b.Quantity, 0
+    FROM BloodInventory b JOIN Donation d ON d.Donation_ID = b.Donation_ID
+    WHERE d.Donation_Date >= :range_start AND d.Donation_Date < :range_end
+    UNION ALL
+    SELECT {disposal_day}, Expired_BloodType, Expired_BloodComponent, 0, 0, 0, 0, 0, 0, 1
+    FROM ExpiredBlood WHERE Disposal_Date >= :range_start AND Disposal_Date < :range_end
+"""
+
+
+def date_range(start=None, end=None):
+    """Bounds [start, end) of the days from start to end inclusive, defaulting to the last REPORT_DAYS days"""
+    end = end or date.today()
+    start = start or end - timedelta(days=REPORT_DAYS - 1)
+    if start > end:
+        raise ValueError("The report must start on or before its last day")
+    return start, end + timedelta(days=1)
+
+
+def daily_report(conn, start=None, end=None, by=("type", "component")):
+    """Return (rows, column names) of the totals from start to end inclusive, one row per group in by"""
+    columns = [GROUPS[group] for group in by]
+    range_start, range_end = date_range(start, end)
+    sums = ", ".join(f"SUM({measure}) AS {measure}" for measure, _ in MEASURES)
+    sql = f"SELECT {sums} FROM DailyReport WHERE Report_Date >= :range_start AND Report_Date < :range_end"
+    if columns:
+        sql = (f"SELECT {', '.join(columns)}, {sums} FROM DailyReport "
+               f"WHERE Report_Date >= :range_start AND Report_Date < :range_end "
+               f"GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}")
+    return operations.query(conn, sql, {"range_start": range_start, "range_end": range_end})
+
+
+def rebuild(conn, start=None, end=None):
+    """Recount the report rows from start to end inclusive, or of every day when neither is given"""
+    if start is None and end is None:
+        range_start, range_end = date.min, date.max
+    else:
+        range_start, range_end = date_range(start, end)
+    day = operations.engine_for(conn).day
+    sums = ", ".join(f"SUM({measure})" for measure, _ in MEASURES)
+    source = SOURCE_ROWS.format(donation_day=day.format("Donation_Date"), request_day=day.format("Request_Date"),
+                                stocked_day=day.format("d.Donation_Date"), disposal_day=day.format("Disposal_Date"))
+    params = {"range_start": range_start, "range_end": range_end}
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM DailyReport WHERE Report_Date >= :range_start AND Report_Date < :range_end", params)
+    cursor.execute(f"INSERT INTO DailyReport (Report_Date, Blood_Type, Blood_Component, "
+                   f"{', '.join(measure for measure, _ in MEASURES)}) "
+                   f"SELECT Report_Date, Blood_Type, Blood_Component, {sums} FROM ({source}) s "
+                   f"GROUP BY Report_Date, Blood_Type, Blood_Component", params)
+    conn.commit()
+
+
+def parse_day(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the daily transaction and inventory report")
+    parser.add_argument("--from", dest="start", type=parse_day, help="first day, YYYY-MM-DD (default: 30 days ago)")
+    parser.add_argument("--to", dest="end", type=parse_day, help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--by", action="append", choices=GROUPS,
+                        help="break the totals down by day, type and/or component (default: type and component)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recount the range (every day without --from/--to) from the transactional tables first")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    try:
+        with pool.session() as conn:
+            if args.rebuild:
+                rebuild(conn, args.start, args.end)
+            rows, column_names = daily_report(conn, args.start, args.end, args.by or ("type", "component"))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        pool.close()
+
+    headings = dict(MEASURES)
+    widths = [max(len(headings.get(name, name.title())), 12) for name in column_names]
+    print("  ".join(headings.get(name, name.title()).ljust(width) for name, width in zip(column_names, widths)))
+    for row in rows:
+        print("  ".join(str(value if value is not None else 0)[:width].ljust(width)
+                        for value, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Donor and recipient search by ID, name, NIC number or contact, with recently viewed records kept in memory.
+
+Prefix matches are answered by the database from the normalized-key indexes added in migration 3.
+When they do not fill the result list, names are matched by trigram similarity against an
+in-process index, which tolerates typos and swapped words.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import operations
+
+SEARCH_LIMIT = 50        # matches returned per search
+RECENT_RECORDS = 500     # records kept by the LRU cache
+RECORD_TTL = 300         # seconds a cached record is shown before it is read again
+FUZZY_CUTOFF = 0.4       # least trigram similarity counted as a fuzzy match
+FUZZY_CANDIDATES = 5000  # most names scored per fuzzy search
+
+# Column name prefix of each table, and the query its records are shown with
+SEARCHES = {
+    "donor": ("Donor", operations.DONOR_LOOKUP),
+    "recipient": ("Recipient", operations.RECIPIENT_LOOKUP),
+}
+
+# Normalized search keys; migration 3 indexes these exact expressions, so they must stay in step
+NAME_KEY = "UPPER({prefix}_Name)"
+NIC_KEY = "REPLACE(REPLACE(UPPER({prefix}_NICnumber), '-', ''), ' ', '')"
+CONTACT_KEY = "REPLACE(REPLACE(REPLACE({prefix}_Contact, '-', ''), ' ', ''), '+', '')"
+
+
+def normalize_name(text):
+    return text.strip().upper()
+
+
+def normalize_nic(text):
+    return text.upper().replace("-", "").replace(" ", "")
+
+
+def normalize_contact(text):
+    return text.replace("-", "").replace(" ", "").replace("+", "")
+
+
+def prefix_range(key):
+    """Bounds [low, high) of every string starting with key, so the index is range scanned"""
+    return key, key[:-1] + chr(ord(key[-1]) + 1)
+
+
+def trigrams(name):
+    """Three-letter pieces of a name, each word padded so word starts weigh more"""
+    padded = "  " + "  ".join(name.upper().split()) + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(grams, other):
+    """Dice coefficient of two trigram sets"""
+    return 2 * len(grams & other) / (len(grams) + len(other)) if grams and other else 0.0
+
+
+class FuzzyIndex:
+    """Trigram postings of the names of one table, kept current through the ChangeLog"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.prefix = SEARCHES[table_name][0]
+        self.names = {}         # id -> name
+        self.postings = {}      # trigram -> ids; a renamed or deleted id is only dropped when scored
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def refresh(self, conn):
+        """Read every name on first use, afterwards only the rows changed since the last refresh"""
+        watermark = operations.change_watermark(conn)
+        sql = f"SELECT {self.prefix}_ID, {self.prefix}_Name FROM {self.table_name}"
+        keys = None
+        if self.watermark is not None and watermark is not None:
+            newest, keys = operations.changed_keys(conn, self.table_name, self.watermark)
+        if keys is None:
+            rows, _ = operations.query(conn, sql)
+            with self._lock:
+                self.names, self.postings = {}, {}
+                self.add(rows)
+        else:
+            watermark = max(watermark, newest)
+            rows, _ = operations.fetch_in(conn, sql + f" WHERE {self.prefix}_ID IN ({{keys}})", keys)
+            found = {record_id for record_id, _ in rows}
+            with self._lock:
+                for key in keys:
+                    if key not in found:
+                        self.names.pop(key, None)
+                self.add(rows)
+        with self._lock:
+            self.watermark = watermark
+
+    def add(self, rows):
+        for record_id, name in rows:
+            # Recent changes are read again on every refresh; an unchanged name keeps its postings
+            if self.names.get(record_id) == name:
+                continue
+            self.names[record_id] = name
+            for gram in trigrams(name):
+                self.postings.setdefault(gram, []).append(record_id)
+
+    def search(self, term, limit=SEARCH_LIMIT, exclude=()):
+        """Ids of the names most similar to term, best first"""
+        grams = trigrams(term)
+        with self._lock:
+            # Rare trigrams first; the common ones add candidates that rarely score well
+            candidates = set()
+            for gram in sorted(grams, key=lambda gram: len(self.postings.get(gram, ()))):
+                candidates.update(self.postings.get(gram, ()))
+                if len(candidates) >= FUZZY_CANDIDATES:
+                    break
+            scored = []
+            for record_id in candidates.difference(exclude):
+                name = self.names.get(record_id)
+                if name is not None:
+                    score = similarity(grams, trigrams(name))
+                    if score >= FUZZY_CUTOFF:
+                        scored.append((score, record_id))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return [record_id for _, record_id in scored[:limit]]
+
+
+class RecordCache:
+    """The most recently viewed records, dropped after a TTL or when their table is written"""
+
+    def __init__(self, size=RECENT_RECORDS, ttl=RECORD_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.records = OrderedDict()    # (table, id) -> (read at, rows, column names)
+        self._lock = threading.Lock()
+        operations.write_listeners.append(self.invalidate)
+
+    def get(self, table_name, record_id):
+        with self._lock:
+            entry = self.records.get((table_name, record_id))
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self.records[(table_name, record_id)]
+                return None
+            self.records.move_to_end((table_name, record_id))
+            return entry[1:]
+
+    def put(self, table_name, record_id, rows, column_names):
+        with self._lock:
+            self.records[(table_name, record_id)] = (time.monotonic(), rows, column_names)
+            self.records.move_to_end((table_name, record_id))
+            while len(self.records) > self.size:
+                self.records.popitem(last=False)
+
+    def invalidate(self, table_name=None):
+        """Forget the cached records of a table after a write to it"""
+        with self._lock:
+            for key in [key for key in self.records if table_name is None or key[0] == table_name]:
+                del self.records[key]
+
+    def close(self):
+        if self.invalidate in operations.write_listeners:
+            operations.write_listeners.remove(self.invalidate)
+
+
+class PersonSearch:
+    """Finds donors and recipients and serves the records viewed from the results"""
+
+    def __init__(self):
+        self.records = RecordCache()
+        self.fuzzy = {table_name: FuzzyIndex(table_name) for table_name in SEARCHES}
+
+    def find(self, conn, table_name, term, limit=SEARCH_LIMIT):
+        """Return (rows, column names) of up to limit people matching term: the exact ID,
+        then prefixes of the name, NIC number or contact, then names similar to term"""
+        prefix = SEARCHES[table_name][0]
+        columns = f"{prefix}_ID, {prefix}_Name, {prefix}_NICnumber, {prefix}_Contact, {prefix}_BloodType"
+        conditions = []
+        order = f"{prefix}_Name, {prefix}_ID"
+        params = {"page_size": limit}
+        if term.strip().isdigit():
+            conditions.append(f"{prefix}_ID = :id")
+            order = f"CASE WHEN {prefix}_ID = :id THEN 0 ELSE 1 END, " + order
+            params["id"] = int(term)
+        for name, key, normalize in (("name", NAME_KEY, normalize_name), ("nic", NIC_KEY, normalize_nic),
+                                     ("contact", CONTACT_KEY, normalize_contact)):
+            value = normalize(term)
+            if not value or (name == "contact" and not value.isdigit()):
+                continue
+            column = key.format(prefix=prefix)
+            conditions.append(f"({column} >= :{name}_low AND {column} < :{name}_high)")
+            params[f"{name}_low"], params[f"{name}_high"] = prefix_range(value)
+        if not conditions:
+            return [], []
+
+        sql = f"SELECT {columns} FROM {table_name} WHERE {' OR '.join(conditions)} ORDER BY {order}"
+        rows, column_names = operations.query(conn, operations.engine_for(conn).paginate(sql), params)
+
+        if len(rows) < limit and any(character.isalpha() for character in term):
+            fuzzy = self.fuzzy[table_name]
+            fuzzy.refresh(conn)
+            ids = fuzzy.search(term, limit - len(rows), exclude={row[0] for row in rows})
+            similar, _ = operations.fetch_in(conn, f"SELECT {columns} FROM {table_name} "
+                                                   f"WHERE {prefix}_ID IN ({{keys}})", ids)
+            ranks = {record_id: i for i, record_id in enumerate(ids)}
+            rows += sorted(similar, key=lambda row: ranks[row[0]])
+        return rows, column_names
+
+    def record(self, conn, table_name, record_id):
+        """Return (rows, column names) of one person's record, from the cache when viewed recently"""
+        cached = self.records.get(table_name, record_id)
+        if cached is not None:
+            return cached
+        rows, column_names = operations.query(conn, SEARCHES[table_name][1], {"id": record_id})
+        if rows:
+            self.records.put(table_name, record_id, rows, column_names)
+        return rows, column_names
+
+    def close(self):
+        self.records.close()
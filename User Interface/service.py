@@ -0,0 +1,447 @@
+"""Headless JSON service over HTTP exposing the Blood Bank operations to ward terminals and kiosks.
+
+Runs on asyncio from the standard library. Every request borrows a session from the one
+shared pool, so any number of clients are served by at most POOL_MAX database sessions.
+POST, PUT and DELETE need the header "Authorization: Bearer <token>" when a token is set
+with --token or BLOODBANK_SERVICE_TOKEN; without one the service only listens on 127.0.0.1.
+
+    GET    /health                      database reachable?
+    GET    /donors?q=                   donors matching an ID, name, NIC number or contact
+    GET    /donors/{id}                 donorrecord view for one donor
+    GET    /recipients?q=               recipients matching an ID, name, NIC number or contact
+    GET    /recipients/{id}             recipientrecord view for one recipient
+    GET    /statistics                  System Statistics counts
+    GET    /forecast?low=1              days of supply per blood type and component (low only); needs NumPy
+    GET    /tables/{table}              one page; ?after=, ?before= (keys) or ?offset=, and ?page_size=
+    POST   /tables/{table}              insert {column: value, ...}, or an array of them in one transaction
+    POST   /donations                   register a donation with its blood units, see intake.DonationIntake
+    PUT    /tables/{table}/{key}        update {column: value}
+    PUT    /tables/{table}              update [{key, value}, ...] of Donation or Transfusion in one call
+    DELETE /tables/{table}              delete {keys: [...]} of Donation or Transfusion in one call
+    DELETE /tables/{table}/{key}        delete
+    GET    /expired                     the ExpiredBlood log, paged like /tables
+"""
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from DBconnect import DatabaseError
+from DBpool import POOL_MAX, get_pool
+from exporter import json_value
+import bulk
+import forecast
+from intake import DonationIntake
+from metadata import TABLES, schema
+from search import SEARCH_LIMIT, PersonSearch
+from statistics_service import StatisticsService
+import operations
+
+HOST = "127.0.0.1"
+PORT = 8080
+TOKEN = os.environ.get("BLOODBANK_SERVICE_TOKEN")  # required for writes when set
+IDLE_TIMEOUT = 30           # seconds a kept-alive connection may wait for its next request
+MAX_BODY = 64 * 1024        # largest request body accepted
+MAX_HEADERS = 100
+MAX_PAGE_SIZE = 1000        # rows per page a client may ask for
+
+# Rejections that are the client's to fix: trigger rules (ORA-20xxx), duplicate keys and
+# missing or still referenced parent rows
+CONFLICT_ERRORS = re.compile(r"ORA-(?:20\d{3}|00001|02291|02292)|constraint failed", re.IGNORECASE)
+
+log = logging.getLogger("bloodbank.service")
+
+
+class ServiceError(Exception):
+    """A request answered with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip("/") or "/"
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self, many=False):
+        """The body as a JSON object, or with many also as an array of objects"""
+        try:
+            values = json.loads(self.body or b"{}")
+        except ValueError:
+            raise ServiceError(400, "The request body is not valid JSON")
+        if many and isinstance(values, list) and values and all(isinstance(value, dict) for value in values):
+            return values
+        if not isinstance(values, dict):
+            raise ServiceError(400, "The request body must be a JSON object" + (" or array of objects" if many else ""))
+        return values
+
+
+async def read_request(reader):
+    """Read one request from the stream, or None when the client has closed the connection"""
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise ServiceError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ServiceError(431, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except ValueError:
+        # A line longer than the stream's limit
+        raise ServiceError(431, "Request line or header too long")
+
+    if "transfer-encoding" in headers:
+        raise ServiceError(411, "Send the body with a Content-Length")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ServiceError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise ServiceError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, version.upper(), headers, body)
+
+
+def parse_key(value):
+    """Keys arrive as text; the tables' keys are numbers"""
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def bulk_result(name, action, keys, errors):
+    """Count only the rows a bulk call changed; 404 when none of the keys matched a row"""
+    missing = [keys[offset] for offset in bulk.not_found(errors)]
+    if keys and len(missing) == len(keys):
+        raise ServiceError(404, f"No {name} records with the given keys")
+    result = {"table": name, action: len(keys) - len(missing)}
+    if missing:
+        result["not_found"] = missing
+    return 200, result
+
+
+def page_arguments(query):
+    """fetch_page keyword arguments from ?after=, ?before=, ?offset= and ?page_size="""
+    arguments = {"page_size": min(int(query.get("page_size", operations.PAGE_SIZE)), MAX_PAGE_SIZE),
+                 "offset": int(query.get("offset", 0))}
+    if arguments["page_size"] < 1 or arguments["offset"] < 0:
+        raise ValueError("page_size must be positive and offset not negative")
+    for name in ("after", "before"):
+        if name in query:
+            arguments[name] = parse_key(query[name])
+    return arguments
+
+
+def table_name(name):
+    name = name.lower()
+    if name not in TABLES:
+        raise ServiceError(404, f"Unknown table {name}")
+    return name
+
+
+class BloodBankService:
+    """Routes requests to the operations module, running the database work on a thread per pooled session"""
+
+    def __init__(self, pool, workers=POOL_MAX, token=None):
+        self.pool = pool
+        self.token = token
+        # No more threads than sessions, so a request waits here rather than inside the pool
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bloodbank-db")
+        self.statistics = StatisticsService()
+        self.search = PersonSearch()
+        self.routes = [
+            ("GET", r"/health", self.health),
+            ("GET", r"/donors", self.find_donors),
+            ("GET", r"/recipients", self.find_recipients),
+            ("GET", r"/donors/(\d+)", self.donor),
+            ("GET", r"/recipients/(\d+)", self.recipient),
+            ("GET", r"/statistics", self.statistics_snapshot),
+            ("GET", r"/forecast", self.stock_forecast),
+            ("GET", r"/expired", self.expired),
+            ("GET", r"/tables/(\w+)", self.page),
+            ("POST", r"/tables/(\w+)", self.insert),
+            ("POST", r"/donations", self.register_donation),
+            ("PUT", r"/tables/(\w+)", self.update_many),
+            ("DELETE", r"/tables/(\w+)", self.delete_many),
+            ("PUT", r"/tables/(\w+)/([^/]+)", self.update),
+            ("DELETE", r"/tables/(\w+)/([^/]+)", self.delete),
+        ]
+        self.routes = [(method, re.compile(pattern), handler) for method, pattern, handler in self.routes]
+
+    async def run(self, work, retry=True):
+        """Call work(conn) on a pooled session without blocking the event loop; writes pass retry=False"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.pool.run, work, retry)
+
+    def authorize(self, request):
+        """Refuse a write without the service token, when one is set"""
+        if self.token is None:
+            return
+        scheme, _, credential = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(credential.strip(), self.token):
+            raise ServiceError(401, "Writes need the header Authorization: Bearer <token>")
+
+    async def health(self, request):
+        healthy = await asyncio.get_running_loop().run_in_executor(self.executor, self.pool.check_health)
+        return (200, {"database": "ok"}) if healthy else (503, {"database": "unavailable"})
+
+    async def find(self, request, table_name):
+        term = request.query.get("q", "").strip()
+        if not term:
+            raise ServiceError(400, "Give the search term as ?q=")
+        limit = min(int(request.query.get("limit", SEARCH_LIMIT)), MAX_PAGE_SIZE)
+        rows, column_names = await self.run(lambda conn: self.search.find(conn, table_name, term, limit))
+        return 200, {"columns": column_names, "rows": rows}
+
+    async def find_donors(self, request):
+        return await self.find(request, "donor")
+
+    async def find_recipients(self, request):
+        return await self.find(request, "recipient")
+
+    async def lookup(self, table_name, record_id, missing):
+        # Recently viewed records are answered without borrowing a session
+        cached = self.search.records.get(table_name, int(record_id))
+        if cached is None:
+            cached = await self.run(lambda conn: self.search.record(conn, table_name, int(record_id)))
+        rows, column_names = cached
+        if not rows:
+            raise ServiceError(404, missing)
+        return 200, {"columns": column_names, "rows": rows}
+
+    async def donor(self, request, donor_id):
+        return await self.lookup("donor", donor_id, f"No donor with ID {donor_id}")
+
+    async def recipient(self, request, recipient_id):
+        return await self.lookup("recipient", recipient_id, f"No recipient with ID {recipient_id}")
+
+    async def statistics_snapshot(self, request):
+        # A fresh snapshot is answered without borrowing a session
+        counts = self.statistics.cached()
+        if counts is None:
+            counts = await self.run(self.statistics.snapshot)
+        return 200, counts
+
+    async def stock_forecast(self, request):
+        if forecast.numpy is None:
+            raise ServiceError(503, "The stock forecast needs NumPy on the server")
+        rows, column_names = await self.run(forecast.forecast)
+        if request.query.get("low"):
+            rows = [row for row in rows if row[-1] == "Yes"]
+        return 200, {"columns": column_names, "rows": rows}
+
+    async def page(self, request, name):
+        name = table_name(name)
+        arguments = page_arguments(request.query)
+
+        def work(conn):
+            # Read the change watermark first so no change made during the fetch is missed
+            watermark = operations.change_watermark(conn)
+            rows, column_names = operations.fetch_page(conn, name, **arguments)
+            table = schema.table(conn, name)
+            return rows, column_names, watermark, table
+
+        rows, column_names, watermark, table = await self.run(work)
+        result = {"table": name, "columns": column_names, "rows": rows, "watermark": watermark}
+        if len(rows) == arguments["page_size"]:
+            # Where the next page starts
+            if table.primary_key is None:
+                result["next"] = {"offset": arguments["offset"] + len(rows)}
+            else:
+                result["next"] = {"after": rows[-1][table.index(table.primary_key)]}
+        return 200, result
+
+    async def expired(self, request):
+        return await self.page(request, "expiredblood")
+
+    async def insert(self, request, name):
+        name = table_name(name)
+        values = request.json(many=True)
+        if isinstance(values, list):
+            await self.run(lambda conn: operations.insert_records(conn, name, values), retry=False)
+            return 201, {"table": name, "inserted": len(values)}
+        await self.run(lambda conn: operations.insert_record(conn, name, values), retry=False)
+        return 201, {"table": name, "inserted": 1}
+
+    async def register_donation(self, request):
+        intake = DonationIntake.from_values(request.json())
+        donation_id, inventory_ids = await self.run(intake.register, retry=False)
+        return 201, {"donation_id": donation_id, "inventory_ids": inventory_ids}
+
+    async def update(self, request, name, key):
+        name = table_name(name)
+        values = request.json()
+        if len(values) != 1:
+            raise ServiceError(400, "Send exactly one {column: value} to update")
+        (column, value), = values.items()
+        updated = await self.run(lambda conn: operations.update_record(conn, name, parse_key(key), column, value),
+                                 retry=False)
+        if not updated:
+            raise ServiceError(404, f"No {name} record with key {key}")
+        return 200, {"table": name, "key": parse_key(key), "updated": column.upper()}
+
+    async def update_many(self, request, name):
+        name = bulk.bulk_table(table_name(name))
+        changes = request.json(many=True)
+        if not isinstance(changes, list) or not all("key" in change and "value" in change for change in changes):
+            raise ServiceError(400, "Send the changes as [{\"key\": id, \"value\": quantity}, ...]")
+        pairs = [(parse_key(str(change["key"])), change["value"]) for change in changes]
+        errors = await self.run(lambda conn: bulk.update_many(conn, name, pairs, atomic=True), retry=False)
+        return bulk_result(name, "updated", [key for key, _ in pairs], errors)
+
+    async def delete_many(self, request, name):
+        name = bulk.bulk_table(table_name(name))
+        keys = request.json().get("keys")
+        if not isinstance(keys, list):
+            raise ServiceError(400, "Send the keys to delete as {\"keys\": [...]}")
+        keys = [parse_key(str(key)) for key in keys]
+        errors = await self.run(lambda conn: bulk.delete_many(conn, name, keys, atomic=True), retry=False)
+        return bulk_result(name, "deleted", keys, errors)
+
+    async def delete(self, request, name, key):
+        name = table_name(name)
+        deleted = await self.run(lambda conn: operations.delete_record(conn, name, parse_key(key)), retry=False)
+        if not deleted:
+            raise ServiceError(404, f"No {name} record with key {key}")
+        return 200, {"table": name, "key": parse_key(key), "deleted": True}
+
+    async def dispatch(self, request):
+        """Answer one request with a status and a JSON-ready payload"""
+        allowed = []
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                if method != "GET":
+                    self.authorize(request)
+                return await handler(request, *match.groups())
+            except ServiceError as e:
+                return e.status, {"error": str(e)}
+            except operations.BatchRejected as e:
+                return 409, {"error": f"{e}; nothing was saved",
+                             "rows": [{"row": offset, "error": message} for offset, message in e.errors]}
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            except DatabaseError as e:
+                if CONFLICT_ERRORS.search(str(e)):
+                    return 409, {"error": str(e)}
+                log.error("%s %s failed: %s", request.method, request.path, e)
+                return 500, {"error": str(e)}
+            except Exception:
+                log.exception("%s %s failed", request.method, request.path)
+                return 500, {"error": "Internal error"}
+        if allowed:
+            return 405, {"error": f"Use {', '.join(allowed)} for {request.path}"}
+        return 404, {"error": f"No such resource {request.path}"}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=json_value).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one client connection until it closes or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except ServiceError as e:
+                    await self.respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, payload = await self.dispatch(request)
+                await self.respond(writer, status, payload, request.keep_alive)
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.statistics.close()
+        self.search.close()
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(service, host=HOST, port=PORT):
+    server = await asyncio.start_server(service.handle, host, port)
+    addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"Serving the Blood Bank API on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Blood Bank operations as JSON over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--token", default=TOKEN,
+                        help="token writes must send as a bearer token, defaults to BLOODBANK_SERVICE_TOKEN")
+    parser.add_argument("--backend", help="oracle or sqlite, defaults to BLOODBANK_BACKEND")
+    args = parser.parse_args()
+    if not args.token and not is_loopback(args.host):
+        parser.error("set a write token with --token or BLOODBANK_SERVICE_TOKEN to listen beyond this machine")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pool = get_pool(args.backend)
+    if pool is None:
+        raise SystemExit(1)
+    service = BloodBankService(pool, token=args.token or None)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
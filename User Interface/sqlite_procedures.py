@@ -0,0 +1,120 @@
+"""Python versions of the PL/SQL procedures the SQLite engine cannot parse from the DBS scripts.
+
+Each takes the SQLite cursor followed by the procedure's parameters and returns the
+parameter list with OUT parameters filled in, like cx_Oracle's callproc.
+"""
+
+import sqlite3
+
+# Message of the bulk update and delete rows whose key matched no row, as in DBS/BulkProcedures.sql
+NO_DATA_FOUND = "ORA-01403: no data found"
+
+
+def sweep_expired_blood(cursor, staff_id, batch_size, max_batches, swept=None):
+    """SweepExpiredBlood from DBS/ExpirySweep.sql"""
+    total = 0
+    batches = 0
+    cursor.execute("SELECT datetime('now', 'localtime')")
+    now, = cursor.fetchone()
+    cursor.execute("SELECT COALESCE(datetime(MAX(Swept_Until), '-1 day'), '') FROM ExpirySweep")
+    swept_from, = cursor.fetchone()
+    while True:
+        # Oldest expired units not logged yet, from where the last sweep got to
+        cursor.execute("SELECT b.Inventory_ID, b.Blood_Type, b.Blood_Component, b.Expiry_Date "
+                       "FROM BloodInventory b "
+                       "WHERE b.Expiry_Date >= :swept_from AND b.Expiry_Date < :now "
+                       "AND NOT EXISTS (SELECT 1 FROM ExpiredBlood e WHERE e.Inventory_ID = b.Inventory_ID) "
+                       "ORDER BY b.Expiry_Date LIMIT :batch_size",
+                       {"swept_from": swept_from, "now": now, "batch_size": batch_size})
+        units = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(Expired_Log_ID), 0) FROM ExpiredBlood")
+        last_id, = cursor.fetchone()
+        cursor.executemany("INSERT INTO ExpiredBlood (Expired_Log_ID, Inventory_ID, Expired_BloodType, "
+                           "Expired_BloodComponent, Disposal_Date, Staff_ID, Remarks) "
+                           "VALUES (:log_id, :inventory_id, :blood_type, :component, datetime('now', 'localtime'), "
+                           ":staff_id, 'Expired in storage')",
+                           [{"log_id": last_id + i, "inventory_id": inventory_id, "blood_type": blood_type,
+                             "component": component, "staff_id": staff_id}
+                            for i, (inventory_id, blood_type, component, _) in enumerate(units, 1)])
+        swept_from = units[-1][3] if len(units) == batch_size else now
+        cursor.execute("UPDATE ExpirySweep SET Swept_Until = MAX(Swept_Until, :swept_until)",
+                       {"swept_until": swept_from})
+        if cursor.rowcount <= 0:
+            cursor.execute("INSERT INTO ExpirySweep (Swept_Until) VALUES (:swept_until)", {"swept_until": swept_from})
+        total += len(units)
+        batches += 1
+        cursor.connection.commit()
+        if len(units) < batch_size or (max_batches is not None and batches >= max_batches):
+            break
+    return [staff_id, batch_size, max_batches, total]
+
+
+def register_donation(cursor, donor_id, blood_type, quantity, donation_date, recipient_id, components,
+                      quantities, temperatures, expiry_dates, donation_id=None, inventory_ids=None):
+    """RegisterDonation from DBS/RegisterDonation.sql"""
+    raw = cursor.connection.raw
+    if not raw.in_transaction:
+        # Releasing a savepoint that began the transaction would commit it; the caller commits
+        raw.execute("BEGIN")
+    # SQLite has no deferrable keys to switch; this defers every key check to the commit
+    raw.execute("PRAGMA defer_foreign_keys = ON")
+    raw.execute("SAVEPOINT register_donation")
+    try:
+        donation_id = raw.execute("SELECT COALESCE(MAX(Donation_ID), 0) + 1 FROM Donation").fetchone()[0]
+        first_unit = raw.execute("SELECT COALESCE(MAX(Inventory_ID), 0) + 1 FROM BloodInventory").fetchone()[0]
+        inventory_ids = list(range(first_unit, first_unit + len(components)))
+        raw.executemany("INSERT INTO BloodInventory (Inventory_ID, Blood_Type, Blood_Component, Quantity, "
+                        "Temperature, Expiry_Date, Donation_ID) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(inventory_id, blood_type, component, unit_quantity, temperature, expiry_date, donation_id)
+                         for inventory_id, component, unit_quantity, temperature, expiry_date
+                         in zip(inventory_ids, components, quantities, temperatures, expiry_dates)])
+        raw.execute("INSERT INTO Donation (Donation_ID, Donor_ID, Donated_BloodType, Donated_Quantity, "
+                    "Donation_Date, Recipient_ID, Inventory_ID) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (donation_id, donor_id, blood_type, quantity, donation_date, recipient_id,
+                     inventory_ids[0] if inventory_ids else None))
+        # Keys left dangling would only fail at commit; fail the call instead, as SET CONSTRAINTS IMMEDIATE does
+        broken = raw.execute("SELECT * FROM pragma_foreign_key_check('Donation') UNION ALL "
+                             "SELECT * FROM pragma_foreign_key_check('BloodInventory')").fetchone()
+        if broken:
+            raise sqlite3.IntegrityError(f"ORA-02291: integrity constraint violated - parent key not found "
+                                         f"({broken[0]} row {broken[1]} -> {broken[2]})")
+    except sqlite3.Error:
+        raw.execute("ROLLBACK TO register_donation")
+        raw.execute("RELEASE register_donation")
+        raise
+    raw.execute("RELEASE register_donation")
+    return [donor_id, blood_type, quantity, donation_date, recipient_id, components, quantities, temperatures,
+            expiry_dates, donation_id, inventory_ids]
+
+
+def forall(name):
+    """Array version of a procedure from ProcedureCreation.sql, as in DBS/BulkProcedures.sql: the
+    procedure runs once per element and failed elements come back as row offsets and messages.
+    Updates and deletes also report the elements whose key matched no row, with NO_DATA_FOUND"""
+    def procedure(cursor, *parameters):
+        arrays = parameters[:-2]
+        param_names, statements = cursor.connection.engine.procedures[name]
+        statement, = statements
+        cursor.executemany(statement, [dict(zip(param_names, values)) for values in zip(*arrays)],
+                           batcherrors=True, arraydmlrowcounts=True)
+        errors = [(error.offset, error.message) for error in cursor.getbatcherrors()]
+        if not name.startswith("insert"):
+            failed = {offset for offset, _ in errors}
+            errors += [(offset, NO_DATA_FOUND) for offset, count in enumerate(cursor.getarraydmlrowcounts())
+                       if count == 0 and offset not in failed]
+            errors.sort()
+        return list(arrays) + [[offset for offset, _ in errors], [message for _, message in errors]]
+    return procedure
+
+
+# Procedure name (lower case) -> Python implementation
+PROCEDURES = {
+    "sweepexpiredblood": sweep_expired_blood,
+    "registerdonation": register_donation,
+    "insertdonations": forall("insertdonation"),
+    "updatedonations": forall("updatedonation"),
+    "deletedonations": forall("deletedonation"),
+    "inserttransfusions": forall("inserttransfusion"),
+    "updatetransfusions": forall("updatetransfusion"),
+    "deletetransfusions": forall("deletetransfusion"),
+}
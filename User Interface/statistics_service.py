@@ -0,0 +1,53 @@
+import threading
+import time
+
+import operations
+
+STATS_TTL = 30  # seconds a statistics snapshot is shown before it is read again
+
+# Tables whose writes change the statistics
+STATS_TABLES = {"donor", "recipient", "bloodinventory", "transfusion"}
+
+
+class StatisticsService:
+    """Keeps the latest statistics snapshot and drops it after a TTL or when a counted table is written"""
+
+    def __init__(self, ttl=STATS_TTL):
+        self.ttl = ttl
+        self.counts = None
+        self.taken_at = 0
+        self._lock = threading.Lock()
+        operations.write_listeners.append(self.invalidate)
+
+    def cached(self):
+        """Return the snapshot if it is still fresh, else None"""
+        with self._lock:
+            if self.counts is not None and time.monotonic() - self.taken_at < self.ttl:
+                return self.counts
+            return None
+
+    def snapshot(self, conn):
+        """Return a fresh snapshot, reading the database only when the cached one has expired"""
+        counts = self.cached()
+        if counts is not None:
+            return counts
+        started = time.monotonic()
+        counts = operations.fetch_statistics(conn)
+        with self._lock:
+            # A write during the query invalidated it already; keep the result but not as the cached copy
+            if self.taken_at <= started:
+                self.counts = counts
+                self.taken_at = started
+        return counts
+
+    def invalidate(self, table_name=None):
+        """Forget the snapshot after a write to one of the counted tables"""
+        if table_name is not None and table_name.lower() not in STATS_TABLES:
+            return
+        with self._lock:
+            self.counts = None
+            self.taken_at = time.monotonic()
+
+    def close(self):
+        if self.invalidate in operations.write_listeners:
+            operations.write_listeners.remove(self.invalidate)
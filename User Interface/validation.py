@@ -0,0 +1,302 @@
+"""Client-side checks mirroring the trigger rules, so bad submissions are caught before a round trip"""
+
+import calendar
+import threading
+from datetime import date, datetime, timedelta
+
+import operations
+
+# Thresholds used by the triggers in DBS/Triggers.sql
+DONATION_INTERVAL_MONTHS = 3   # ADD_MONTHS(SYSDATE, -3)
+MIN_HB_LEVEL = 13
+MIN_WEIGHT = 50
+MAX_DONOR_AGE = 50
+
+# Date formats the forms accept: ISO, Oracle's default DD-MON-RR and the staff form's DD/MM/YYYY
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d-%b-%y", "%d-%b-%Y", "%d/%m/%Y")
+
+# Tables the cache follows through the ChangeLog
+WATCHED_TABLES = ("donor", "donation", "donorscreening", "recipient")
+
+
+class RuleViolation(Exception):
+    """A submission the database triggers would reject"""
+
+    def __init__(self, code, message):
+        super().__init__(f"ORA-{code}: {message}")
+        self.code = code
+
+
+def parse_date(value):
+    """Read a date typed into a form, or None when it is in a format we do not know"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def months_before(moment, months):
+    """The cutoff the triggers compare donation dates with: the same time the given calendar months earlier.
+
+    ADD_MONTHS clamps a day the earlier month lacks to its last day, and keeps a month's last day on the
+    last day; SQLite's '-3 months' carries the extra days into the following month. The later of the two
+    is returned, so the pre-check never refuses a donation either engine would take.
+    """
+    month = moment.month - 1 - months
+    year = moment.year + month // 12
+    month = month % 12 + 1
+    last_day = calendar.monthrange(year, month)[1]
+    if moment.day == calendar.monthrange(moment.year, moment.month)[1]:
+        clamped = moment.replace(year=year, month=month, day=last_day)
+    else:
+        clamped = moment.replace(year=year, month=month, day=min(moment.day, last_day))
+    carried = moment.replace(year=year, month=month, day=1) + timedelta(days=moment.day - 1)
+    return max(clamped, carried)
+
+
+def donation_cutoff():
+    return months_before(datetime.now(), DONATION_INTERVAL_MONTHS)
+
+
+def parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RuleCache:
+    """Donor eligibility, donation dates and blood types held locally and refreshed from the ChangeLog.
+
+    Only the donations the rules can still need are held: those within the donation interval and
+    those with units still in stock, which transfusions draw from. check() only reads the cache and
+    never touches the database; anything it does not know about is let through for the triggers to decide.
+    """
+
+    def __init__(self, compatibility=None):
+        self.compatibility = compatibility
+        self.donors = {}            # donor id -> (eligibility status, age)
+        self.donations = {}         # recent or stocked donation id -> (donor id, blood type, donation date)
+        self.donor_donations = {}   # donor id -> set of donation ids
+        self.positive_screening = set()
+        self.recipients = {}        # recipient id -> blood type
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def refresh(self, conn):
+        """Load everything on first use, afterwards only the rows changed since the last refresh"""
+        watermark = operations.change_watermark(conn)
+        keys = None
+        if self.watermark is not None and watermark is not None:
+            keys = {}
+            for table_name in WATCHED_TABLES:
+                newest, keys[table_name] = operations.changed_keys(conn, table_name, self.watermark)
+                watermark = max(watermark, newest)
+            if None in keys.values():
+                # The ChangeLog entries since the last refresh were purged
+                keys = None
+        self.load(conn, keys)
+        with self._lock:
+            self.watermark = watermark
+        if self.compatibility is not None:
+            self.compatibility.load(conn)
+
+    def load(self, conn, keys=None):
+        """Read the cached rows, all of them or only the given keys per table"""
+        def rows(sql, key_column, table_name, condition=None):
+            conditions = [condition] if condition else []
+            if keys is not None:
+                if not keys[table_name]:
+                    return []
+                conditions.append(f"{key_column} IN ({{keys}})")
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            if keys is None:
+                return operations.query(conn, sql)[0]
+            return operations.fetch_in(conn, sql, keys[table_name])[0]
+
+        donors = rows("SELECT Donor_ID, Eligibility_Status, Donor_Age FROM Donor", "Donor_ID", "donor")
+        donation_columns = "SELECT Donation_ID, Donor_ID, Donated_BloodType, Donation_Date FROM Donation"
+        if keys is None:
+            donations = operations.query(conn, donation_columns + " WHERE Donation_Date > :cutoff",
+                                         {"cutoff": donation_cutoff()})[0]
+            donations += operations.query(conn, donation_columns + " WHERE Donation_ID IN "
+                                          "(SELECT Donation_ID FROM BloodInventory WHERE Expiry_Date >= :now)",
+                                          {"now": datetime.now()})[0]
+        else:
+            donations = rows(donation_columns, "Donation_ID", "donation")
+        positive = rows("SELECT DISTINCT Donor_ID FROM DonorScreening", "Donor_ID", "donorscreening",
+                        "(UPPER(HIV_Test) = 'P' OR UPPER(Hepatitis_Test) = 'P' OR "
+                        "UPPER(Syphilis_Test) = 'P' OR UPPER(Malaria_Test) = 'P')")
+        recipients = rows("SELECT Recipient_ID, Recipient_BloodType FROM Recipient", "Recipient_ID", "recipient")
+
+        with self._lock:
+            if keys is None:
+                self.donors, self.donations, self.donor_donations = {}, {}, {}
+                self.positive_screening, self.recipients = set(), {}
+            else:
+                # Drop the changed keys; the ones that still exist come back from the queries
+                for donor_id in keys["donor"]:
+                    self.donors.pop(donor_id, None)
+                for donation_id in keys["donation"]:
+                    self.forget_donation(donation_id)
+                self.positive_screening.difference_update(keys["donorscreening"])
+                for recipient_id in keys["recipient"]:
+                    self.recipients.pop(recipient_id, None)
+
+            for donor_id, status, age in donors:
+                self.donors[donor_id] = (status, age)
+            for donation_id, donor_id, blood_type, donation_date in donations:
+                self.donations[donation_id] = (donor_id, blood_type, parse_date(donation_date))
+                self.donor_donations.setdefault(donor_id, set()).add(donation_id)
+            self.positive_screening.update(donor_id for donor_id, in positive)
+            self.recipients.update(recipients)
+
+    def forget_donation(self, donation_id):
+        donation = self.donations.pop(donation_id, None)
+        if donation is not None:
+            self.donor_donations.get(donation[0], set()).discard(donation_id)
+
+    def check(self, table_name, values, updating=False):
+        """Raise RuleViolation if the triggers would reject this insert or update.
+
+        values maps upper-case column names to the submitted values.
+        """
+        table_name = table_name.lower()
+        with self._lock:
+            if table_name == "donation":
+                self.check_donation(values, updating)
+            elif table_name == "bloodinventory":
+                self.check_expiry(values)
+            elif table_name == "transfusion":
+                self.check_transfusion(values)
+            elif table_name == "donor":
+                self.check_donor(values)
+            elif table_name == "donorscreening" and not updating:
+                self.check_screening(values)
+
+    def check_donation(self, values, updating):
+        donation_id = parse_id(values.get("DONATION_ID"))
+        donor_id = parse_id(values.get("DONOR_ID"))
+        if donor_id is None and updating and donation_id in self.donations:
+            donor_id = self.donations[donation_id][0]
+        if donor_id is None:
+            return
+
+        status = self.donors.get(donor_id, (None, None))[0]
+        if status is not None and status != "Eligible":
+            raise RuleViolation(20002, "The donor is not eligible for donation.")
+
+        # check_donation_rules: the donor's other donations must all be over 3 months old
+        cutoff = donation_cutoff()
+        for other_id in self.donor_donations.get(donor_id, ()):
+            other_date = self.donations[other_id][2]
+            if other_id != donation_id and other_date is not None and other_date > cutoff:
+                raise RuleViolation(20001, "Donor is not eligible to donate again within 3 months.")
+
+    def check_expiry(self, values):
+        if "EXPIRY_DATE" not in values:
+            return
+        expiry_date = parse_date(values["EXPIRY_DATE"])
+        if expiry_date is not None and expiry_date < datetime.now():
+            raise RuleViolation(20001, "Cannot insert or update. Blood is expired.")
+
+    def check_transfusion(self, values):
+        donation = self.donations.get(parse_id(values.get("DONATION_ID")))
+        recipient_type = self.recipients.get(parse_id(values.get("RECIPIENT_ID")))
+        if donation is None or recipient_type is None:
+            return
+        donor_type = donation[1]
+        component = values.get("REQUESTED_COMPONENT") or ""
+        if self.compatibility is not None and self.compatibility.loaded:
+            compatible = self.compatibility.compatible(donor_type, recipient_type, component)
+        else:
+            compatible = donor_type == recipient_type
+        if not compatible:
+            raise RuleViolation(20004, "The blood type of the donation is not compatible with the recipient.")
+
+    def check_donor(self, values):
+        status = values.get("ELIGIBILITY_STATUS")
+        donor_id = parse_id(values.get("DONOR_ID"))
+        if status and status.upper() == "ELIGIBLE" and donor_id in self.positive_screening:
+            raise RuleViolation(20005, 'Eligibility cannot be set to "Eligible" because one or more tests '
+                                       'are positive in Donor Screening.')
+
+    def check_screening(self, values):
+        hb_level = parse_number(values.get("HB_LEVEL"))
+        weight = parse_number(values.get("WEIGHT"))
+        age = self.donors.get(parse_id(values.get("DONOR_ID")), (None, None))[1]
+        if ((hb_level is not None and hb_level < MIN_HB_LEVEL) or (weight is not None and weight < MIN_WEIGHT)
+                or (age is not None and age > MAX_DONOR_AGE)):
+            raise RuleViolation(20006, "Donor cannot be marked as Eligible due to failing screening conditions.")
+
+
+def prepare_batch(rules, table, rows):
+    """Check rows typed into the batch grid against the schema, each other and the cached trigger rules.
+
+    rows are {column: text} dicts for a metadata.Table. Returns the rows ready to bind, with
+    numbers and dates parsed and empty values as None, and {row offset: message} for the rows at fault.
+    """
+    prepared = []
+    errors = {}
+    seen_keys = set()
+    donor_rows = {}     # donor id -> (row offset, donation date) of the donations in the batch
+
+    for offset, values in enumerate(rows):
+        values = {column.upper(): value.strip() if isinstance(value, str) else value
+                  for column, value in values.items()}
+        row = {}
+        try:
+            for column in table.columns:
+                value = values.get(column.name)
+                if value in (None, ""):
+                    if not column.nullable:
+                        raise ValueError(f"{column.name} is required")
+                    row[column.name] = None
+                elif column.is_date:
+                    row[column.name] = parse_date(value)
+                    if row[column.name] is None:
+                        raise ValueError(f"{column.name} is not a date: {value}")
+                elif column.is_number:
+                    number = parse_number(value)
+                    if number is None:
+                        raise ValueError(f"{column.name} is not a number: {value}")
+                    row[column.name] = int(number) if number.is_integer() else number
+                else:
+                    row[column.name] = value
+
+            if table.primary_key:
+                key = row[table.primary_key]
+                if key in seen_keys:
+                    raise ValueError(f"{table.primary_key} {key} appears twice in the batch")
+                seen_keys.add(key)
+
+            rules.check(table.name, values)
+            if table.name == "donation" and row.get("DONATION_DATE") is not None:
+                donor_rows.setdefault(row.get("DONOR_ID"), []).append((offset, row["DONATION_DATE"]))
+        except (ValueError, RuleViolation) as e:
+            errors[offset] = str(e)
+        prepared.append(row)
+
+    # The cache only knows committed donations. As in check_donation, a row fails when another
+    # donation of its donor in the batch is less than 3 months before today, whatever their own dates
+    cutoff = donation_cutoff()
+    for donations in donor_rows.values():
+        recent = [offset for offset, donation_date in donations if donation_date > cutoff]
+        for offset, _ in donations:
+            if offset not in errors and any(other != offset for other in recent):
+                errors[offset] = str(RuleViolation(20001, "Donor is not eligible to donate again within 3 months."))
+    return prepared, errors
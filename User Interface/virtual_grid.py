@@ -0,0 +1,229 @@
+from bisect import bisect_left
+from tkinter import ttk
+
+import operations
+from metadata import schema
+
+MAX_PAGES = 3           # pages kept in the widget at once
+LOAD_THRESHOLD = 0.1    # fraction of the scroll range from either end that triggers the next page
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview that loads a table one page at a time as you scroll, keeping a bounded window of rows"""
+
+    def __init__(self, parent, executor, table_name, column_names, first_page=None, watermark=None,
+                 page_size=operations.PAGE_SIZE, max_pages=MAX_PAGES, on_error=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.table_name = table_name
+        self.column_names = column_names
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.on_error = on_error
+
+        # The first page came from operations.fetch_page, which has loaded the schema
+        table = schema.get(table_name)
+        self.key_index = table.index(table.primary_key) if table and table.primary_key else None
+
+        # Loaded pages, oldest first: {"keys": [...], "rows": [...], "items": [...], "offset": n}
+        self.pages = []
+        # Newest ChangeLog entry already reflected in the loaded rows
+        self.watermark = watermark
+        self.more_before = False
+        self.more_after = True
+        self.loading = None
+
+        # Create scrollbar
+        self.scrollbar_y = ttk.Scrollbar(self)
+        self.scrollbar_y.pack(side="right", fill="y")
+
+        self.scrollbar_x = ttk.Scrollbar(self, orient="horizontal")
+        self.scrollbar_x.pack(side="bottom", fill="x")
+
+        # Create treeview
+        self.tree = ttk.Treeview(self, columns=column_names, show="headings",
+                                 yscrollcommand=self.on_yscroll, xscrollcommand=self.scrollbar_x.set)
+
+        # Configure scrollbars
+        self.scrollbar_y.config(command=self.tree.yview)
+        self.scrollbar_x.config(command=self.tree.xview)
+
+        # Configure columns and headings
+        for col in column_names:
+            self.tree.heading(col, text=col.upper())
+            self.tree.column(col, width=100, anchor="center")
+
+        self.tree.pack(fill="both", expand=True)
+
+        if first_page is not None:
+            self.add_page(first_page, at_end=True, offset=0)
+        else:
+            self.load("next")
+
+    def on_yscroll(self, first, last):
+        """Update the scrollbar and fetch another page when the view nears either end"""
+        self.scrollbar_y.set(first, last)
+        first, last = float(first), float(last)
+        if self.loading:
+            return
+        if last >= 1 - LOAD_THRESHOLD and self.more_after:
+            self.after_idle(self.load, "next")
+        elif first <= LOAD_THRESHOLD and self.more_before:
+            self.after_idle(self.load, "previous")
+
+    def load(self, direction):
+        """Fetch the page after the last loaded one, or before the first"""
+        if self.loading:
+            return
+        kwargs = {"page_size": self.page_size}
+        if self.key_index is not None:
+            if direction == "next" and self.pages:
+                kwargs["after"] = self.pages[-1]["rows"][-1][self.key_index]
+            elif direction == "previous":
+                kwargs["before"] = self.pages[0]["rows"][0][self.key_index]
+        else:
+            if direction == "next":
+                kwargs["offset"] = self.pages[-1]["offset"] + len(self.pages[-1]["rows"]) if self.pages else 0
+            else:
+                kwargs["offset"] = max(self.pages[0]["offset"] - self.page_size, 0)
+        offset = kwargs.get("offset")
+
+        def loaded(result):
+            self.loading = None
+            rows, _ = result
+            if direction == "next":
+                self.add_page(rows, at_end=True, offset=offset)
+            else:
+                self.add_page(rows, at_end=False, offset=offset)
+
+        self.loading = self.executor.submit(
+            lambda conn, task: operations.fetch_page(conn, self.table_name, **kwargs),
+            loaded, self.load_failed)
+
+    def add_page(self, rows, at_end, offset=None):
+        """Insert a fetched page and drop the page at the other end once the window is full"""
+        if at_end:
+            self.more_after = len(rows) == self.page_size
+        else:
+            self.more_before = bool(rows) and (self.key_index is not None or offset > 0)
+        if not rows:
+            return
+
+        def change():
+            index = "end" if at_end else 0
+            items = [self.tree.insert("", index, values=row) for row in (rows if at_end else reversed(rows))]
+            keys = [row[self.key_index] for row in rows] if self.key_index is not None else []
+            page = {"keys": keys, "rows": list(rows), "items": items if at_end else items[::-1], "offset": offset}
+            if at_end:
+                self.pages.append(page)
+            else:
+                self.pages.insert(0, page)
+
+            if len(self.pages) > self.max_pages:
+                dropped = self.pages.pop(0) if at_end else self.pages.pop()
+                self.tree.delete(*dropped["items"])
+                if at_end:
+                    self.more_before = True
+                else:
+                    self.more_after = True
+
+        self.keep_view(change)
+
+    def keep_view(self, change):
+        """Apply a change to the rows without moving the rows the user is looking at"""
+        children = self.tree.get_children()
+        anchor = children[min(int(self.tree.yview()[0] * len(children)), len(children) - 1)] if children else None
+        change()
+        children = self.tree.get_children()
+        if anchor in children:
+            self.tree.yview_moveto(children.index(anchor) / len(children))
+
+    def reload(self, on_done=None):
+        """Drop every loaded page and fetch the first page again"""
+        if self.loading:
+            self.loading.cancel()
+
+        def work(conn, task):
+            watermark = operations.change_watermark(conn)
+            rows, _ = operations.fetch_page(conn, self.table_name, page_size=self.page_size)
+            return rows, watermark
+
+        def loaded(result):
+            self.loading = None
+            rows, self.watermark = result
+            self.tree.delete(*self.tree.get_children())
+            self.pages = []
+            self.more_before = False
+            self.add_page(rows, at_end=True, offset=0)
+            if on_done:
+                on_done()
+
+        self.loading = self.executor.submit(work, loaded, self.load_failed)
+
+    def load_failed(self, error):
+        self.loading = None
+        if self.on_error:
+            self.on_error(error)
+
+    def refresh(self, on_done=None):
+        """Fetch the rows changed since the last load and patch them in by primary key"""
+        if self.watermark is None or self.key_index is None:
+            self.reload(on_done)
+            return
+        if self.loading:
+            self.loading.cancel()
+
+        def loaded(result):
+            self.loading = None
+            watermark, rows = result
+            if rows is None:
+                self.reload(on_done)
+                return
+            self.watermark = watermark
+            if rows:
+                self.keep_view(lambda: self.apply_changes(rows))
+            if on_done:
+                on_done()
+
+        self.loading = self.executor.submit(
+            lambda conn, task: operations.fetch_changes(conn, self.table_name, self.watermark),
+            loaded, self.load_failed)
+
+    def apply_changes(self, rows):
+        """Update, insert or remove changed rows that fall inside the loaded window"""
+        for key, row in sorted(rows.items(), key=lambda item: item[0]):
+            page_index, position = self.locate(key)
+            page = self.pages[page_index] if page_index is not None else None
+            loaded = page is not None and position < len(page["keys"]) and page["keys"][position] == key
+
+            if loaded and row is None:
+                self.tree.delete(page["items"][position])
+                for field in ("keys", "rows", "items"):
+                    del page[field][position]
+                if not page["keys"]:
+                    del self.pages[page_index]
+            elif loaded:
+                self.tree.item(page["items"][position], values=row)
+                page["rows"][position] = row
+            elif row is not None and page is not None:
+                index = sum(len(p["items"]) for p in self.pages[:page_index]) + position
+                page["keys"].insert(position, key)
+                page["rows"].insert(position, row)
+                page["items"].insert(position, self.tree.insert("", index, values=row))
+            elif row is not None and not self.pages and not self.more_before and not self.more_after:
+                self.pages.append({"keys": [key], "rows": [row], "items": [self.tree.insert("", "end", values=row)],
+                                   "offset": 0})
+
+    def locate(self, key):
+        """Find the page and position a key belongs at, or (None, None) when it is outside the loaded window"""
+        if not self.pages:
+            return None, None
+        if key < self.pages[0]["keys"][0] and self.more_before:
+            return None, None
+        if key > self.pages[-1]["keys"][-1] and self.more_after:
+            return None, None
+        page_index = 0
+        for i, page in enumerate(self.pages):
+            if page["keys"][0] <= key:
+                page_index = i
+        return page_index, bisect_left(self.pages[page_index]["keys"], key)
@@ -0,0 +1,233 @@
+"""Replay the application's query mix and report throughput and latency percentiles per operation.
+
+By default a scratch SQLite database is filled by datagen.py at the requested size. With
+--backend the configured database is used as it is, and must already hold generated data;
+the inserts and updates the replay makes are committed there.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from DBconnect import SQLiteEngine, DatabaseError
+from DBpool import get_pool
+from allocation import AVAILABLE_UNITS
+from instrumentation import InstrumentedConnection, QueryRecorder
+import datagen
+import operations
+
+OPERATIONS = 2000       # operations replayed per run
+SAMPLE_SIZE = 2000      # donations and units sampled up front as targets for the writes
+DONATION_INTERVAL = timedelta(days=92)  # donations closer together than three months are rejected
+
+# Relative frequency of each operation, roughly what the front desk and the admin panel do in a day
+MIX = {
+    "statistics": 5,
+    "donor lookup": 20,
+    "recipient lookup": 10,
+    "table load": 15,
+    "next page": 10,
+    "blood inventory": 10,
+    "expired blood": 5,
+    "insert donation": 8,
+    "insert transfusion": 5,
+    "update donation": 6,
+    "update transfusion": 6,
+}
+
+# Tables behind the admin panel buttons
+ADMIN_TABLES = ("donor", "donorscreening", "recipient", "staff", "donation", "transfusion", "bloodinventory",
+                "expiredblood")
+
+
+def load_page(conn, table_name, **kwargs):
+    """What BloodBankApp.run_page does: read the change watermark, then the page"""
+    operations.change_watermark(conn)
+    return operations.fetch_page(conn, table_name, **kwargs)
+
+
+class Workload:
+    """Targets for the replayed statements, picked so every write passes the trigger rules"""
+
+    def __init__(self, conn, seed=1):
+        self.random = random.Random(seed)
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT MAX(Donor_ID) FROM Donor), (SELECT MAX(Recipient_ID) FROM Recipient), "
+                       "(SELECT MAX(Donation_ID) FROM Donation), (SELECT MAX(Transfusion_ID) FROM Transfusion)"
+                       + operations.engine_for(conn).dual)
+        self.max_donor, self.max_recipient, self.max_donation, self.max_transfusion = (
+            value or 0 for value in cursor.fetchone())
+        if not self.max_donor:
+            raise ValueError("The database is empty; fill it with datagen.py first")
+        self.next_donation = self.max_donation + 1
+        self.next_transfusion = self.max_transfusion + 1
+
+        # New donations come from eligible donors with even ids, updates touch donations of odd ones,
+        # so an update never meets a donation made during the run
+        cursor.execute("SELECT Donor_ID, Donor_BloodType FROM Donor WHERE Eligibility_Status = 'Eligible' "
+                       "AND MOD(Donor_ID, 2) = 0 AND NOT EXISTS (SELECT 1 FROM Donation d "
+                       "WHERE d.Donor_ID = Donor.Donor_ID AND d.Donation_Date > :cutoff)",
+                       {"cutoff": datetime.now().replace(microsecond=0) - DONATION_INTERVAL})
+        self.donors = cursor.fetchall()
+        self.random.shuffle(self.donors)
+
+        sample = self.random.sample(range(1, self.max_donation + 1), min(SAMPLE_SIZE, self.max_donation))
+        rows, _ = operations.fetch_in(conn, "SELECT Donation_ID FROM Donation WHERE MOD(Donor_ID, 2) = 1 "
+                                            "AND Donation_ID IN ({keys})", sample)
+        self.donations = [donation_id for donation_id, in rows]
+
+        cursor.execute("SELECT MAX(Inventory_ID) FROM BloodInventory")
+        max_unit = cursor.fetchone()[0] or 0
+        sample = self.random.sample(range(1, max_unit + 1), min(SAMPLE_SIZE, max_unit))
+        self.units, _ = operations.fetch_in(conn, AVAILABLE_UNITS + " AND b.Inventory_ID IN ({keys})", sample,
+                                            {"now": datetime.now()})
+        self.random.shuffle(self.units)
+
+        cursor.execute("SELECT Recipient_ID, Recipient_BloodType FROM Recipient")
+        self.recipients = {}
+        for recipient_id, blood_type in cursor.fetchall():
+            self.recipients.setdefault(blood_type, []).append(recipient_id)
+
+    def statistics(self, conn):
+        operations.fetch_statistics(conn)
+
+    def donor_lookup(self, conn):
+        operations.query(conn, operations.DONOR_LOOKUP, {"id": self.random.randint(1, self.max_donor)})
+
+    def recipient_lookup(self, conn):
+        operations.query(conn, operations.RECIPIENT_LOOKUP, {"id": self.random.randint(1, self.max_recipient)})
+
+    def table_load(self, conn):
+        load_page(conn, self.random.choice(ADMIN_TABLES))
+
+    def next_page(self, conn):
+        operations.fetch_page(conn, "donor", after=self.random.randint(1, self.max_donor))
+
+    def blood_inventory(self, conn):
+        load_page(conn, "bloodinventory")
+
+    def expired_blood(self, conn):
+        load_page(conn, "expiredblood")
+
+    def insert_donation(self, conn):
+        if not self.donors:
+            return False
+        donor_id, blood_type = self.donors.pop()
+        operations.call_procedure(conn, "InsertDonation", [self.next_donation, donor_id, blood_type, 1,
+                                                           datetime.now().replace(microsecond=0), None, None])
+        self.next_donation += 1
+
+    def insert_transfusion(self, conn):
+        while self.units:
+            inventory_id, blood_type, component, quantity, _, donation_id = self.units.pop()
+            if self.recipients.get(blood_type):
+                break
+        else:
+            return False
+        operations.call_procedure(conn, "InsertTransfusion", [
+            self.next_transfusion, self.random.choice(self.recipients[blood_type]), blood_type, component,
+            quantity, datetime.now().replace(microsecond=0), "None", None, donation_id, inventory_id])
+        self.next_transfusion += 1
+
+    def update_donation(self, conn):
+        if not self.donations:
+            return False
+        operations.call_procedure(conn, "UpdateDonation", [self.random.choice(self.donations),
+                                                           self.random.randint(1, 3)])
+
+    def update_transfusion(self, conn):
+        if not self.max_transfusion:
+            return False
+        operations.call_procedure(conn, "UpdateTransfusion", [self.random.randint(1, self.max_transfusion),
+                                                              self.random.randint(1, 3)])
+
+
+def replay(conn, count=OPERATIONS, seed=1, mix=MIX):
+    """Run count operations drawn from the mix; returns {operation: (latencies in ms, errors)} and the wall time"""
+    workload = Workload(conn, seed)
+    names = list(mix)
+    weights = list(mix.values())
+    results = {name: ([], 0) for name in names}
+    started = time.perf_counter()
+    for name in workload.random.choices(names, weights, k=count):
+        operation = getattr(workload, name.replace(" ", "_"))
+        begun = time.perf_counter()
+        try:
+            if operation(conn) is False:
+                # Nothing left to write with
+                continue
+        except DatabaseError as e:
+            conn.rollback()
+            latencies, errors = results[name]
+            results[name] = (latencies, errors + 1)
+            print(f"{name} failed: {e}")
+            continue
+        results[name][0].append((time.perf_counter() - begun) * 1000)
+    return results, time.perf_counter() - started
+
+
+def percentiles(latencies):
+    """p50, p95 and p99 of a list of latencies"""
+    if len(latencies) < 2:
+        return (latencies or [0.0]) * 3
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(results, elapsed):
+    total = sum(len(latencies) for latencies, _ in results.values())
+    print(f"{'Operation':<20} {'Runs':>6} {'Errors':>6} {'Ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'Max ms':>8}")
+    for name, (latencies, errors) in results.items():
+        if not latencies and not errors:
+            continue
+        p50, p95, p99 = percentiles(latencies)
+        rate = len(latencies) / (sum(latencies) / 1000) if latencies and sum(latencies) else 0
+        print(f"{name:<20} {len(latencies):>6} {errors:>6} {rate:>9.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} "
+              f"{max(latencies, default=0):>8.2f}")
+    print(f"\n{total} operations in {elapsed:.2f} s, {total / elapsed:.1f} operations per second")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the application's query mix and report latency")
+    parser.add_argument("--donors", type=int, default=10000, help="size of the scratch database to generate")
+    parser.add_argument("--operations", type=int, default=OPERATIONS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", help="run against the configured oracle or sqlite database instead")
+    parser.add_argument("--statements", action="store_true", help="also list the slowest statements")
+    args = parser.parse_args()
+
+    recorder = QueryRecorder(log_path="")
+    try:
+        if args.backend:
+            pool = get_pool(args.backend)
+            if pool is None:
+                raise SystemExit(1)
+            try:
+                with pool.session() as conn:
+                    results, elapsed = replay(InstrumentedConnection(conn, recorder), args.operations, args.seed)
+            finally:
+                pool.close()
+        else:
+            with tempfile.TemporaryDirectory() as folder:
+                conn = SQLiteEngine(os.path.join(folder, "workload.db")).connect()
+                print(f"Generating {args.donors} donors...")
+                datagen.generate(conn, args.donors, args.seed)
+                results, elapsed = replay(InstrumentedConnection(conn, recorder), args.operations, args.seed)
+                conn.close()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    report(results, elapsed)
+    if args.statements:
+        print(f"\n{'Total ms':>10} {'Calls':>6} {'p95 ms':>7}  Statement")
+        for stats in recorder.top(10):
+            print(f"{stats.total_ms:>10.1f} {stats.calls:>6} {stats.percentile(0.95):>7g}  {stats.statement[:100]}")
+
+
+if __name__ == "__main__":
+    main()